@@ -0,0 +1,24 @@
+"""
+Script for traversing all courses and (re)building the index of the courses listed on the Studio home page
+"""
+from django.core.management.base import BaseCommand
+from xmodule.modulestore.django import modulestore
+
+from contentstore.models import CourseSummary
+
+
+#
+# To run from command line: ./manage.py cms --settings dev index_course_summaries
+#
+class Command(BaseCommand):
+    """
+    Create or update the CourseSummary of each course, and remove the ones of the courses which no longer exist
+    """
+    help = "Create or update the summary of each course listed on the Studio home page"
+
+    def handle(self, *args, **options):
+        course_ids = set()
+        for course in modulestore('direct').get_courses():
+            CourseSummary.index_course(course)
+            course_ids.add(course.location.course_id)
+        CourseSummary.objects.exclude(course_id__in=course_ids).delete()
@@ -0,0 +1,240 @@
+"""
+Models of Studio: the background jobs importing and exporting courses, and
+the index of the courses listed on the Studio home page.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+from django.dispatch import receiver
+
+from student.roles import CourseInstructorRole, CourseStaffRole
+from xmodule.error_module import ErrorDescriptor
+from xmodule.modulestore import Location
+from xmodule.modulestore.django import modulestore_update_signal
+from xmodule.modulestore.exceptions import ItemNotFoundError
+
+
+class CourseImportJob(models.Model):
+    """
+    The import of a course from a tar.gz file uploaded to Studio, which runs
+    in a celery task. It records the progress of the import for the import
+    page to poll.
+    """
+    # The stages of an import, as numbered on the import page
+    NOT_STARTED = 0
+    EXTRACTING = 1
+    VERIFYING = 2
+    UPDATING = 3
+    SUCCEEDED = 4
+
+    # The phases of the UPDATING stage
+    PHASE_STATIC = 'static'
+    PHASE_MODULES = 'modules'
+    PHASE_DRAFTS = 'drafts'
+
+    package_id = models.CharField(max_length=255, db_index=True)
+    filename = models.CharField(max_length=255)
+    user = models.ForeignKey(User)
+    # the url of the location of the course imported into
+    course_location = models.CharField(max_length=255)
+
+    stage = models.IntegerField(default=NOT_STARTED)
+    phase = models.CharField(max_length=32, blank=True)
+    failed = models.BooleanField(default=False)
+    error_message = models.TextField(blank=True)
+    # the number of times a worker started the import
+    attempts = models.IntegerField(default=0)
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return u"[CourseImportJob] {} {}: {}".format(self.package_id, self.filename, self.status)
+
+    @property
+    def status(self):
+        """
+        The status of the import, as returned to the import page: the current
+        stage, or the opposite of the stage at which the import failed.
+        """
+        return -self.stage if self.failed else self.stage
+
+    @property
+    def is_finished(self):
+        """ Whether the import succeeded or failed """
+        return self.failed or self.stage == self.SUCCEEDED
+
+    def update_progress(self, stage, phase=''):
+        """ Record that the import reached the stage and phase """
+        self.stage = stage
+        self.phase = phase
+        self.save()
+
+    def fail(self, error_message):
+        """ Record that the import failed at its current stage """
+        self.failed = True
+        self.error_message = error_message
+        self.save()
+
+
+class CourseExportJob(models.Model):
+    """
+    The export of a version of a course to a tar.gz file, which runs in a
+    celery task. The file is kept in COURSE_EXPORT_ROOT until the course
+    changes, so that it is served again without exporting the course.
+    """
+    package_id = models.CharField(max_length=255)
+    user = models.ForeignKey(User)
+    # the url of the location of the course exported
+    course_location = models.CharField(max_length=255, db_index=True)
+    # the version of the course exported, see tasks.course_export_version
+    version = models.CharField(max_length=64)
+
+    succeeded = models.BooleanField(default=False)
+    failed = models.BooleanField(default=False)
+    error_message = models.TextField(blank=True)
+    # the url of the location of the module which could not be exported, if any
+    failed_location = models.CharField(max_length=255, blank=True)
+    # the number of times a worker started the export
+    attempts = models.IntegerField(default=0)
+
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    # How long an unfinished export may go without news before its task is
+    # considered lost: not picked up by a worker yet, or still running
+    NOT_STARTED_TIMEOUT = timedelta(minutes=10)
+    RUNNING_TIMEOUT = timedelta(hours=1)
+
+    def __unicode__(self):
+        return u"[CourseExportJob] {} {}: {}".format(
+            self.package_id, self.version, 'failed' if self.failed else 'succeeded' if self.succeeded else 'running'
+        )
+
+    @property
+    def is_finished(self):
+        """ Whether the export succeeded or failed """
+        return self.failed or self.succeeded
+
+    @property
+    def is_stale(self):
+        """
+        Whether the export is unfinished and its task seems lost, eg its
+        message was dropped or its worker killed, so that it should be queued
+        again
+        """
+        if self.is_finished:
+            return False
+        timeout = self.RUNNING_TIMEOUT if self.attempts else self.NOT_STARTED_TIMEOUT
+        return self.modified < timezone.now() - timeout
+
+    def succeed(self):
+        """ Record that the export succeeded """
+        self.succeeded = True
+        self.save()
+
+    def fail(self, error_message, failed_location=''):
+        """ Record that the export failed, on the module at failed_location if known """
+        self.failed = True
+        self.error_message = error_message
+        self.failed_location = failed_location
+        self.save()
+
+
+class CourseSummary(models.Model):
+    """
+    What the Studio home page lists of a course, indexed by the names of the
+    groups giving access to the course, so that the courses of a user are
+    listed without loading them from the modulestore. It is kept up to date
+    as the course module is written, see `update_course_summary`.
+    """
+    course_id = models.CharField(max_length=255, db_index=True)
+    org = models.CharField(max_length=255)
+    number = models.CharField(max_length=255)
+    run = models.CharField(max_length=255)
+    display_name = models.TextField(blank=True)
+    display_org = models.CharField(max_length=255)
+    display_number = models.CharField(max_length=255)
+
+    def __unicode__(self):
+        return u"[CourseSummary] {}: {}".format(self.course_id, self.display_name)
+
+    @property
+    def location(self):
+        """ The location of the course """
+        return Location('i4x', self.org, self.number, 'course', self.run)
+
+    @classmethod
+    def index_course(cls, course):
+        """
+        Create or update the summary of the course descriptor course, or remove
+        it if the course is not listed.
+        """
+        location = course.location.replace(revision=None)
+        if isinstance(course, ErrorDescriptor) or location.course == 'templates':
+            cls.objects.filter(course_id=location.course_id).delete()
+            return
+
+        summary, __ = cls.objects.get_or_create(course_id=location.course_id)
+        summary.org = location.org
+        summary.number = location.course
+        summary.run = location.name
+        summary.display_name = course.display_name or ''
+        summary.display_org = course.display_org_with_default
+        summary.display_number = course.display_number_with_default
+        summary.save()
+
+        group_names = course_access_group_names(location)
+        indexed_names = set(summary.access_groups.values_list('name', flat=True))
+        summary.access_groups.exclude(name__in=group_names).delete()
+        CourseAccessGroup.objects.bulk_create([
+            CourseAccessGroup(course_summary=summary, name=name) for name in group_names - indexed_names
+        ])
+
+
+class CourseAccessGroup(models.Model):
+    """
+    The name of a group whose members have access to a course in Studio
+    """
+    course_summary = models.ForeignKey(CourseSummary, related_name='access_groups')
+    # lowercased like the names of the groups of the roles
+    name = models.CharField(max_length=255, db_index=True)
+
+    def __unicode__(self):
+        return u"[CourseAccessGroup] {}: {}".format(self.course_summary.course_id, self.name)
+
+
+def course_access_group_names(course_location):
+    """
+    Return the set of the lowercased names of the groups whose members have
+    access to the course at course_location in Studio: the groups of its staff
+    and instructor roles, in all their formats. That includes the
+    org.course.run format of the groups named after the default package_id of
+    the course, which may not be mapped yet when the course is created.
+    """
+    group_names = set()
+    for role in (CourseInstructorRole, CourseStaffRole):
+        group_names.update(role(course_location).group_names)
+        group_names.add(u'{}_{}.{}.{}'.format(
+            role.ROLE, course_location.org, course_location.course, course_location.name
+        ).lower())
+    return group_names
+
+
+@receiver(modulestore_update_signal)
+def update_course_summary(sender, course_id, location, **kwargs):  # pylint: disable=unused-argument
+    """
+    Update the summary of the course whose course module was just written or
+    deleted by the modulestore sending the signal.
+    """
+    if location.category != 'course':
+        return
+    location = location.replace(revision=None)
+    try:
+        course = kwargs['modulestore'].get_item(location)
+    except ItemNotFoundError:
+        CourseSummary.objects.filter(course_id=location.course_id).delete()
+        return
+    CourseSummary.index_course(course)
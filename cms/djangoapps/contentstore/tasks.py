@@ -0,0 +1,341 @@
+"""
+Celery tasks of Studio:
+
+- making the assets derived from uploaded images: the thumbnail shown in the
+  asset listing and, if ASSET_WEB_RENDITION_MAX_SIZE is set, a web-optimized
+  rendition. The progress is recorded in the `thumbnail_status` attribute of
+  the asset, so that the asset listing can show a placeholder until the
+  thumbnail exists.
+
+- importing courses from uploaded tar.gz files, recording the progress in
+  a CourseImportJob for the import page to poll.
+
+- exporting courses to tar.gz files, which are kept in COURSE_EXPORT_ROOT
+  under the version of the course, and served until the course changes.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tarfile
+from StringIO import StringIO
+from tempfile import mkdtemp, NamedTemporaryFile
+from uuid import uuid4
+
+from celery import task
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.utils.translation import ugettext as _
+from path import path
+
+from cache_toolbox.core import del_cached_content
+from extract_tar import safetar_extractall
+from student import auth
+from student.roles import CourseInstructorRole, CourseStaffRole
+from xmodule.contentstore.content import (
+    StaticContent, make_thumbnail, thumbnail_name_and_location, web_rendition_name_and_location
+)
+from xmodule.contentstore.django import contentstore
+from xmodule.exceptions import NotFoundError, SerializationError
+from xmodule.modulestore import Location
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_importer import import_from_xml
+
+from .models import CourseExportJob, CourseImportJob
+
+log = logging.getLogger(__name__)
+
+THUMBNAIL_PENDING = 'pending'
+THUMBNAIL_READY = 'ready'
+THUMBNAIL_FAILED = 'failed'
+
+
+def has_derived_assets(content):
+    """
+    Return whether derived assets are made for the StaticContent content
+    """
+    return content.content_type is not None and content.content_type.split('/')[0] == 'image'
+
+
+def schedule_derived_assets(content):
+    """
+    Mark the thumbnail of the saved image content as pending and schedule
+    the task making its derived assets.
+    """
+    contentstore().set_attr(content.location, 'thumbnail_status', THUMBNAIL_PENDING)
+    generate_derived_assets.delay(content.location.url())
+
+
+def _save_derived_asset(store, content, name, location, locked=False, **options):
+    """
+    Save the JPEG downscaled from the image content as the asset with the
+    given name and location, locked if `locked`. The options are passed to
+    make_thumbnail.
+    """
+    data = make_thumbnail(StringIO(content.data), **options)
+    store.save(StaticContent(location, name, 'image/jpeg', data, locked=locked))
+    del_cached_content(location)
+
+
+@task()
+def generate_derived_assets(asset_url):
+    """
+    Make and save the derived assets of the image asset at asset_url,
+    recording them on the asset.
+    """
+    store = contentstore()
+    location = Location(asset_url)
+    try:
+        content = store.find(location)
+    except NotFoundError:
+        # deleted since it was uploaded
+        return
+
+    attrs = {'thumbnail_status': THUMBNAIL_FAILED}
+    try:
+        thumbnail_name, thumbnail_location = thumbnail_name_and_location(location)
+        _save_derived_asset(store, content, thumbnail_name, thumbnail_location)
+        attrs.update({'thumbnail_location': thumbnail_location, 'thumbnail_status': THUMBNAIL_READY})
+
+        rendition_size = settings.ASSET_WEB_RENDITION_MAX_SIZE
+        if rendition_size:
+            rendition_name, rendition_location = web_rendition_name_and_location(location)
+            # a full size copy of the image, so only served to whom may see it
+            _save_derived_asset(
+                store, content, rendition_name, rendition_location, locked=content.locked,
+                size=tuple(rendition_size), quality=85, optimize=True, progressive=True
+            )
+            attrs['web_rendition_location'] = rendition_location
+    except Exception:  # pylint: disable=broad-except
+        # log and continue as derived assets are generally considered as optional
+        log.exception(u"Failed to generate the derived assets of %s", asset_url)
+
+    try:
+        store.set_attrs(location, attrs)
+    except NotFoundError:
+        return
+    # the cached asset holds its thumbnail location
+    del_cached_content(location)
+
+
+# The number of times an import is started before giving up on it, when the
+# workers running it die
+MAX_IMPORT_ATTEMPTS = 3
+
+
+def course_import_subdir(course_location):
+    """
+    Return the name of the directory of GITHUB_REPO_ROOT in which the course
+    at course_location is uploaded and extracted to be imported.
+    """
+    return u"{0.org}-{0.course}-{0.name}".format(course_location)
+
+
+def _clear_extracted_files(course_dir, archive_path):
+    """
+    Remove everything but the uploaded archive from course_dir, eg the files
+    extracted by an interrupted attempt at the import.
+    """
+    for entry in course_dir.listdir():
+        if entry == archive_path:
+            continue
+        if entry.isdir() and not entry.islink():
+            entry.rmtree()
+        else:
+            entry.remove()
+
+
+def _find_dir_of_file(directory, filename):
+    """
+    Returns the dirpath for the first file found in the directory with the
+    given name, or None if there is none.
+    """
+    for dirpath, _dirnames, filenames in os.walk(directory):
+        if filename in filenames:
+            return path(dirpath)
+    return None
+
+
+@task(acks_late=True)
+def import_course(job_id):
+    """
+    Run the CourseImportJob with the given id: extract its uploaded archive,
+    import the course it contains, and give its user the instructor and staff
+    roles of the course.
+
+    The task is acknowledged once it's done, so that the import restarts
+    from scratch if the worker running it dies.
+    """
+    try:
+        job = CourseImportJob.objects.get(id=job_id)
+    except CourseImportJob.DoesNotExist:
+        return
+    if job.is_finished:
+        # redelivered after it finished
+        return
+
+    course_location = Location(job.course_location)
+    course_subdir = course_import_subdir(course_location)
+    course_dir = path(settings.GITHUB_REPO_ROOT) / course_subdir
+    archive_path = course_dir / job.filename
+
+    job.attempts += 1
+    job.save()
+    try:
+        if job.attempts > MAX_IMPORT_ATTEMPTS:
+            job.fail(_('The import was interrupted too many times.'))
+            return
+        _clear_extracted_files(course_dir, archive_path)
+
+        job.update_progress(CourseImportJob.EXTRACTING)
+        tar_file = tarfile.open(archive_path)
+        try:
+            safetar_extractall(tar_file, (course_dir + '/').encode('utf-8'))
+        except SuspiciousOperation as exc:
+            job.fail(u'Unsafe tar file. Aborting import. SuspiciousFileOperation: {}'.format(exc.args[0]))
+            return
+        finally:
+            tar_file.close()
+
+        job.update_progress(CourseImportJob.VERIFYING)
+        dirpath = _find_dir_of_file(course_dir, 'course.xml')
+        if not dirpath:
+            job.fail(_('Could not find the course.xml file in the package.'))
+            return
+        log.debug('found course.xml at %s', dirpath)
+        if dirpath != course_dir:
+            for fname in dirpath.listdir():
+                shutil.move(fname, course_dir)
+
+        job.update_progress(CourseImportJob.UPDATING)
+        _module_store, course_items = import_from_xml(
+            modulestore('direct'),
+            settings.GITHUB_REPO_ROOT,
+            [course_subdir],
+            load_error_modules=False,
+            static_content_store=contentstore(),
+            target_location_namespace=course_location,
+            draft_store=modulestore(),
+            progress_callback=lambda phase: job.update_progress(CourseImportJob.UPDATING, phase),
+        )
+
+        new_location = course_items[0].location
+        log.debug('new course at %s', new_location)
+        auth.add_users(job.user, CourseInstructorRole(new_location), job.user)
+        auth.add_users(job.user, CourseStaffRole(new_location), job.user)
+        log.debug('created all course groups at %s', new_location)
+
+        job.update_progress(CourseImportJob.SUCCEEDED)
+
+    except Exception as exception:  # pylint: disable=broad-except
+        log.exception("error importing course")
+        job.fail(unicode(exception))
+
+    finally:
+        shutil.rmtree(course_dir, ignore_errors=True)
+
+
+# The number of times an export is started before giving up on it, when the
+# workers running it die
+MAX_EXPORT_ATTEMPTS = 3
+
+
+def course_export_version(course_location):
+    """
+    Return the version under which the export of the course at course_location
+    is kept: a digest of the version of its content, which is derived from
+    every field of its modules, and of the digests of its assets, so that an
+    export is reused until the course is actually changed, in any process. If
+    the modulestore can't tell the version of the content, the version returned
+    is a new one, so that the export is never reused.
+    """
+    content_version = modulestore().get_course_content_version(course_location.course_id) or uuid4().hex
+    assets = contentstore().get_all_content_digests_for_course(course_location)
+    digest = hashlib.sha1(content_version)
+    digest.update(json.dumps(assets, sort_keys=True))
+    return digest.hexdigest()
+
+
+def course_export_path(course_location, version):
+    """
+    Return the path of the tar.gz file of the export of the given version of
+    the course at course_location.
+    """
+    return path(settings.COURSE_EXPORT_ROOT) / u"{}.{}.tar.gz".format(course_import_subdir(course_location), version)
+
+
+def _remove_old_exports(course_location, version):
+    """
+    Remove the tar.gz files of the exports of the course at course_location
+    but the one of the given version.
+    """
+    export_re = re.compile(re.escape(course_import_subdir(course_location)) + r'\.[0-9a-f]{40}\.tar\.gz$')
+    current_path = course_export_path(course_location, version)
+    for export_path in path(settings.COURSE_EXPORT_ROOT).files():
+        if export_re.match(export_path.name) and export_path != current_path:
+            try:
+                export_path.remove()
+            except OSError:
+                # removed by another export at the same time
+                pass
+
+
+@task(acks_late=True)
+def export_course(job_id):
+    """
+    Run the CourseExportJob with the given id: export its course to the
+    tar.gz file of its version.
+
+    Only the xml of the modules is written to a temporary directory: the
+    assets are streamed from the contentstore into the archive.
+    """
+    try:
+        job = CourseExportJob.objects.get(id=job_id)
+    except CourseExportJob.DoesNotExist:
+        return
+    if job.is_finished:
+        # redelivered after it finished
+        return
+
+    job.attempts += 1
+    job.save()
+    if job.attempts > MAX_EXPORT_ATTEMPTS:
+        job.fail(_('The export was interrupted too many times.'))
+        return
+
+    course_location = Location(job.course_location)
+    name = course_location.name
+    export_root = path(settings.COURSE_EXPORT_ROOT)
+    export_root.makedirs_p()
+    root_dir = path(mkdtemp())
+    # written next to the export, to be moved in place once complete
+    export_file = NamedTemporaryFile(dir=export_root, prefix=name + '.', suffix='.part', delete=False)
+    try:
+        export_to_xml(
+            modulestore('direct'), contentstore(), course_location, root_dir, name, modulestore(),
+            export_assets=False
+        )
+        with tarfile.open(fileobj=export_file, mode='w|gz') as tar_file:
+            tar_file.add(root_dir / name, arcname=name)
+            contentstore().export_all_for_course_to_tar(course_location, tar_file, name)
+        export_file.close()
+        os.rename(export_file.name, course_export_path(course_location, job.version))
+        _remove_old_exports(course_location, job.version)
+        job.succeed()
+
+    except SerializationError as exception:
+        log.exception(u'There was an error exporting course %s', course_location)
+        job.fail(unicode(exception), Location(exception.location).url())
+
+    except Exception as exception:  # pylint: disable=broad-except
+        log.exception(u'There was an error exporting course %s', course_location)
+        job.fail(unicode(exception))
+
+    finally:
+        export_file.close()
+        if os.path.exists(export_file.name):
+            os.remove(export_file.name)
+        shutil.rmtree(root_dir, ignore_errors=True)
@@ -1885,6 +1885,7 @@ class ContentStoreTest(ModuleStoreTestCase):
         module_store = modulestore('direct')
         CourseFactory.create(org='edX', course='999', display_name='Robot Super Course')
 
+        update_signal = module_store.modulestore_update_signal
         try:
             module_store.modulestore_update_signal = Signal(providing_args=['modulestore', 'course_id', 'location'])
 
@@ -1901,7 +1902,7 @@ class ContentStoreTest(ModuleStoreTestCase):
             module_store.create_and_save_xmodule(new_component_location)
 
         finally:
-            module_store.modulestore_update_signal = None
+            module_store.modulestore_update_signal = update_signal
 
         self.assertTrue(self.got_signal)
 
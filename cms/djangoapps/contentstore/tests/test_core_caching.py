@@ -1,7 +1,18 @@
-from cache_toolbox.core import get_cached_content, set_cached_content, del_cached_content
+import datetime
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from pytz import UTC
+
+from cache_toolbox.core import (get_cached_content, set_cached_content, del_cached_content,
+    get_disk_cached_content, set_disk_cached_content)
+from cache_toolbox.disk_cache import DiskCache
 from xmodule.modulestore import Location
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, StaticContentStream
 from django.test import TestCase
+from django.test.utils import override_settings
 
 
 class Content:
@@ -34,3 +45,80 @@ class CachingTestCase(TestCase):
                          'should not be stored in cache with unicodeLocation')
         self.assertEqual(None, get_cached_content(self.nonUnicodeLocation),
                          'should not be stored in cache with nonUnicodeLocation')
+
+
+class DiskCachingTestCase(TestCase):
+    """
+    Tests for the local disk cache of big assets
+    """
+    location = Location(u'c4x', u'mitX', u'800', u'asset', u'textbook.pdf')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_add_and_open(self):
+        disk_cache = DiskCache(self.root, 100)
+        self.assertIsNone(disk_cache.open(self.location, 'md5'))
+        self.assertEqual('some data', disk_cache.add(self.location, 'md5', ['some ', 'data']).read())
+        self.assertEqual('some data', disk_cache.open(self.location, 'md5').read())
+        # the file is keyed by content digest too
+        self.assertIsNone(disk_cache.open(self.location, 'other_md5'))
+
+    def test_too_big(self):
+        disk_cache = DiskCache(self.root, 5)
+        self.assertIsNone(disk_cache.add(self.location, 'md5', ['some ', 'data']))
+        self.assertEqual([], os.listdir(self.root))
+
+    def test_evict_least_recently_used(self):
+        disk_cache = DiskCache(self.root, 10)
+        disk_cache.add(self.location, 'first', ['12345'])
+        disk_cache.add(self.location, 'second', ['12345'])
+        os.utime(disk_cache.path(self.location, 'first'), (0, 0))
+        disk_cache.add(self.location, 'third', ['12345'])
+        self.assertIsNone(disk_cache.open(self.location, 'first'))
+        self.assertIsNotNone(disk_cache.open(self.location, 'second'))
+        self.assertIsNotNone(disk_cache.open(self.location, 'third'))
+
+    def test_delete(self):
+        with override_settings(CONTENT_DISK_CACHE_DIR=self.root):
+            content = StaticContentStream(
+                self.location, 'textbook.pdf', 'application/pdf', StringIO('some data'),
+                last_modified_at=datetime.datetime.now(UTC), length=9, content_digest='md5'
+            )
+            self.assertEqual('some data', ''.join(set_disk_cached_content(content).stream_data()))
+            metadata = get_cached_content(self.location)
+            self.assertIsNone(metadata.data)
+            self.assertEqual('some data', ''.join(get_disk_cached_content(metadata).stream_data()))
+
+            del_cached_content(self.location)
+            self.assertIsNone(get_cached_content(self.location))
+            self.assertIsNone(get_disk_cached_content(metadata))
+
+    def _content(self, data):
+        """ A streamed content of the given data """
+        return StaticContentStream(
+            self.location, 'textbook.pdf', 'application/pdf', StringIO(data),
+            last_modified_at=datetime.datetime.now(UTC), length=len(data), content_digest='md5'
+        )
+
+    def test_too_big_for_the_disk_cache(self):
+        with override_settings(CONTENT_DISK_CACHE_DIR=self.root, CONTENT_DISK_CACHE_MAX_SIZE=5):
+            content = self._content('some data')
+            self.assertIsNone(set_disk_cached_content(content))
+            # the content can still be served in full
+            self.assertEqual('some data', ''.join(content.stream_data()))
+
+    def test_only_cached_when_streamed_in_full(self):
+        with override_settings(CONTENT_DISK_CACHE_DIR=self.root):
+            content = set_disk_cached_content(self._content('some data'))
+            self.assertEqual('data', ''.join(content.stream_data_in_range(5, 8)))
+            self.assertIsNone(get_cached_content(self.location))
+
+            # eg the client went away
+            content = set_disk_cached_content(self._content('some data'))
+            chunks = content.stream_data()
+            next(chunks)
+            chunks.close()
+            self.assertIsNone(get_cached_content(self.location))
+            self.assertEqual([], os.listdir(self.root))
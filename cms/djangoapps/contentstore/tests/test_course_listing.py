@@ -1,22 +1,19 @@
 """
-Unit tests for getting the list of courses for a user through iterating all courses and
-by reversing group name formats.
+Unit tests for getting the list of courses for a user from the index of the courses.
 """
 import random
-from chrono import Timer
-from unittest import skip
 
 from django.contrib.auth.models import Group
 from django.test import RequestFactory
 
-from contentstore.views.course import _accessible_courses_list, _accessible_courses_list_from_groups
+from contentstore.models import CourseSummary
+from contentstore.views.course import _accessible_courses_summary_list
 from contentstore.utils import delete_course_and_groups
 from contentstore.tests.utils import AjaxEnabledTestClient
 from student.tests.factories import UserFactory
 from student.roles import CourseInstructorRole, CourseStaffRole
 from xmodule.modulestore import Location
-from xmodule.modulestore.django import loc_mapper
-from xmodule.modulestore.exceptions import ItemNotFoundError
+from xmodule.modulestore.django import loc_mapper, modulestore
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
@@ -81,70 +78,81 @@ class TestCourseListing(ModuleStoreTestCase):
         self.client.logout()
         ModuleStoreTestCase.tearDown(self)
 
+    def _course_ids(self, request):
+        """ The ids of the courses listed for the request """
+        return sorted(summary.course_id for summary in _accessible_courses_summary_list(request))
+
     def test_get_course_list(self):
         """
         Test getting courses with new access group format e.g. 'instructor_edx.course.run'
         """
         request = self.factory.get('/course')
-        request.user = self.user
+        request.user = UserFactory()
 
         course_location = Location(['i4x', 'Org1', 'Course1', 'course', 'Run1'])
-        self._create_course_with_access_groups(course_location, 'group_name_with_dots', self.user)
+        self._create_course_with_access_groups(course_location, 'group_name_with_dots', request.user)
+        self._create_course_with_access_groups(Location(['i4x', 'Org2', 'Course2', 'course', 'Run2']))
 
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
+        courses_list = list(_accessible_courses_summary_list(request))
         self.assertEqual(len(courses_list), 1)
+        summary = courses_list[0]
+        self.assertEqual(summary.course_id, course_location.course_id)
+        self.assertEqual(summary.location, course_location)
+        self.assertEqual(summary.display_name, 'Run1')
+        self.assertEqual(summary.display_org, 'Org1')
+        self.assertEqual(summary.display_number, 'Course1')
+
+    def test_get_course_list_for_global_staff(self):
+        """
+        Test that global staff get all the courses
+        """
+        request = self.factory.get('/course')
+        request.user = self.user
 
-        # get courses by reversing group name formats
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 1)
-        # check both course lists have same courses
-        self.assertEqual(courses_list, courses_list_by_groups)
+        self._create_course_with_access_groups(Location(['i4x', 'Org1', 'Course1', 'course', 'Run1']))
+        self._create_course_with_access_groups(Location(['i4x', 'Org2', 'Course2', 'course', 'Run2']))
+        self.assertEqual(self._course_ids(request), ['Org1/Course1/Run1', 'Org2/Course2/Run2'])
 
     def test_get_course_list_with_old_group_formats(self):
         """
         Test getting all courses with old course role (instructor/staff) groups
         """
         request = self.factory.get('/course')
-        request.user = self.user
+        request.user = UserFactory()
 
         # create a course with new groups name format e.g. 'instructor_edx.course.run'
         course_location = Location(['i4x', 'Org_1', 'Course_1', 'course', 'Run_1'])
-        self._create_course_with_access_groups(course_location, 'group_name_with_dots', self.user)
+        self._create_course_with_access_groups(course_location, 'group_name_with_dots', request.user)
 
         # create a course with old groups name format e.g. 'instructor_edX/Course/Run'
         old_course_location = Location(['i4x', 'Org_2', 'Course_2', 'course', 'Run_2'])
-        self._create_course_with_access_groups(old_course_location, 'group_name_with_slashes', self.user)
-
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 2)
-
-        # get courses by reversing groups name
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 2)
+        self._create_course_with_access_groups(old_course_location, 'group_name_with_slashes', request.user)
+        self.assertEqual(len(self._course_ids(request)), 2)
 
         # create a new course with older group name format (with dots in names) e.g. 'instructor_edX/Course.name/Run.1'
         old_course_location = Location(['i4x', 'Org.Foo.Bar', 'Course.number', 'course', 'Run.name'])
-        self._create_course_with_access_groups(old_course_location, 'group_name_with_slashes', self.user)
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 3)
-        # get courses by reversing group name formats
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 3)
+        self._create_course_with_access_groups(old_course_location, 'group_name_with_slashes', request.user)
+        self.assertEqual(len(self._course_ids(request)), 3)
 
         # create a new course with older group name format e.g. 'instructor_Run'
         old_course_location = Location(['i4x', 'Org_3', 'Course_3', 'course', 'Run_3'])
-        self._create_course_with_access_groups(old_course_location, 'group_name_with_course_name_only', self.user)
+        self._create_course_with_access_groups(old_course_location, 'group_name_with_course_name_only', request.user)
+        self.assertEqual(len(self._course_ids(request)), 4)
 
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 4)
+    def test_summary_updated(self):
+        """
+        Test that the summary follows the changes of the course
+        """
+        course_location = Location(['i4x', 'Org', 'Course', 'course', 'Run'])
+        course = self._create_course_with_access_groups(course_location)
+        course.display_name = 'Renamed'
+        course.display_organization = 'The Org'
+        course.save()
+        modulestore('direct').update_item(course)
 
-        # should raise an exception for getting courses with older format of access group by reversing django groups
-        with self.assertRaises(ItemNotFoundError):
-            courses_list_by_groups = _accessible_courses_list_from_groups(request)
+        summary = CourseSummary.objects.get(course_id=course_location.course_id)
+        self.assertEqual(summary.display_name, 'Renamed')
+        self.assertEqual(summary.display_org, 'The Org')
 
     def test_get_course_list_with_invalid_course_location(self):
         """
@@ -152,48 +160,32 @@ class TestCourseListing(ModuleStoreTestCase):
         location exists in loc_mapper).
         """
         request = self.factory.get('/course')
-        request.user = self.user
+        request.user = UserFactory()
 
         course_location = Location('i4x', 'Org', 'Course', 'course', 'Run')
-        self._create_course_with_access_groups(course_location, 'group_name_with_dots', self.user)
-
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 1)
-
-        # get courses by reversing group name formats
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 1)
-        # check both course lists have same courses
-        self.assertEqual(courses_list, courses_list_by_groups)
+        self._create_course_with_access_groups(course_location, 'group_name_with_dots', request.user)
+        self.assertEqual(self._course_ids(request), ['Org/Course/Run'])
 
         # now delete this course and re-add user to instructor group of this course
         delete_course_and_groups(course_location.course_id, commit=True)
 
         course_locator = loc_mapper().translate_location(course_location.course_id, course_location)
-        instructor_group_name = CourseInstructorRole(course_locator)._group_names[0]  # pylint: disable=protected-access
+        instructor_group_name = CourseInstructorRole(course_locator).group_names[0]
         group, __ = Group.objects.get_or_create(name=instructor_group_name)
-        self.user.groups.add(group)
+        request.user.groups.add(group)
 
-        # test that get courses through iterating all courses now returns no course
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 0)
+        # test that the deleted course is not listed
+        self.assertEqual(self._course_ids(request), [])
 
-        # now test that get courses by reversing group name formats gives 'ItemNotFoundError'
-        with self.assertRaises(ItemNotFoundError):
-            _accessible_courses_list_from_groups(request)
-
-    def test_course_listing_performance(self):
+    def test_course_listing_queries(self):
         """
         Create large number of courses and give access of some of these courses to the user and
-        compare the time to fetch accessible courses for the user through traversing all courses and
-        reversing django groups
+        check that listing the accessible courses for the user takes two queries regardless
         """
         # create and log in a non-staff user
         self.user = UserFactory()
         request = self.factory.get('/course')
         request.user = self.user
-        self.client.login(username=self.user.username, password='test')
 
         # create list of random course numbers which will be accessible to the user
         user_course_ids = random.sample(range(TOTAL_COURSES_COUNT), USER_COURSES_COUNT)
@@ -209,31 +201,11 @@ class TestCourseListing(ModuleStoreTestCase):
             else:
                 self._create_course_with_access_groups(course_location, 'group_name_with_dots')
 
-        # time the get courses by iterating through all courses
-        with Timer() as iteration_over_courses_time_1:
-            courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), USER_COURSES_COUNT)
-
-        # time again the get courses by iterating through all courses
-        with Timer() as iteration_over_courses_time_2:
-            courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), USER_COURSES_COUNT)
-
-        # time the get courses by reversing django groups
-        with Timer() as iteration_over_groups_time_1:
-            courses_list = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list), USER_COURSES_COUNT)
-
-        # time again the get courses by reversing django groups
-        with Timer() as iteration_over_groups_time_2:
-            courses_list = _accessible_courses_list_from_groups(request)
+        # one query for the groups of the user, and one for their courses
+        with self.assertNumQueries(2):
+            courses_list = list(_accessible_courses_summary_list(request))
         self.assertEqual(len(courses_list), USER_COURSES_COUNT)
 
-        # test that the time taken by getting courses through reversing django groups is lower then the time
-        # taken by traversing through all courses (if accessible courses are relatively small)
-        self.assertGreaterEqual(iteration_over_courses_time_1.elapsed, iteration_over_groups_time_1.elapsed)
-        self.assertGreaterEqual(iteration_over_courses_time_2.elapsed, iteration_over_groups_time_2.elapsed)
-
     def test_get_course_list_with_same_course_id(self):
         """
         Test getting courses with same id but with different name case. Then try to delete one of them and
@@ -247,39 +219,25 @@ class TestCourseListing(ModuleStoreTestCase):
 
         course_location_caps = Location(['i4x', 'Org', 'COURSE', 'course', 'Run'])
         self._create_course_with_access_groups(course_location_caps, 'group_name_with_dots', self.user)
-
-        # get courses through iterating all courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 1)
-
-        # get courses by reversing group name formats
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 1)
-        # check both course lists have same courses
-        self.assertEqual(courses_list, courses_list_by_groups)
+        self.assertEqual(self._course_ids(request), ['Org/COURSE/Run'])
 
         # now create another course with same course_id but different name case
         course_location_camel = Location(['i4x', 'Org', 'Course', 'course', 'Run'])
         self._create_course_with_access_groups(course_location_camel, 'group_name_with_dots', self.user)
 
-        # test that get courses through iterating all courses returns both courses
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 2)
-
-        # test that get courses by reversing group name formats returns only one course
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 1)
+        # the groups of the roles are case insensitive, so both courses are accessible, as for has_course_access
+        self.assertEqual(self._course_ids(request), ['Org/COURSE/Run', 'Org/Course/Run'])
 
         course_locator = loc_mapper().translate_location(course_location_caps.course_id, course_location_caps)
         outline_url = course_locator.url_reverse('course/')
         # now delete first course (course_location_caps) and check that it is no longer accessible
         delete_course_and_groups(course_location_caps.course_id, commit=True)
         # add user to this course instructor group since he was removed from that group on course delete
-        instructor_group_name = CourseInstructorRole(course_locator)._group_names[0]  # pylint: disable=protected-access
+        instructor_group_name = CourseInstructorRole(course_locator).group_names[0]
         group, __ = Group.objects.get_or_create(name=instructor_group_name)
         self.user.groups.add(group)
 
-        # test viewing the index page which creates missing courses loc_map entries
+        # test viewing the index page
         resp = self.client.get_html('/course')
         self.assertContains(
             resp,
@@ -288,13 +246,8 @@ class TestCourseListing(ModuleStoreTestCase):
             html=True
         )
 
-        # test that get courses through iterating all courses now returns one course
-        courses_list = _accessible_courses_list(request)
-        self.assertEqual(len(courses_list), 1)
-
-        # test that get courses by reversing group name formats also returns one course
-        courses_list_by_groups = _accessible_courses_list_from_groups(request)
-        self.assertEqual(len(courses_list_by_groups), 1)
+        # test that only the remaining course is listed
+        self.assertEqual(self._course_ids(request), ['Org/Course/Run'])
 
         # now check that deleted course in not accessible
         response = self.client.get(outline_url, HTTP_ACCEPT='application/json')
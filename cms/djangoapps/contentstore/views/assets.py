@@ -16,7 +16,7 @@ from cache_toolbox.core import del_cached_content
 from xmodule.contentstore.django import contentstore
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore import Location
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, thumbnail_name_and_location, web_rendition_name_and_location
 from xmodule.modulestore import InvalidLocationError
 from xmodule.exceptions import NotFoundError
 from django.core.exceptions import PermissionDenied
@@ -29,6 +29,7 @@ from django.http import HttpResponseNotFound
 from django.utils.translation import ugettext as _
 from pymongo import ASCENDING, DESCENDING
 from .access import has_course_access
+from ..tasks import has_derived_assets, schedule_derived_assets, THUMBNAIL_PENDING, THUMBNAIL_READY
 
 __all__ = ['assets_handler']
 
@@ -128,7 +129,10 @@ def _assets_json(request, location):
         thumbnail_location = Location(_thumbnail_location) if _thumbnail_location is not None else None
 
         asset_locked = asset.get('locked', False)
-        asset_json.append(_get_asset_json(asset['displayname'], asset['uploadDate'], asset_location, thumbnail_location, asset_locked))
+        asset_json.append(_get_asset_json(
+            asset['displayname'], asset['uploadDate'], asset_location, thumbnail_location, asset_locked,
+            asset.get('thumbnail_status')
+        ))
 
     return JsonResponse({
         'start': start,
@@ -188,34 +192,36 @@ def _upload_asset(request, location):
     sc_partial = partial(StaticContent, content_loc, filename, mime_type)
     if chunked:
         content = sc_partial(upload_file.chunks())
-        tempfile_path = upload_file.temporary_file_path()
     else:
         content = sc_partial(upload_file.read())
-        tempfile_path = None
 
-    # first let's see if a thumbnail can be created
-    (thumbnail_content, thumbnail_location) = contentstore().generate_thumbnail(
-            content,
-            tempfile_path=tempfile_path
-    )
-
-    # delete cached thumbnail even if one couldn't be created this time (else
-    # the old thumbnail will continue to show)
-    del_cached_content(thumbnail_location)
-    # now store thumbnail location only if we could create it
-    if thumbnail_content is not None:
-        content.thumbnail_location = thumbnail_location
+    # delete the cached thumbnail, which is replaced by the one of the new
+    # content (else the old thumbnail will continue to show)
+    del_cached_content(thumbnail_name_and_location(content_loc)[1])
 
     # then commit the content
     contentstore().save(content)
     del_cached_content(content.location)
 
+    # thumbnails are made in the background, the asset listing shows a
+    # placeholder until it's ready
+    thumbnail_status = None
+    if has_derived_assets(content):
+        schedule_derived_assets(content)
+        thumbnail_status = THUMBNAIL_PENDING
+
     # readback the saved content - we need the database timestamp
     readback = contentstore().find(content.location)
+    if readback.thumbnail_location is not None:
+        # the derived assets were made synchronously, eg CELERY_ALWAYS_EAGER is set
+        thumbnail_status = THUMBNAIL_READY
 
     locked = getattr(content, 'locked', False)
     response_payload = {
-        'asset': _get_asset_json(content.name, readback.last_modified_at, content.location, content.thumbnail_location, locked),
+        'asset': _get_asset_json(
+            content.name, readback.last_modified_at, content.location, readback.thumbnail_location, locked,
+            thumbnail_status
+        ),
         'msg': _('Upload completed')
     }
 
@@ -263,6 +269,12 @@ def _update_asset(request, location, asset_id):
             except:
                 logging.warning('Could not delete thumbnail: %s', content.thumbnail_location)
 
+        # and its web rendition, if any
+        rendition = contentstore().find(web_rendition_name_and_location(loc)[1], throw_on_not_found=False)
+        if rendition is not None:
+            contentstore().delete(rendition.get_id())
+            del_cached_content(rendition.location)
+
         # delete the original
         contentstore().delete(content.get_id())
         # remove from cache
@@ -283,12 +295,22 @@ def _update_asset(request, location, asset_id):
             contentstore().set_attr(asset_location, 'locked', modified_asset['locked'])
             # Delete the asset from the cache so we check the lock status the next time it is requested.
             del_cached_content(asset_location)
+            # its web rendition is a full size copy of it, locked along with it
+            rendition_location = web_rendition_name_and_location(asset_location)[1]
+            try:
+                contentstore().set_attr(rendition_location, 'locked', modified_asset['locked'])
+            except NotFoundError:
+                pass
+            else:
+                del_cached_content(rendition_location)
             return JsonResponse(modified_asset, status=201)
 
 
-def _get_asset_json(display_name, date, location, thumbnail_location, locked):
+def _get_asset_json(display_name, date, location, thumbnail_location, locked, thumbnail_status=None):
     """
     Helper method for formatting the asset information to send to client.
+
+    thumbnail_status is 'pending' while the thumbnail of an image is being made.
     """
     asset_url = StaticContent.get_url_path_from_location(location)
     external_url = settings.LMS_BASE + asset_url
@@ -299,6 +321,7 @@ def _get_asset_json(display_name, date, location, thumbnail_location, locked):
         'external_url': external_url,
         'portable_url': StaticContent.get_static_path_from_location(location),
         'thumbnail': StaticContent.get_url_path_from_location(thumbnail_location) if thumbnail_location is not None else None,
+        'thumbnail_status': thumbnail_status,
         'locked': locked,
         # Needed for Backbone delete/update.
         'id': asset_url
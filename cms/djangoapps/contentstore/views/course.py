@@ -7,7 +7,6 @@ import string  # pylint: disable=W0402
 import re
 import bson
 
-from django.db.models import Q
 from django.utils.translation import ugettext as _
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
@@ -19,7 +18,6 @@ from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from util.json_request import JsonResponse
 from edxmako.shortcuts import render_to_response
 
-from xmodule.error_module import ErrorDescriptor
 from xmodule.modulestore.django import modulestore, loc_mapper
 from xmodule.contentstore.content import StaticContent
 from xmodule.tabs import PDFTextbookTabs
@@ -28,6 +26,7 @@ from xmodule.modulestore.exceptions import (
     ItemNotFoundError, InvalidLocationError)
 from xmodule.modulestore import Location
 
+from contentstore.models import CourseSummary
 from contentstore.course_info_model import get_course_updates, update_course_updates, delete_course_update
 from contentstore.utils import (
     get_lms_link_for_item, add_extra_panel_tab, remove_extra_panel_tab,
@@ -163,114 +162,46 @@ def _xmodule_json(xmodule, course_id):
     return result
 
 
-def _accessible_courses_list(request):
+def _accessible_courses_summary_list(request):
     """
-    List all courses available to the logged in user by iterating through all the courses
+    List the summaries of all courses available to the logged in user, by joining the index of
+    the courses against the names of the user's groups
     """
-    courses = modulestore('direct').get_courses()
-
-    # filter out courses that we don't have access too
-    def course_filter(course):
-        """
-        Get courses to which this user has access
-        """
-        if GlobalStaff().has_user(request.user):
-            return course.location.course != 'templates'
-
-        return (has_course_access(request.user, course.location)
-                # pylint: disable=fixme
-                # TODO remove this condition when templates purged from db
-                and course.location.course != 'templates'
-                )
-    courses = filter(course_filter, courses)
-    return courses
-
-
-# pylint: disable=invalid-name
-def _accessible_courses_list_from_groups(request):
-    """
-    List all courses available to the logged in user by reversing access group names
-    """
-    courses_list = []
-    course_ids = set()
-
-    user_staff_group_names = request.user.groups.filter(
-        Q(name__startswith='instructor_') | Q(name__startswith='staff_')
-    ).values_list('name', flat=True)
-
-    # we can only get course_ids from role names with the new format (instructor_org/number/run or
-    # instructor_org.number.run but not instructor_number).
-    for user_staff_group_name in user_staff_group_names:
-        # to avoid duplication try to convert all course_id's to format with dots e.g. "edx.course.run"
-        if user_staff_group_name.startswith("instructor_"):
-            # strip starting text "instructor_"
-            course_id = user_staff_group_name[11:]
-        else:
-            # strip starting text "staff_"
-            course_id = user_staff_group_name[6:]
-
-        course_ids.add(course_id.replace('/', '.').lower())
-
-    for course_id in course_ids:
-        # get course_location with lowercase id
-        course_location = loc_mapper().translate_locator_to_location(
-            CourseLocator(package_id=course_id), get_course=True, lower_only=True
-        )
-        if course_location is None:
-            raise ItemNotFoundError(course_id)
-
-        course = modulestore('direct').get_course(course_location.course_id)
-        if course is None:
-            raise ItemNotFoundError(course_id)
-
-        courses_list.append(course)
-
-    return courses_list
+    summaries = CourseSummary.objects.all()
+    if not GlobalStaff().has_user(request.user):
+        # matched case insensitively, like the groups of the course roles
+        group_names = set(name.lower() for name in request.user.groups.values_list('name', flat=True))
+        summaries = summaries.filter(access_groups__name__in=group_names).distinct()
+    return summaries
 
 
 @login_required
 @ensure_csrf_cookie
 def course_listing(request):
     """
-    List all courses available to the logged in user
-    Try to get all courses by first reversing django groups and fallback to old method if it fails
-    Note: overhead of pymongo reads will increase if getting courses from django groups fails
+    List all courses available to the logged in user, from the index of the courses
     """
-    if GlobalStaff().has_user(request.user):
-        # user has global access so no need to get courses from django groups
-        courses = _accessible_courses_list(request)
-    else:
-        try:
-            courses = _accessible_courses_list_from_groups(request)
-        except ItemNotFoundError:
-            # user have some old groups or there was some error getting courses from django groups
-            # so fallback to iterating through all courses
-            courses = _accessible_courses_list(request)
-
-            # update location entry in "loc_mapper" for user courses (add keys 'lower_id' and 'lower_course_id')
-            for course in courses:
-                loc_mapper().create_map_entry(course.location)
-
-    def format_course_for_view(course):
+    def format_course_for_view(summary):
         """
         return tuple of the data which the view requires for each course
         """
+        course_location = summary.location
         # published = false b/c studio manipulates draft versions not b/c the course isn't pub'd
         course_loc = loc_mapper().translate_location(
-            course.location.course_id, course.location, published=False, add_entry_if_missing=True
+            course_location.course_id, course_location, published=False, add_entry_if_missing=True
         )
         return (
-            course.display_name,
+            summary.display_name,
             # note, couldn't get django reverse to work; so, wrote workaround
             course_loc.url_reverse('course/', ''),
-            get_lms_link_for_item(course.location),
-            course.display_org_with_default,
-            course.display_number_with_default,
-            course.location.name
+            get_lms_link_for_item(course_location),
+            summary.display_org,
+            summary.display_number,
+            summary.run
         )
 
     return render_to_response('index.html', {
-        'courses': [format_course_for_view(c) for c in courses if not isinstance(c, ErrorDescriptor)],
+        'courses': [format_course_for_view(summary) for summary in _accessible_courses_summary_list(request)],
         'user': request.user,
         'request_course_creator_url': reverse('contentstore.views.request_course_creator'),
         'course_creator_status': _get_course_creator_status(request.user),
@@ -4,38 +4,32 @@ courses
 """
 import logging
 import os
-import tarfile
-import shutil
 import re
-from tempfile import mkdtemp
 from path import path
 
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
 from django.core.servers.basehttp import FileWrapper
-from django.core.files.temp import NamedTemporaryFile
-from django.core.exceptions import SuspiciousOperation, PermissionDenied
+from django.core.exceptions import PermissionDenied
 from django.http import HttpResponseNotFound
+from django.shortcuts import redirect
 from django.views.decorators.http import require_http_methods, require_GET
 from django.utils.translation import ugettext as _
 
 from edxmako.shortcuts import render_to_response
 
-from xmodule.modulestore.xml_importer import import_from_xml
-from xmodule.contentstore.django import contentstore
-from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore, loc_mapper
-from xmodule.exceptions import SerializationError
 
 from xmodule.modulestore.locator import BlockUsageLocator
 from .access import has_course_access
+from ..models import CourseExportJob, CourseImportJob
+from ..tasks import course_export_path, course_export_version, course_import_subdir, export_course, import_course
 
 from util.json_request import JsonResponse
-from extract_tar import safetar_extractall
-from student.roles import CourseInstructorRole, CourseStaffRole
-from student import auth
 
 
 __all__ = ['import_handler', 'import_status_handler', 'export_handler']
@@ -72,8 +66,7 @@ def import_handler(request, tag=None, package_id=None, branch=None, version_guid
             raise NotImplementedError('coming soon')
         else:
             data_root = path(settings.GITHUB_REPO_ROOT)
-            course_subdir = "{0}-{1}-{2}".format(old_location.org, old_location.course, old_location.name)
-            course_dir = data_root / course_subdir
+            course_dir = data_root / course_import_subdir(old_location)
 
             filename = request.FILES['course-data'].name
             if not filename.endswith('.tar.gz'):
@@ -146,113 +139,21 @@ def import_handler(request, tag=None, package_id=None, branch=None, version_guid
                 })
 
             else:   # This was the last chunk.
+                # Import the course in the background, as it can take longer
+                # than requests are allowed to
+                job = CourseImportJob.objects.create(
+                    package_id=location.package_id,
+                    filename=filename,
+                    user=request.user,
+                    course_location=old_location.url(),
+                )
+                # the worker must find the job, which the transaction of the
+                # request would otherwise hold until the response is sent
+                transaction.commit()
+                import_course.delay(job.id)
 
-                # Use sessions to keep info about import progress
-                session_status = request.session.setdefault("import_status", {})
-                key = location.package_id + filename
-                session_status[key] = 1
-                request.session.modified = True
-
-                # Do everything from now on in a try-finally block to make sure
-                # everything is properly cleaned up.
-                try:
-
-                    tar_file = tarfile.open(temp_filepath)
-                    try:
-                        safetar_extractall(tar_file, (course_dir + '/').encode('utf-8'))
-                    except SuspiciousOperation as exc:
-                        return JsonResponse(
-                            {
-                                'ErrMsg': 'Unsafe tar file. Aborting import.',
-                                'SuspiciousFileOperationMsg': exc.args[0],
-                                'Stage': 1
-                            },
-                            status=400
-                        )
-                    finally:
-                        tar_file.close()
-
-                    session_status[key] = 2
-                    request.session.modified = True
-
-                    # find the 'course.xml' file
-                    def get_all_files(directory):
-                        """
-                        For each file in the directory, yield a 2-tuple of (file-name,
-                        directory-path)
-                        """
-                        for dirpath, _dirnames, filenames in os.walk(directory):
-                            for filename in filenames:
-                                yield (filename, dirpath)
-
-                    def get_dir_for_fname(directory, filename):
-                        """
-                        Returns the dirpath for the first file found in the directory
-                        with the given name.  If there is no file in the directory with
-                        the specified name, return None.
-                        """
-                        for fname, dirpath in get_all_files(directory):
-                            if fname == filename:
-                                return dirpath
-                        return None
-
-                    fname = "course.xml"
-
-                    dirpath = get_dir_for_fname(course_dir, fname)
-
-                    if not dirpath:
-                        return JsonResponse(
-                            {
-
-                                'ErrMsg': _('Could not find the course.xml file in the package.'),
-                                'Stage': 2
-                            },
-                            status=415
-                        )
-
-                    logging.debug('found course.xml at {0}'.format(dirpath))
-
-                    if dirpath != course_dir:
-                        for fname in os.listdir(dirpath):
-                            shutil.move(dirpath / fname, course_dir)
-
-                    _module_store, course_items = import_from_xml(
-                        modulestore('direct'),
-                        settings.GITHUB_REPO_ROOT,
-                        [course_subdir],
-                        load_error_modules=False,
-                        static_content_store=contentstore(),
-                        target_location_namespace=old_location,
-                        draft_store=modulestore()
-                    )
-
-                    new_location = course_items[0].location
-                    logging.debug('new course at {0}'.format(new_location))
-
-                    session_status[key] = 3
-                    request.session.modified = True
-
-                    auth.add_users(request.user, CourseInstructorRole(new_location), request.user)
-                    auth.add_users(request.user, CourseStaffRole(new_location), request.user)
-                    logging.debug('created all course groups at {0}'.format(new_location))
-
-                # Send errors to client with stage at which error occurred.
-                except Exception as exception:   # pylint: disable=W0703
-                    log.exception(
-                        "error importing course"
-                    )
-                    return JsonResponse(
-                        {
-                            'ErrMsg': str(exception),
-                            'Stage': session_status[key]
-                        },
-                        status=400
-                    )
-
-                finally:
-                    shutil.rmtree(course_dir)
-
-                return JsonResponse({'Status': 'OK'})
+                job = CourseImportJob.objects.get(id=job.id)
+                return JsonResponse({'ImportStatus': job.status})
     elif request.method == 'GET':  # assume html
         course_module = modulestore().get_item(old_location)
         return render_to_response('import.html', {
@@ -269,25 +170,31 @@ def import_handler(request, tag=None, package_id=None, branch=None, version_guid
 @login_required
 def import_status_handler(request, tag=None, package_id=None, branch=None, version_guid=None, block=None, filename=None):
     """
-    Returns an integer corresponding to the status of a file import. These are:
+    Returns an integer corresponding to the status of the latest import of
+    the file by the user. These are:
 
-        0 : No status info found (import done or upload still in progress)
+        0 : No status info found (import not started or upload still in progress)
         1 : Extracting file
         2 : Validating.
         3 : Importing to mongo
+        4 : Import successful
 
+    or the opposite of the stage at which the import failed, e.g. -2 if the
+    file couldn't be validated, with the error as `Message`. While importing
+    to mongo, `Phase` tells which part of the course is being imported.
     """
     location = BlockUsageLocator(package_id=package_id, branch=branch, version_guid=version_guid, block_id=block)
     if not has_course_access(request.user, location):
         raise PermissionDenied()
 
-    try:
-        session_status = request.session["import_status"]
-        status = session_status[location.package_id + filename]
-    except KeyError:
-        status = 0
+    jobs = CourseImportJob.objects.filter(
+        package_id=location.package_id, filename=filename, user=request.user
+    ).order_by('-id')[:1]
+    if not jobs:
+        return JsonResponse({"ImportStatus": CourseImportJob.NOT_STARTED})
 
-    return JsonResponse({"ImportStatus": status})
+    job = jobs[0]
+    return JsonResponse({"ImportStatus": job.status, "Phase": job.phase, "Message": job.error_message})
 
 
 @ensure_csrf_cookie
@@ -305,6 +212,11 @@ def export_handler(request, tag=None, package_id=None, branch=None, version_guid
     Note that there are 2 ways to request the tar.gz file. The request header can specify
     application/x-tgz via HTTP_ACCEPT, or a query parameter can be used (?_accept=application/x-tgz).
 
+    The course is exported by a celery task, and the tar.gz file kept until the course changes, so
+    that the export of an unchanged course is returned right away. While the task runs, an HTML page
+    is returned which requests the tar.gz file again, with the `export_job` parameter set to the id of
+    the export, until it is done.
+
     If the tar.gz file has been requested but the export operation fails, an HTML page will be returned
     which describes the error.
     """
@@ -320,63 +232,52 @@ def export_handler(request, tag=None, package_id=None, branch=None, version_guid
 
     export_url = location.url_reverse('export') + '?_accept=application/x-tgz'
     if 'application/x-tgz' in requested_format:
-        name = old_location.name
-        export_file = NamedTemporaryFile(prefix=name + '.', suffix=".tar.gz")
-        root_dir = path(mkdtemp())
-
-        try:
-            export_to_xml(modulestore('direct'), contentstore(), old_location, root_dir, name, modulestore())
-
-            logging.debug('tar file being generated at {0}'.format(export_file.name))
-            with tarfile.open(name=export_file.name, mode='w:gz') as tar_file:
-                tar_file.add(root_dir / name, arcname=name)
-        except SerializationError, e:
-            logging.exception('There was an error exporting course {0}. {1}'.format(course_module.location, unicode(e)))
-            unit = None
-            failed_item = None
-            parent = None
+        job_id = request.GET.get('export_job')
+        if job_id:
             try:
-                failed_item = modulestore().get_instance(course_module.location.course_id, e.location)
-                parent_locs = modulestore().get_parent_locations(failed_item.location, course_module.location.course_id)
-
-                if len(parent_locs) > 0:
-                    parent = modulestore().get_item(parent_locs[0])
-                    if parent.location.category == 'vertical':
-                        unit = parent
-            except:
-                # if we have a nested exception, then we'll show the more generic error message
-                pass
-
-            unit_locator = loc_mapper().translate_location(old_location.course_id, parent.location, False, True)
-
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'raw_err_msg': str(e),
-                'failed_module': failed_item,
-                'unit': unit,
-                'edit_unit_url': unit_locator.url_reverse("unit") if parent else "",
-                'course_home_url': location.url_reverse("course"),
-                'export_url': export_url
-            })
-        except Exception, e:
-            logging.exception('There was an error exporting course {0}. {1}'.format(course_module.location, unicode(e)))
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'unit': None,
-                'raw_err_msg': str(e),
-                'course_home_url': location.url_reverse("course"),
-                'export_url': export_url
-            })
-        finally:
-            shutil.rmtree(root_dir / name)
-
-        wrapper = FileWrapper(export_file)
-        response = HttpResponse(wrapper, content_type='application/x-tgz')
-        response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(export_file.name)
-        response['Content-Length'] = os.path.getsize(export_file.name)
-        return response
+                job = CourseExportJob.objects.get(id=job_id, course_location=old_location.url())
+            except (CourseExportJob.DoesNotExist, ValueError):
+                return HttpResponseNotFound()
+            if job.is_stale:
+                _start_export(job)
+        else:
+            version = course_export_version(old_location)
+            response = _export_file_response(old_location, version)
+            if response is not None:
+                return response
+
+            jobs = CourseExportJob.objects.filter(
+                course_location=old_location.url(), version=version, failed=False
+            ).order_by('-created')[:1]
+            if jobs and not jobs[0].succeeded:
+                # already being exported
+                job = jobs[0]
+                if job.is_stale:
+                    _start_export(job)
+            else:
+                job = CourseExportJob.objects.create(
+                    package_id=location.package_id,
+                    user=request.user,
+                    course_location=old_location.url(),
+                    version=version,
+                )
+                _start_export(job)
+            job = CourseExportJob.objects.get(id=job.id)
+
+        if job.failed:
+            return _export_error_response(location, old_location, course_module, job, export_url)
+        if job.succeeded:
+            response = _export_file_response(old_location, job.version)
+            if response is not None:
+                return response
+            # replaced by the export of a newer version
+            return redirect(export_url)
+        return render_to_response('export.html', {
+            'context_course': course_module,
+            'in_progress': True,
+            'export_url': export_url,
+            'export_job_url': export_url + '&export_job={}'.format(job.id),
+        })
 
     elif 'text/html' in requested_format:
         return render_to_response('export.html', {
@@ -387,3 +288,76 @@ def export_handler(request, tag=None, package_id=None, branch=None, version_guid
     else:
         # Only HTML or x-tgz request formats are supported (no JSON).
         return HttpResponse(status=406)
+
+
+def _start_export(job):
+    """
+    Queue the task running the CourseExportJob job, again if its task was lost.
+    """
+    # marks the job as queued now, and commits it so that the worker finds it
+    # before the transaction of the request ends
+    job.save()
+    transaction.commit()
+    export_course.delay(job.id)
+
+
+def _export_file_response(course_location, version):
+    """
+    Return the response sending the tar.gz file of the export of the given version of the course,
+    or None if there is no such file.
+    """
+    export_path = course_export_path(course_location, version)
+    try:
+        export_file = open(export_path, 'rb')
+    except IOError:
+        return None
+    response = HttpResponse(FileWrapper(export_file), content_type='application/x-tgz')
+    response['Content-Disposition'] = 'attachment; filename=%s' % (course_location.name + '.tar.gz')
+    response['Content-Length'] = os.fstat(export_file.fileno()).st_size
+    return response
+
+
+def _export_error_response(location, old_location, course_module, job, export_url):
+    """
+    Return the HTML page describing the failure of the CourseExportJob job.
+    """
+    if not job.failed_location:
+        return render_to_response('export.html', {
+            'context_course': course_module,
+            'in_err': True,
+            'unit': None,
+            'raw_err_msg': job.error_message,
+            'course_home_url': location.url_reverse("course"),
+            'export_url': export_url
+        })
+
+    unit = None
+    failed_item = None
+    parent = None
+    try:
+        failed_item = modulestore().get_instance(old_location.course_id, Location(job.failed_location))
+        parent_locs = modulestore().get_parent_locations(failed_item.location, old_location.course_id)
+
+        if len(parent_locs) > 0:
+            parent = modulestore().get_item(parent_locs[0])
+            if parent.location.category == 'vertical':
+                unit = parent
+    except:
+        # if we have a nested exception, then we'll show the more generic error message
+        pass
+
+    edit_unit_url = ""
+    if parent:
+        unit_locator = loc_mapper().translate_location(old_location.course_id, parent.location, False, True)
+        edit_unit_url = unit_locator.url_reverse("unit")
+
+    return render_to_response('export.html', {
+        'context_course': course_module,
+        'in_err': True,
+        'raw_err_msg': job.error_message,
+        'failed_module': failed_item,
+        'unit': unit,
+        'edit_unit_url': edit_unit_url,
+        'course_home_url': location.url_reverse("course"),
+        'export_url': export_url
+    })
@@ -10,7 +10,10 @@ from datetime import datetime
 from io import BytesIO
 from pytz import UTC
 import json
+from mock import patch
+from PIL import Image
 from contentstore.tests.utils import CourseTestCase
+from contentstore.tasks import generate_derived_assets
 from contentstore.views import assets
 from xmodule.contentstore.content import StaticContent
 from xmodule.modulestore import Location
@@ -134,6 +137,72 @@ class UploadTestCase(AssetsTestCase):
         self.assertEquals(resp.status_code, 400)
 
 
+class DerivedAssetsTestCase(AssetsTestCase):
+    """
+    Unit tests for the generation of the thumbnails of uploaded images
+    """
+    def upload_image(self, data=None):
+        """Upload a PNG image and return the json of the asset."""
+        if data is None:
+            image_file = BytesIO()
+            Image.new('RGB', (400, 300)).save(image_file, 'PNG')
+            data = image_file.getvalue()
+        upload_file = BytesIO(data)
+        upload_file.name = 'image.png'
+        resp = self.client.post(self.url, {"name": "image", "file": upload_file})
+        self.assertEquals(resp.status_code, 200)
+        return json.loads(resp.content)['asset']
+
+    def get_attr(self, attr):
+        """Return the given attribute of the uploaded image."""
+        location = StaticContent.compute_location(self.course.location.org, self.course.location.course, 'image.png')
+        return contentstore().get_attr(location, attr)
+
+    def test_thumbnail_pending(self):
+        with patch('contentstore.tasks.generate_derived_assets.delay') as mock_delay:
+            asset = self.upload_image()
+        self.assertEquals(mock_delay.call_count, 1)
+        self.assertIsNone(asset['thumbnail'])
+        self.assertEquals(asset['thumbnail_status'], 'pending')
+        self.assertEquals(self.get_attr('thumbnail_status'), 'pending')
+
+    def test_thumbnail_ready(self):
+        # tasks run synchronously in tests
+        asset = self.upload_image()
+        self.assertIsNotNone(asset['thumbnail'])
+        self.assertEquals(asset['thumbnail_status'], 'ready')
+        thumbnail = contentstore().find(StaticContent.get_location_from_path(asset['thumbnail']))
+        self.assertEquals(Image.open(BytesIO(thumbnail.data)).size, (128, 96))
+
+    @override_settings(ASSET_WEB_RENDITION_MAX_SIZE=[200, 200])
+    def test_web_rendition(self):
+        self.upload_image()
+        rendition = contentstore().find(Location(self.get_attr('web_rendition_location')))
+        self.assertEquals(Image.open(BytesIO(rendition.data)).size, (200, 150))
+
+    @override_settings(ASSET_WEB_RENDITION_MAX_SIZE=[200, 200])
+    def test_web_rendition_locked(self):
+        asset = self.upload_image()
+        rendition_location = Location(self.get_attr('web_rendition_location'))
+        self.assertFalse(contentstore().find(rendition_location).locked)
+
+        # locking the image locks its rendition
+        asset['locked'] = True
+        resp = self.client.post(self.url, json.dumps(asset), "application/json")
+        self.assertEquals(resp.status_code, 201)
+        self.assertTrue(contentstore().find(rendition_location).locked)
+
+        # and the rendition of a locked image is made locked
+        contentstore().delete(contentstore().find(rendition_location).get_id())
+        generate_derived_assets(StaticContent.get_location_from_path(asset['url']).url())
+        self.assertTrue(contentstore().find(rendition_location).locked)
+
+    def test_thumbnail_failed(self):
+        asset = self.upload_image('not an image')
+        self.assertIsNone(asset['thumbnail'])
+        self.assertEquals(self.get_attr('thumbnail_status'), 'failed')
+
+
 class AssetToJsonTestCase(AssetsTestCase):
     """
     Unit test for transforming asset information into something
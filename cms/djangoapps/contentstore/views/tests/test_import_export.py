@@ -9,15 +9,21 @@ import copy
 from path import path
 import json
 import logging
+from datetime import timedelta
 from uuid import uuid4
+from mock import patch
 from pymongo import MongoClient
+from StringIO import StringIO
 
+from contentstore.models import CourseExportJob, CourseImportJob
+from contentstore.tasks import MAX_IMPORT_ATTEMPTS, course_import_subdir, export_course, import_course
 from contentstore.tests.utils import CourseTestCase
 from django.test.utils import override_settings
 from django.conf import settings
-from xmodule.modulestore.django import loc_mapper
+from xmodule.modulestore.django import loc_mapper, modulestore
 
-from xmodule.contentstore.django import _CONTENTSTORE
+from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.django import _CONTENTSTORE, contentstore
 from xmodule.modulestore.tests.factories import ItemFactory
 
 TEST_DATA_CONTENTSTORE = copy.deepcopy(settings.CONTENTSTORE)
@@ -72,6 +78,13 @@ class ImportTestCase(CourseTestCase):
         MongoClient().drop_database(TEST_DATA_CONTENTSTORE['DOC_STORE_CONFIG']['db'])
         _CONTENTSTORE.clear()
 
+    def _import_status(self, filename):
+        """ Return the parsed response of `import_status` for the file """
+        resp_status = self.client.get(
+            self.new_location.url_reverse('import_status', os.path.split(filename)[1])
+        )
+        return json.loads(resp_status.content)
+
     def test_no_coursexml(self):
         """
         Check that the response for a tar.gz import without a course.xml is
@@ -84,28 +97,68 @@ class ImportTestCase(CourseTestCase):
                     "name": self.bad_tar,
                     "course-data": [btar]
                 })
-        self.assertEquals(resp.status_code, 415)
+        self.assertEquals(resp.status_code, 200)
         # Check that `import_status` returns the appropriate stage (i.e., the
         # stage at which import failed).
-        resp_status = self.client.get(
-            self.new_location.url_reverse(
-                'import_status',
-                os.path.split(self.bad_tar)[1]
-            )
-        )
-
-        self.assertEquals(json.loads(resp_status.content)["ImportStatus"], 2)
+        status = self._import_status(self.bad_tar)
+        self.assertEquals(status["ImportStatus"], -2)
+        self.assertIn("course.xml", status["Message"])
 
     def test_with_coursexml(self):
         """
         Check that the response for a tar.gz import with a course.xml is
         correct.
         """
+        self.assertEquals(self._import_status(self.good_tar)["ImportStatus"], 0)
         with open(self.good_tar) as gtar:
             args = {"name": self.good_tar, "course-data": [gtar]}
             resp = self.client.post(self.url, args)
 
         self.assertEquals(resp.status_code, 200)
+        # the import ran in the (eager) celery task
+        self.assertEquals(json.loads(resp.content)["ImportStatus"], 4)
+        self.assertEquals(self._import_status(self.good_tar)["ImportStatus"], 4)
+        self.assertEquals(CourseImportJob.objects.get().phase, CourseImportJob.PHASE_DRAFTS)
+
+    def test_restarted_import(self):
+        """
+        Check that an import started again, as after its worker died, succeeds
+        """
+        job = CourseImportJob.objects.create(
+            package_id=self.new_location.package_id,
+            filename="good.tar.gz",
+            user=self.user,
+            course_location=self.course.location.url(),
+            stage=CourseImportJob.UPDATING,
+            attempts=1,
+        )
+        course_dir = path(settings.GITHUB_REPO_ROOT) / course_import_subdir(self.course.location)
+        course_dir.makedirs_p()
+        shutil.copy(self.good_tar, course_dir)
+        # the leftovers of the interrupted attempt
+        (course_dir / "course").makedirs_p()
+
+        import_course(job.id)
+
+        job = CourseImportJob.objects.get(id=job.id)
+        self.assertEquals(job.status, CourseImportJob.SUCCEEDED)
+        self.assertEquals(job.attempts, 2)
+        self.assertFalse(course_dir.exists())
+
+    def test_import_gives_up(self):
+        """
+        Check that an import which keeps killing its workers isn't started again
+        """
+        job = CourseImportJob.objects.create(
+            package_id=self.new_location.package_id,
+            filename="good.tar.gz",
+            user=self.user,
+            course_location=self.course.location.url(),
+            stage=CourseImportJob.UPDATING,
+            attempts=MAX_IMPORT_ATTEMPTS,
+        )
+        import_course(job.id)
+        self.assertEquals(CourseImportJob.objects.get(id=job.id).status, -CourseImportJob.UPDATING)
 
     ## Unsafe tar methods #####################################################
     # Each of these methods creates a tarfile with a single type of unsafe
@@ -181,26 +234,21 @@ class ImportTestCase(CourseTestCase):
             with open(tarpath) as tar:
                 args = {"name": tarpath, "course-data": [tar]}
                 resp = self.client.post(self.url, args)
-            self.assertEquals(resp.status_code, 400)
-            self.assertTrue("SuspiciousFileOperation" in resp.content)
+            self.assertEquals(resp.status_code, 200)
+            status = self._import_status(tarpath)
+            self.assertEquals(status["ImportStatus"], -1)
+            self.assertTrue("SuspiciousFileOperation" in status["Message"])
 
         try_tar(self._fifo_tar())
         try_tar(self._symlink_tar())
         try_tar(self._outside_tar())
         try_tar(self._outside_tar2())
-        # Check that `import_status` returns the appropriate stage (i.e.,
-        # either 3, indicating all previous steps are completed, or 0,
-        # indicating no upload in progress)
-        resp_status = self.client.get(
-            self.new_location.url_reverse(
-                'import_status',
-                os.path.split(self.good_tar)[1]
-            )
-        )
-        import_status = json.loads(resp_status.content)["ImportStatus"]
-        self.assertIn(import_status, (0, 3))
+        # Check that `import_status` of a file which wasn't uploaded returns
+        # 0, indicating no upload in progress
+        self.assertEquals(self._import_status(self.good_tar)["ImportStatus"], 0)
 
 
+@override_settings(CONTENTSTORE=TEST_DATA_CONTENTSTORE)
 @override_settings(CONTENTSTORE=TEST_DATA_CONTENTSTORE)
 class ExportTestCase(CourseTestCase):
     """
@@ -214,6 +262,11 @@ class ExportTestCase(CourseTestCase):
         location = loc_mapper().translate_location(self.course.location.course_id, self.course.location, False, True)
         self.url = location.url_reverse('export/', '')
 
+    def tearDown(self):
+        shutil.rmtree(settings.COURSE_EXPORT_ROOT, ignore_errors=True)
+        MongoClient().drop_database(TEST_DATA_CONTENTSTORE['DOC_STORE_CONFIG']['db'])
+        _CONTENTSTORE.clear()
+
     def test_export_html(self):
         """
         Get the HTML for the page.
@@ -248,6 +301,90 @@ class ExportTestCase(CourseTestCase):
         self.assertEquals(resp.status_code, 200)
         self.assertTrue(resp.get('Content-Disposition').startswith('attachment'))
 
+    def test_export_assets(self):
+        """
+        The assets are streamed into the tar.gz file, along with their policy file.
+        """
+        content_location = StaticContent.compute_location(
+            self.course.location.org, self.course.location.course, 'sample.txt'
+        )
+        contentstore().save(StaticContent(content_location, 'sample.txt', 'text/plain', 'sample content'))
+
+        resp = self.client.get(self.url, HTTP_ACCEPT='application/x-tgz')
+        self._verify_export_succeeded(resp)
+        with tarfile.open(fileobj=StringIO(''.join(resp)), mode='r:gz') as tar_file:
+            self.assertEquals(tar_file.extractfile('Robot_Super_Course/static/sample.txt').read(), 'sample content')
+            policy = json.load(tar_file.extractfile('Robot_Super_Course/policies/assets.json'))
+            self.assertEquals(policy['sample.txt']['contentType'], 'text/plain')
+            self.assertIn('Robot_Super_Course/course.xml', tar_file.getnames())
+
+    def test_export_reused(self):
+        """
+        An unchanged course is not exported again, even once its cached structure is recomputed.
+        """
+        self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+        modulestore().refresh_cached_metadata_inheritance_tree(self.course.location)
+        with patch('contentstore.views.import_export.export_course.delay') as mock_export:
+            self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+            self.assertFalse(mock_export.called)
+
+    def test_export_after_change(self):
+        """
+        The course is exported again once it changed, and the previous export removed.
+        """
+        self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+        ItemFactory.create(parent_location=self.course.location, category='chapter', display_name='new')
+        self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+        self.assertEquals(CourseExportJob.objects.count(), 2)
+        self.assertEquals(len(path(settings.COURSE_EXPORT_ROOT).files('*.tar.gz')), 1)
+
+    def test_export_after_content_change(self):
+        """
+        Changing only the content of a module, not the structure of the course, exports it again.
+        """
+        html = ItemFactory.create(parent_location=self.course.location, category='html', data='<p>before</p>')
+        self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+        html.data = '<p>after</p>'
+        modulestore().update_item(html)
+        self._verify_export_succeeded(self.client.get(self.url, HTTP_ACCEPT='application/x-tgz'))
+        self.assertEquals(CourseExportJob.objects.count(), 2)
+
+    def test_export_in_progress(self):
+        """
+        A page asking again for the export is returned while it runs.
+        """
+        with patch('contentstore.views.import_export.export_course.delay') as mock_export:
+            resp = self.client.get(self.url, HTTP_ACCEPT='application/x-tgz')
+            resp_again = self.client.get(self.url, HTTP_ACCEPT='application/x-tgz')
+        self.assertEquals(mock_export.call_count, 1)
+        for response in (resp, resp_again):
+            self.assertEquals(response.status_code, 200)
+            self.assertIsNone(response.get('Content-Disposition'))
+            self.assertContains(response, 'Your course is being exported')
+
+        job = CourseExportJob.objects.get()
+        export_course(job.id)
+        resp = self.client.get(self.url + '?_accept=application/x-tgz&export_job={}'.format(job.id))
+        self._verify_export_succeeded(resp)
+
+    def test_export_lost(self):
+        """
+        An export whose task was lost is queued again.
+        """
+        with patch('contentstore.views.import_export.export_course.delay') as mock_export:
+            self.client.get(self.url, HTTP_ACCEPT='application/x-tgz')
+            job = CourseExportJob.objects.get()
+            export_url = self.url + '?_accept=application/x-tgz&export_job={}'.format(job.id)
+            self.client.get(export_url)
+            self.assertEquals(mock_export.call_count, 1)
+
+            CourseExportJob.objects.filter(id=job.id).update(
+                modified=job.modified - CourseExportJob.NOT_STARTED_TIMEOUT - timedelta(seconds=1)
+            )
+            self.client.get(export_url)
+            self.assertEquals(mock_export.call_count, 2)
+            self.assertFalse(CourseExportJob.objects.get(id=job.id).is_stale)
+
     def test_export_failure_top_level(self):
         """
         Export failure.
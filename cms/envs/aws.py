@@ -130,6 +130,13 @@ if 'loc_cache' not in CACHES:
         'LOCATION': 'edx_location_mem_cache',
     }
 
+# Local disk cache for the data of assets too big for the cache
+CONTENT_DISK_CACHE_DIR = ENV_TOKENS.get('CONTENT_DISK_CACHE_DIR', None)
+CONTENT_DISK_CACHE_MAX_SIZE = ENV_TOKENS.get('CONTENT_DISK_CACHE_MAX_SIZE', 1024 * 1024 * 1024)
+
+ASSET_WEB_RENDITION_MAX_SIZE = ENV_TOKENS.get('ASSET_WEB_RENDITION_MAX_SIZE', ASSET_WEB_RENDITION_MAX_SIZE)
+COURSE_EXPORT_ROOT = ENV_TOKENS.get('COURSE_EXPORT_ROOT', COURSE_EXPORT_ROOT)
+
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
 
@@ -446,6 +446,17 @@ CELERY_QUEUES = {
 }
 
 
+############################## Assets #########################################
+
+# The maximum [width, height] of the web-optimized renditions made of the uploaded
+# images, along with their thumbnail. None to make thumbnails only.
+ASSET_WEB_RENDITION_MAX_SIZE = None
+
+# The directory in which the tar.gz files of the exported courses are kept,
+# one per course, to be served again until the course changes. It must be
+# shared by the Studio servers and the celery workers.
+COURSE_EXPORT_ROOT = ENV_ROOT / "course_exports"
+
 ############################## Video ##########################################
 
 YOUTUBE = {
@@ -6,6 +6,7 @@ define(["backbone"], function(Backbone) {
     defaults: {
       display_name: "",
       thumbnail: "",
+      thumbnail_status: null,
       date_added: "",
       url: "",
       external_url: "",
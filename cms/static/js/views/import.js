@@ -41,7 +41,8 @@ define(
 
         /**
          * Check for import status updates every `timeout` milliseconds, and update
-         * the page accordingly.
+         * the page accordingly, until the import (which runs on the server after
+         * the upload) succeeds or fails.
          * @param {string} url Url to call for status updates.
          * @param {int} timeout Number of milliseconds to wait in between ajax calls
          *     for new updates.
@@ -50,11 +51,20 @@ define(
         var getStatus = function (url, timeout, stage) {
             var currentStage = stage || 0;
             if (CourseImport.stopGetStatus) { return ;}
+            if (currentStage == 4) {
+                CourseImport.displayFinishedImport();
+                return;
+            }
             updateStage(currentStage);
-            if (currentStage == 3 ) { return ;}
             var time = timeout || 1000;
             $.getJSON(url,
                 function (data) {
+                    if (data.ImportStatus < 0) {
+                        // the status of a failed import is the opposite of its stage
+                        CourseImport.stopGetStatus = true;
+                        CourseImport.onImportError(-data.ImportStatus, data.Message);
+                        return;
+                    }
                     setTimeout(function () {
                         getStatus(url, time, data.ImportStatus);
                     }, time);
@@ -74,6 +84,14 @@ define(
              */
             stopGetStatus: false,
 
+            /**
+             * Called with the stage and message of the error when the import fails
+             * on the server. Shows the error at its stage by default.
+             */
+            onImportError: function (stageNo, msg) {
+                CourseImport.stageError(stageNo, msg);
+            },
+
             /**
              * Update DOM to set all stages as not-started (for retrying an upload that
              * failed).
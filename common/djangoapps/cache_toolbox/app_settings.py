@@ -6,3 +6,11 @@ CACHE_TOOLBOX_DEFAULT_TIMEOUT = getattr(
     'CACHE_TOOLBOX_DEFAULT_TIMEOUT',
     60 * 60 * 24 * 3,
 )
+
+# Maximum total size, in bytes, of the asset data cached on the local disk
+# when CONTENT_DISK_CACHE_DIR is set
+CONTENT_DISK_CACHE_MAX_SIZE = getattr(
+    settings,
+    'CONTENT_DISK_CACHE_MAX_SIZE',
+    1024 * 1024 * 1024,
+)
@@ -8,10 +8,14 @@ Core methods
 
 """
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import DEFAULT_DB_ALIAS
 
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+
 from . import app_settings
+from .disk_cache import DiskCache
 
 
 def get_instance(model, instance_or_pk, timeout=None, using=None):
@@ -119,3 +123,110 @@ def get_cached_content(location):
 
 def del_cached_content(location):
     cache.delete(unicode(location).encode("utf-8"))
+    disk_cache = content_disk_cache()
+    if disk_cache is not None:
+        disk_cache.delete(location)
+
+
+_CONTENT_DISK_CACHES = {}
+
+
+def content_disk_cache():
+    """
+    Returns the local disk cache for the data of assets too big for the cache,
+    or None if ``CONTENT_DISK_CACHE_DIR`` isn't set.
+    """
+    root = getattr(settings, 'CONTENT_DISK_CACHE_DIR', None)
+    if root is None:
+        return None
+    if root not in _CONTENT_DISK_CACHES:
+        _CONTENT_DISK_CACHES[root] = DiskCache(
+            root, getattr(settings, 'CONTENT_DISK_CACHE_MAX_SIZE', app_settings.CONTENT_DISK_CACHE_MAX_SIZE)
+        )
+    return _CONTENT_DISK_CACHES[root]
+
+
+def set_disk_cached_content(content):
+    """
+    Returns a copy of the streamed ``content`` which copies its data to the
+    local disk cache as it is streamed in full, and then caches its metadata,
+    without its data, in the cache. Streaming a range of it caches nothing.
+    Returns None if it can't be cached on the disk, eg as it's bigger than the
+    whole disk cache, in which case ``content`` is left untouched.
+    """
+    disk_cache = content_disk_cache()
+    if disk_cache is None or not content.content_digest:
+        return None
+    if content.length is None or content.length > disk_cache.max_size:
+        return None
+    return DiskCachingContentStream(content, disk_cache)
+
+
+class DiskCachingContentStream(StaticContentStream):
+    """
+    The streamed content of ``set_disk_cached_content``, which streams the
+    data of the content it wraps.
+    """
+    def __init__(self, content, disk_cache):
+        super(DiskCachingContentStream, self).__init__(
+            content.location, content.name, content.content_type, None,
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, locked=content.locked,
+            content_digest=content.content_digest
+        )
+        self._content = content
+        self._disk_cache = disk_cache
+
+    def stream_data(self):
+        # the copy is only kept if all of the data was streamed
+        writer = self._disk_cache.writer(self.location, self.content_digest)
+        try:
+            for chunk in self._content.stream_data():
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+            if writer is not None and writer.commit():
+                set_cached_content(StaticContent(
+                    self.location, self.name, self.content_type, None,
+                    last_modified_at=self.last_modified_at, thumbnail_location=self.thumbnail_location,
+                    import_path=self.import_path, length=self.length, locked=self.locked,
+                    content_digest=self.content_digest
+                ))
+        finally:
+            if writer is not None:
+                writer.abort()
+
+    def stream_data_in_range(self, first_byte, last_byte):
+        return self._content.stream_data_in_range(first_byte, last_byte)
+
+    def close(self):
+        self._content.close()
+
+    def copy_to_in_mem(self):
+        return self._content.copy_to_in_mem()
+
+
+def get_disk_cached_content(metadata):
+    """
+    Returns the content described by the cached ``metadata`` streamed from
+    the local disk cache, or None if this host doesn't have its data.
+    """
+    disk_cache = content_disk_cache()
+    if disk_cache is None:
+        return None
+    cached_file = disk_cache.open(metadata.location, metadata.content_digest)
+    if cached_file is None:
+        return None
+    return _content_stream(metadata, cached_file)
+
+
+def _content_stream(content, stream):
+    """
+    Returns a copy of ``content`` streaming its data from ``stream``.
+    """
+    return StaticContentStream(
+        content.location, content.name, content.content_type, stream,
+        last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+        import_path=content.import_path, length=content.length, locked=content.locked,
+        content_digest=content.content_digest
+    )
@@ -0,0 +1,193 @@
+"""
+A size-bounded cache of files on the local disk, evicting the least recently
+used ones. Used to keep the data of assets too big for memcached close to the
+app servers.
+
+Files are named after the hash of their key and a digest of their content, so
+a file is never served for a key once the content it was cached from changes,
+even if this host wasn't the one told about the change.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+log = logging.getLogger(__name__)
+
+
+class DiskCache(object):
+    """
+    Caches files under `root`, keeping their total size under `max_size` bytes.
+    Safe to share between the processes of a host.
+    """
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        if not os.path.isdir(root):
+            try:
+                os.makedirs(root)
+            except OSError:
+                # another process may have created it meanwhile
+                if not os.path.isdir(root):
+                    raise
+
+    def _key_prefix(self, key):
+        """
+        The start of the names of the files cached for key
+        """
+        return hashlib.sha1(unicode(key).encode('utf-8')).hexdigest() + '-'
+
+    def path(self, key, digest):
+        """
+        The path of the file cached for the given key and content digest
+        """
+        return os.path.join(self.root, self._key_prefix(key) + digest)
+
+    def open(self, key, digest):
+        """
+        Return the file cached for the given key and content digest, opened for
+        reading, or None if it isn't cached.
+        """
+        path = self.path(key, digest)
+        try:
+            cached_file = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            # record the use, for the eviction of the least recently used files
+            os.utime(path, None)
+        except OSError:
+            pass
+        return cached_file
+
+    def writer(self, key, digest):
+        """
+        Return a DiskCacheWriter writing a file into the cache for the given key
+        and content digest, or None if it can't be created.
+        """
+        try:
+            return DiskCacheWriter(self, key, digest)
+        except (IOError, OSError):
+            log.exception("Unable to cache %s on the disk", key)
+            return None
+
+    def add(self, key, digest, chunks):
+        """
+        Write the content made of the given iterable of chunks into the cache, for
+        the given key and content digest, and return the cached file opened for
+        reading. Return None if the content is bigger than the whole cache.
+        """
+        writer = self.writer(key, digest)
+        if writer is None:
+            return None
+        for chunk in chunks:
+            if not writer.write(chunk):
+                break
+        if not writer.commit():
+            return None
+        return self.open(key, digest)
+
+    def delete(self, key):
+        """
+        Remove all the files cached for key, whatever their content digest
+        """
+        prefix = self._key_prefix(key)
+        for name in os.listdir(self.root):
+            if name.startswith(prefix):
+                self._remove(os.path.join(self.root, name))
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache fits in max_size
+        """
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.root):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for __, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    def _remove(self, path):
+        """
+        Remove the file at path, if it's still there
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class DiskCacheWriter(object):
+    """
+    Writes a file into a DiskCache chunk by chunk, eg while its content is
+    streamed to a client. The file is only put in the cache by `commit`, and is
+    dropped by `abort` or as soon as it is bigger than the whole cache.
+    """
+    def __init__(self, disk_cache, key, digest):
+        self.disk_cache = disk_cache
+        self.key = key
+        self.digest = digest
+        self.size = 0
+        handle, self.temp_path = tempfile.mkstemp(dir=disk_cache.root, prefix='.tmp-')
+        self.temp_file = os.fdopen(handle, 'wb')
+
+    def write(self, chunk):
+        """
+        Append the chunk to the file, and return whether it is still being written
+        """
+        if self.temp_file is None:
+            return False
+        self.size += len(chunk)
+        if self.size > self.disk_cache.max_size:
+            self.abort()
+            return False
+        try:
+            self.temp_file.write(chunk)
+        except (IOError, OSError):
+            log.exception("Unable to cache %s on the disk", self.key)
+            self.abort()
+            return False
+        return True
+
+    def commit(self):
+        """
+        Put the file written in the cache, and return whether it was
+        """
+        if self.temp_file is None:
+            return False
+        try:
+            self.temp_file.close()
+            self.temp_file = None
+            # renaming is atomic, so concurrent readers never see a partial file
+            os.rename(self.temp_path, self.disk_cache.path(self.key, self.digest))
+        except (IOError, OSError):
+            log.exception("Unable to cache %s on the disk", self.key)
+            self.abort()
+            return False
+        self.temp_path = None
+        self.disk_cache.evict()
+        return True
+
+    def abort(self):
+        """
+        Drop the file written, unless it was committed
+        """
+        if self.temp_file is not None:
+            self.temp_file.close()
+            self.temp_file = None
+        if self.temp_path is not None:
+            self.disk_cache._remove(self.temp_path)  # pylint: disable=protected-access
+            self.temp_path = None
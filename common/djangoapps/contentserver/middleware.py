@@ -1,13 +1,49 @@
+import calendar
+import re
+
 from django.http import (HttpResponse, HttpResponseNotModified,
     HttpResponseForbidden)
+from django.utils.http import http_date, parse_http_date_safe
 from student.models import CourseEnrollment
 
 from xmodule.contentstore.django import contentstore
 from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
-from cache_toolbox.core import get_cached_content, set_cached_content
+from cache_toolbox.core import (get_cached_content, set_cached_content,
+    get_disk_cached_content, set_disk_cached_content)
 from xmodule.exceptions import NotFoundError
 
+# a single byte range: "bytes=first-last", "bytes=first-" or "bytes=-suffix_length"
+BYTE_RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def parse_range_header(header_value, content_length):
+    """
+    Return the (first_byte, last_byte) pair, both inclusive, requested by the
+    Range header_value for content of the given length. Return None if the
+    header can't be parsed or asks for several ranges, in which case the whole
+    content should be served. Raise ValueError if the range can't be satisfied.
+    """
+    match = BYTE_RANGE_RE.match(header_value)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # the last `last` bytes
+        suffix_length = int(last)
+        if suffix_length == 0 or content_length == 0:
+            raise ValueError(header_value)
+        return max(content_length - suffix_length, 0), content_length - 1
+    first_byte = int(first)
+    last_byte = int(last) if last != '' else content_length - 1
+    if last_byte < first_byte:
+        return None
+    if first_byte >= content_length:
+        raise ValueError(header_value)
+    return first_byte, min(last_byte, content_length - 1)
+
 
 class StaticContentServer(object):
     def process_request(self, request):
@@ -23,6 +59,9 @@ class StaticContentServer(object):
 
             # first look in our cache so we don't have to round-trip to the DB
             content = get_cached_content(loc)
+            if content is not None and content.data is None:
+                # only the metadata of big assets is cached, their data may be on this host's disk
+                content = get_disk_cached_content(content)
             if content is None:
                 # nope, not in cache, let's fetch from DB
                 try:
@@ -33,12 +72,17 @@ class StaticContentServer(object):
                     return response
 
                 # since we fetched it from DB, let's cache it going forward, but only if it's < 1MB
-                # this is because I haven't been able to find a means to stream data out of memcached
+                # this is because I haven't been able to find a means to stream data out of memcached.
+                # Bigger assets are streamed, so memory use stays bounded.
                 if content.length is not None:
                     if content.length < 1048576:
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
                         content = content.copy_to_in_mem()
                         set_cached_content(content)
+                    else:
+                        # bigger ones are copied to the local disk as they are streamed
+                        # in full, if they fit in its cache
+                        content = set_disk_cached_content(content) or content
             else:
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
@@ -52,18 +96,92 @@ class StaticContentServer(object):
                         request.user, course_partial_id):
                     return HttpResponseForbidden('Unauthorized')
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            last_modified_at_str = http_date(self._last_modified_timestamp(content))
+            content_digest = getattr(content, 'content_digest', None)
+            etag = '"{0}"'.format(content_digest) if content_digest else None
 
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            # see if the client has cached this content, if so then just return a 304 (Not Modified)
+            if self._is_not_modified(request, content, etag):
+                response = HttpResponseNotModified()
+                self._set_validators(response, last_modified_at_str, etag)
+                return response
 
-            response = HttpResponse(content.stream_data(), content_type=content.content_type)
-            response['Last-Modified'] = last_modified_at_str
+            response = None
+            if content.length is not None and 'HTTP_RANGE' in request.META and self._if_range_matches(
+                    request, content, etag):
+                try:
+                    byte_range = parse_range_header(request.META['HTTP_RANGE'], content.length)
+                except ValueError:
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */{0}'.format(content.length)
+                    return response
+
+                if byte_range is not None:
+                    first_byte, last_byte = byte_range
+                    response = HttpResponse(
+                        content.stream_data_in_range(first_byte, last_byte), content_type=content.content_type
+                    )
+                    response.status_code = 206
+                    response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(first_byte, last_byte, content.length)
+                    response['Content-Length'] = str(last_byte - first_byte + 1)
+
+            if response is None:
+                response = HttpResponse(content.stream_data(), content_type=content.content_type)
+                if content.length is not None:
+                    response['Content-Length'] = str(content.length)
+
+            response['Accept-Ranges'] = 'bytes'
+            self._set_validators(response, last_modified_at_str, etag)
 
             return response
+
+    @staticmethod
+    def _last_modified_timestamp(content):
+        """
+        Return the DB persistent last modified time of the content as seconds since the epoch,
+        at the one second resolution of HTTP dates
+        """
+        return calendar.timegm(content.last_modified_at.utctimetuple())
+
+    @staticmethod
+    def _set_validators(response, last_modified_at_str, etag):
+        """
+        Set the headers letting the client make conditional requests for the content
+        """
+        response['Last-Modified'] = last_modified_at_str
+        if etag is not None:
+            response['ETag'] = etag
+
+    def _is_not_modified(self, request, content, etag):
+        """
+        Whether the client's copy of the content is still current, per its conditional
+        headers. If-None-Match takes precedence over If-Modified-Since.
+        """
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            if etag is None:
+                return False
+            client_etags = [tag.strip() for tag in request.META['HTTP_IF_NONE_MATCH'].split(',')]
+            return etag in client_etags or '*' in client_etags
+
+        if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            if_modified_since = parse_http_date_safe(request.META['HTTP_IF_MODIFIED_SINCE'])
+            return (
+                if_modified_since is not None and
+                self._last_modified_timestamp(content) <= if_modified_since
+            )
+
+        return False
+
+    def _if_range_matches(self, request, content, etag):
+        """
+        Whether the Range header should be honored: it should be ignored, and the whole
+        content served, if the If-Range validator doesn't match the current content.
+        """
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # weak etags can't be used with ranges
+            return etag is not None and if_range == etag
+        return parse_http_date_safe(if_range) == self._last_modified_timestamp(content)
@@ -134,3 +134,63 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         resp = self.client.get(self.url_locked)
         self.assertEqual(resp.status_code, 200) # pylint: disable=E1103
 
+
+    def test_range_request_full_file(self):
+        """
+        Test that a range request for the whole file returns it all as partial content.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        length = self.contentstore.find(self.loc_unlocked).length
+        self.assertEqual(resp['Content-Range'], 'bytes 0-{0}/{1}'.format(length - 1, length))
+        self.assertEqual(resp['Content-Length'], str(length))
+
+    def test_range_request_partial_file(self):
+        """
+        Test that a range request returns just the requested bytes.
+        """
+        data = self.contentstore.find(self.loc_unlocked).data
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, data[2:5])
+        self.assertEqual(resp['Content-Range'], 'bytes 2-4/{0}'.format(len(data)))
+
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=-3')
+        self.assertEqual(resp.status_code, 206)  # pylint: disable=E1103
+        self.assertEqual(resp.content, data[-3:])
+
+    def test_range_request_unsatisfiable(self):
+        """
+        Test that a range request starting past the end of the file is refused.
+        """
+        length = self.contentstore.find(self.loc_unlocked).length
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={0}-'.format(length))
+        self.assertEqual(resp.status_code, 416)  # pylint: disable=E1103
+        self.assertEqual(resp['Content-Range'], 'bytes */{0}'.format(length))
+
+    def test_range_request_malformed(self):
+        """
+        Test that a range header which can't be parsed is ignored.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-1,3-4')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+
+    def test_conditional_get(self):
+        """
+        Test that the ETag and Last-Modified validators let the client revalidate its copy.
+        """
+        resp = self.client.get(self.url_unlocked)
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+        etag = resp['ETag']
+        self.assertEqual(etag, '"{0}"'.format(self.contentstore.find(self.loc_unlocked).content_digest))
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
+
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)  # pylint: disable=E1103
+        resp = self.client.get(self.url_unlocked, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(resp.status_code, 200)  # pylint: disable=E1103
@@ -1,12 +1,12 @@
 import logging
 
-from django.db import models
+from django.db import models, IntegrityError
 from django.contrib.auth.models import User
 
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.utils.translation import ugettext_noop
-from student.models import CourseEnrollment
+from student.models import CourseEnrollment, bulk_enroll_done
 
 from xmodule.modulestore.django import modulestore
 from xmodule.course_module import CourseDescriptor
@@ -39,6 +39,26 @@ def assign_default_role_on_enrollment(sender, instance, **kwargs):
     assign_default_role(instance.course_id, instance.user)
 
 
+@receiver(bulk_enroll_done)
+def assign_default_role_on_bulk_enrollment(sender, course_id, user_ids, **kwargs):
+    """
+    Assign forum default role 'Student' to the users enrolled by
+    CourseEnrollment.bulk_enroll, in a few queries
+    """
+    role, __ = Role.objects.get_or_create(course_id=course_id, name="Student")
+    memberships = Role.users.through
+    existing = set(
+        memberships.objects.filter(role=role, user__in=user_ids).values_list('user_id', flat=True)
+    )
+    new_user_ids = [user_id for user_id in user_ids if user_id not in existing]
+    try:
+        memberships.objects.bulk_create(memberships(role=role, user_id=user_id) for user_id in new_user_ids)
+    except IntegrityError:
+        # Some of them got the role in the meantime, add them one by one
+        for user_id in new_user_ids:
+            role.users.add(user_id)
+
+
 def assign_default_role(course_id, user):
     """
     Assign forum default role 'Student' to user
@@ -34,6 +34,18 @@ class RoleAssignmentTest(TestCase):
         self.assertEqual([student_role], list(self.staff_user.roles.all()))
         self.assertEqual([student_role], list(self.student_user.roles.all()))
 
+    def test_bulk_enrollment_auto_role_creation(self):
+        other_course_id = "edX/Fake102/2012"
+        # the student already has the role, eg from an earlier enrollment
+        CourseEnrollment.enroll(self.student_user, other_course_id)
+        CourseEnrollment.unenroll(self.student_user, other_course_id)
+        new_student = User.objects.create_user("sol", "sol@fake.edx.org")
+
+        CourseEnrollment.bulk_enroll([self.student_user.id, new_student.id], other_course_id)
+        student_role = Role.objects.get(course_id=other_course_id, name="Student")
+        self.assertEqual([student_role], list(self.student_user.roles.filter(course_id=other_course_id)))
+        self.assertEqual([student_role], list(new_student.roles.all()))
+
     # The following was written on the assumption that unenrolling from a course
     # should remove all forum Roles for that student for that course. This is
     # not necessarily the case -- please see comments at the top of 
@@ -16,7 +16,7 @@ import json
 import logging
 from pytz import UTC
 import uuid
-from collections import defaultdict
+from collections import defaultdict, Counter
 from dogapi import dog_stats_api
 
 from django.conf import settings
@@ -40,13 +40,19 @@ from xmodule.modulestore import Location
 
 from course_modes.models import CourseMode
 import lms.lib.comment_client as cc
-from util.query import use_read_replica_if_available
+from util.query import chunked, use_read_replica_if_available
 
 unenroll_done = Signal(providing_args=["course_enrollment"])
+# Sent by CourseEnrollment.bulk_enroll, which saves without sending post_save,
+# with the ids of the users whose enrollments it created or updated
+bulk_enroll_done = Signal(providing_args=["course_id", "user_ids"])
 log = logging.getLogger(__name__)
 AUDIT_LOG = logging.getLogger("audit")
 SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
 
+# The maximum number of users looked up in one query by the bulk enrollment methods
+BULK_ENROLLMENT_CHUNK_SIZE = 1000
+
 
 class AnonymousUserId(models.Model):
     """
@@ -677,16 +683,12 @@ class CourseEnrollment(models.Model):
         if activation_changed or mode_changed:
             self.save()
         if activation_changed:
-            course_id_dict = Location.parse_course_id(self.course_id)
             if self.is_active:
                 self.emit_event(EVENT_NAME_ENROLLMENT_ACTIVATED)
 
                 dog_stats_api.increment(
                     "common.student.enrollment",
-                    tags=[u"org:{org}".format(**course_id_dict),
-                          u"course:{course}".format(**course_id_dict),
-                          u"run:{name}".format(**course_id_dict),
-                          u"mode:{}".format(self.mode)]
+                    tags=self._metric_tags(self.course_id, self.mode)
                 )
 
             else:
@@ -696,12 +698,20 @@ class CourseEnrollment(models.Model):
 
                 dog_stats_api.increment(
                     "common.student.unenrollment",
-                    tags=[u"org:{org}".format(**course_id_dict),
-                          u"course:{course}".format(**course_id_dict),
-                          u"run:{name}".format(**course_id_dict),
-                          u"mode:{}".format(self.mode)]
+                    tags=self._metric_tags(self.course_id, self.mode)
                 )
 
+    @staticmethod
+    def _metric_tags(course_id, mode):
+        """
+        Returns the tags of the enrollment metrics of the given course and mode.
+        """
+        course_id_dict = Location.parse_course_id(course_id)
+        return [u"org:{org}".format(**course_id_dict),
+                u"course:{course}".format(**course_id_dict),
+                u"run:{name}".format(**course_id_dict),
+                u"mode:{}".format(mode)]
+
     def emit_event(self, event_name):
         """
         Emits an event to explicitly track course enrollment and unenrollment.
@@ -909,6 +919,193 @@ class CourseEnrollment(models.Model):
         d['total'] = total
         return d
 
+    @classmethod
+    def is_enrolled_many(cls, user_ids, course_id):
+        """
+        Returns a dict of each of the `user_ids` to whether that user is
+        enrolled in the course, as `is_enrolled` would return, in a query per
+        BULK_ENROLLMENT_CHUNK_SIZE users.
+
+        `course_id` is our usual course_id string (e.g. "edX/Test101/2013_Fall)
+        """
+        return dict(
+            (user_id, mode is not None)
+            for user_id, mode in cls.enrollment_modes_for_users(user_ids, course_id).iteritems()
+        )
+
+    @classmethod
+    def enrollment_modes_for_users(cls, user_ids, course_id):
+        """
+        Returns a dict of each of the `user_ids` to their enrollment mode in the
+        course, as `enrollment_mode_for_user` would return, in a query per
+        BULK_ENROLLMENT_CHUNK_SIZE users.
+
+        `course_id` is our usual course_id string (e.g. "edX/Test101/2013_Fall)
+        """
+        modes = dict.fromkeys(user_ids)
+        for chunk in chunked(modes, BULK_ENROLLMENT_CHUNK_SIZE):
+            modes.update(
+                cls.objects.filter(user__in=chunk, course_id=course_id, is_active=True).values_list('user_id', 'mode')
+            )
+        return modes
+
+    @classmethod
+    def bulk_enroll(cls, user_ids, course_id, mode="honor"):
+        """
+        Enroll the users with the given ids in a course, as `enroll` does for
+        one user, with a few queries per BULK_ENROLLMENT_CHUNK_SIZE users. This
+        saves immediately.
+
+        `course_id` is our usual course_id string (e.g. "edX/Test101/2013_Fall)
+
+        `mode` is a string specifying what kind of enrollment this is, see `enroll`.
+
+        It is expected that this method is called from a method which has already
+        verified the user authentication and access.
+        """
+        activated = []
+        for chunk in chunked(set(user_ids), BULK_ENROLLMENT_CHUNK_SIZE):
+            existing = dict(
+                (user_id, (pk, is_active, current_mode))
+                for pk, user_id, is_active, current_mode in cls.objects.filter(
+                    user__in=chunk, course_id=course_id
+                ).values_list('pk', 'user_id', 'is_active', 'mode')
+            )
+
+            to_update = dict(
+                (pk, user_id) for user_id, (pk, is_active, current_mode) in existing.iteritems()
+                if not is_active or current_mode != mode
+            )
+            if to_update:
+                cls.objects.filter(pk__in=to_update).update(is_active=True, mode=mode)
+            activated.extend(user_id for user_id, (__, is_active, __) in existing.iteritems() if not is_active)
+            saved = to_update.values()
+
+            new_user_ids = [user_id for user_id in chunk if user_id not in existing]
+            try:
+                cls.objects.bulk_create(
+                    cls(user_id=user_id, course_id=course_id, mode=mode, is_active=True) for user_id in new_user_ids
+                )
+            except IntegrityError:
+                # Some of them enrolled in the meantime, enroll them one by one
+                for user_id in new_user_ids:
+                    cls.enroll(User.objects.get(id=user_id), course_id, mode)
+            else:
+                activated.extend(new_user_ids)
+                saved.extend(new_user_ids)
+
+            if saved:
+                bulk_enroll_done.send(sender=cls, course_id=course_id, user_ids=saved)
+
+        cls._emit_bulk_events(EVENT_NAME_ENROLLMENT_ACTIVATED, course_id, [(user_id, mode) for user_id in activated])
+
+    @classmethod
+    def bulk_unenroll(cls, user_ids, course_id):
+        """
+        Remove the users with the given ids from a course, as `unenroll` does
+        for one user, with a few queries per BULK_ENROLLMENT_CHUNK_SIZE users.
+        This saves immediately.
+
+        `course_id` is our usual course_id string (e.g. "edX/Test101/2013_Fall)
+        """
+        deactivated = []
+        for chunk in chunked(set(user_ids), BULK_ENROLLMENT_CHUNK_SIZE):
+            enrollments = list(
+                cls.objects.filter(user__in=chunk, course_id=course_id, is_active=True).select_related('user')
+            )
+            if not enrollments:
+                continue
+            cls.objects.filter(pk__in=[enrollment.pk for enrollment in enrollments]).update(is_active=False)
+            for enrollment in enrollments:
+                enrollment.is_active = False
+                unenroll_done.send(sender=None, course_enrollment=enrollment)
+                deactivated.append((enrollment.user_id, enrollment.mode))
+
+        cls._emit_bulk_events(EVENT_NAME_ENROLLMENT_DEACTIVATED, course_id, deactivated)
+
+    @classmethod
+    def _user_ids_by_email(cls, emails, course_id, action):
+        """
+        Returns a dict of each of the emails to the id of its user, logging
+        the emails without user.
+        """
+        emails = set(emails)
+        # the email lookups of the database may be case insensitive
+        found = {}
+        for chunk in chunked(emails, BULK_ENROLLMENT_CHUNK_SIZE):
+            found.update(
+                (email.lower(), user_id)
+                for email, user_id in User.objects.filter(email__in=chunk).values_list('email', 'id')
+            )
+        user_ids = {}
+        for email in emails:
+            if email.lower() in found:
+                user_ids[email] = found[email.lower()]
+            else:
+                log.error(u"Tried to {} email {} in course {}, but user not found".format(action, email, course_id))
+        return user_ids
+
+    @classmethod
+    def bulk_enroll_by_email(cls, emails, course_id, mode="honor", ignore_errors=True):
+        """
+        Enroll users in a course given their emails, as `enroll_by_email` does
+        for one email, with a few queries per BULK_ENROLLMENT_CHUNK_SIZE
+        users. This saves immediately.
+
+        Returns a dict of each of the emails of an existing user to its id.
+
+        `ignore_errors` is a boolean indicating whether we should suppress
+                        `User.DoesNotExist` errors or raise it, without
+                        enrolling anyone, when some emails have no user.
+        """
+        user_ids = cls._user_ids_by_email(emails, course_id, 'enroll')
+        if not ignore_errors and len(user_ids) < len(set(emails)):
+            raise User.DoesNotExist
+        cls.bulk_enroll(user_ids.values(), course_id, mode)
+        return user_ids
+
+    @classmethod
+    def bulk_unenroll_by_email(cls, emails, course_id):
+        """
+        Unenroll users from a course given their emails, as
+        `unenroll_by_email` does for one email, with a few queries per
+        BULK_ENROLLMENT_CHUNK_SIZE users. This saves immediately. User lookup
+        errors are logged but will not throw an exception.
+
+        Returns a dict of each of the emails of an existing user to its id.
+        """
+        user_ids = cls._user_ids_by_email(emails, course_id, 'unenroll')
+        cls.bulk_unenroll(user_ids.values(), course_id)
+        return user_ids
+
+    @classmethod
+    def _emit_bulk_events(cls, event_name, course_id, user_modes):
+        """
+        Emits `event_name` and increments the matching metric for each
+        (user_id, mode) of `user_modes` whose enrollment in the course was
+        activated or deactivated, within a single tracker context.
+        """
+        if not user_modes:
+            return
+        try:
+            context = contexts.course_context_from_course_id(course_id)
+            with tracker.get_tracker().context(event_name, context):
+                for user_id, mode in user_modes:
+                    tracker.emit(event_name, {
+                        'user_id': user_id,
+                        'course_id': course_id,
+                        'mode': mode,
+                    })
+        except:  # pylint: disable=bare-except
+            log.exception('Unable to emit events %s for course %s', event_name, course_id)
+
+        if event_name == EVENT_NAME_ENROLLMENT_ACTIVATED:
+            metric = "common.student.enrollment"
+        else:
+            metric = "common.student.unenrollment"
+        for mode, count in Counter(mode for __, mode in user_modes).iteritems():
+            dog_stats_api.increment(metric, count, tags=cls._metric_tags(course_id, mode))
+
     def activate(self):
         """Makes this `CourseEnrollment` record active. Saves immediately."""
         self.update_enrollment(is_active=True)
@@ -94,6 +94,13 @@ class GroupBasedRole(AccessRole):
         """
         self._group_names = [name.lower() for name in group_names]
 
+    @property
+    def group_names(self):
+        """
+        The lowercased names of the groups of this role
+        """
+        return list(self._group_names)
+
     def has_user(self, user):
         """
         Return whether the supplied django user has access to this role.
@@ -437,6 +437,61 @@ class EnrollInCourseTest(TestCase):
         self.assert_enrollment_event_was_emitted(user, course_id)
 
 
+    def test_bulk_enrollment(self):
+        users = [User.objects.create(username="jack{}".format(i), email="jack{}@fake.edx.org".format(i)) for i in range(3)]
+        user_ids = [user.id for user in users]
+        course_id = "edX/Test101/2013"
+
+        # An already active enrollment, and an inactive one
+        CourseEnrollment.enroll(users[0], course_id)
+        CourseEnrollment.get_or_create_enrollment(users[1], course_id)
+        self.mock_tracker.reset_mock()
+
+        CourseEnrollment.bulk_enroll(user_ids, course_id)
+        self.assertEqual(CourseEnrollment.is_enrolled_many(user_ids, course_id), dict.fromkeys(user_ids, True))
+        self.assertEqual(
+            sorted(args[1]['user_id'] for __, args, __ in self.mock_tracker.emit.mock_calls),
+            sorted(user_ids[1:])
+        )
+        self.mock_tracker.reset_mock()
+
+        # Enrolling them again should be harmless
+        CourseEnrollment.bulk_enroll(user_ids, course_id)
+        self.assert_no_events_were_emitted()
+
+        CourseEnrollment.bulk_unenroll(user_ids[:2], course_id)
+        self.assertEqual(
+            CourseEnrollment.enrollment_modes_for_users(user_ids, course_id),
+            {user_ids[0]: None, user_ids[1]: None, user_ids[2]: 'honor'}
+        )
+        self.assertEqual(self.mock_tracker.emit.call_count, 2)  # pylint: disable=maybe-no-member
+
+    def test_bulk_enrollment_by_email(self):
+        user = User.objects.create(username="jack", email="jack@fake.edx.org")
+        course_id = "edX/Test101/2013"
+
+        self.assertEqual(
+            CourseEnrollment.bulk_enroll_by_email(["jack@fake.edx.org", "not_jack@fake.edx.org"], course_id),
+            {"jack@fake.edx.org": user.id}
+        )
+        self.assertTrue(CourseEnrollment.is_enrolled(user, course_id))
+        self.assert_enrollment_event_was_emitted(user, course_id)
+
+        CourseEnrollment.bulk_unenroll_by_email(["jack@fake.edx.org"], course_id)
+        self.assertFalse(CourseEnrollment.is_enrolled(user, course_id))
+        self.assert_unenrollment_event_was_emitted(user, course_id)
+
+        # Nobody is enrolled if one of the users is not found
+        self.assertRaises(
+            User.DoesNotExist,
+            CourseEnrollment.bulk_enroll_by_email,
+            ["jack@fake.edx.org", "not_jack@fake.edx.org"],
+            course_id,
+            ignore_errors=False
+        )
+        self.assertFalse(CourseEnrollment.is_enrolled(user, course_id))
+        self.assert_no_events_were_emitted()
+
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
 class PaidRegistrationTest(ModuleStoreTestCase):
     """
@@ -0,0 +1,208 @@
+"""
+Event tracker backend that buffers events in memory and sends them in
+batches to another backend from a background thread, so requests don't
+wait on the storage of their events.
+
+Wrap any backend by configuring it as the `backend` option::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.buffered.BufferedBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {'database': 'track'},
+              },
+              'capacity': 10000,
+              'flush_size': 100,
+              'flush_interval': 1.0,
+              'overflow_policy': 'drop',
+          }
+      }
+  }
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import threading
+import time
+from Queue import Queue, Empty, Full
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+
+log = logging.getLogger(__name__)
+
+DROP = 'drop'
+BLOCK = 'block'
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend queuing events to be sent in batches to the
+    backend it wraps, when `flush_size` events are queued or
+    `flush_interval` seconds after the oldest queued one, whichever comes
+    first.
+
+    Events are kept in memory until sent, so the ones still queued are lost
+    if the process is killed.
+    """
+
+    def __init__(self, backend, capacity=10000, flush_size=100, flush_interval=1.0,
+                 overflow_policy=DROP, block_timeout=None, **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: the configuration of the wrapped backend, as a dict
+            with the `ENGINE` and `OPTIONS` keys of `TRACKING_BACKENDS`
+            entries, or a backend instance
+          - `capacity`: the maximum number of events queued
+          - `flush_size`: the maximum number of events sent at once
+          - `flush_interval`: the maximum number of seconds an event is
+            queued before being sent
+          - `overflow_policy`: what to do with an event when the queue is
+            full: 'drop' it, or 'block' until there's room for it
+          - `block_timeout`: the maximum number of seconds to block for, when
+            the policy is 'block', after which the event is dropped. Blocks
+            for as long as needed if None.
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        if overflow_policy not in (DROP, BLOCK):
+            raise ValueError('Invalid overflow policy {0}'.format(overflow_policy))
+
+        if isinstance(backend, dict):
+            # imported here as the tracker initializes the backends on import
+            from track.tracker import _instantiate_backend_from_name
+            backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+        self.backend = backend
+
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+
+        self.queue = Queue(maxsize=capacity)
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self._counters_lock = threading.Lock()
+
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._worker_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def send(self, event):
+        """Queue the event, to be sent by the background thread."""
+        self._ensure_worker()
+        try:
+            if self.overflow_policy == BLOCK:
+                self.queue.put(event, True, self.block_timeout)
+            else:
+                self.queue.put_nowait(event)
+        except Full:
+            self._count('dropped')
+            dog_stats_api.increment('track.buffered.dropped')
+            return
+        self._count('queued')
+
+    def flush(self):
+        """
+        Send all the queued events to the wrapped backend, in batches of at
+        most `flush_size` events.
+        """
+        while self._flush_batch(self._take_batch(block=False)):
+            pass
+
+    def stats(self):
+        """
+        Return a dict of counters describing the events handled by this
+        backend, for monitoring.
+        """
+        return {
+            'queued': self.queued,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'pending': self.queue.qsize(),
+        }
+
+    def _ensure_worker(self):
+        """
+        Start the background thread, unless it's running in this process.
+        Threads don't survive forks, so web server workers forked after the
+        backends are initialized start their own.
+        """
+        pid = os.getpid()
+        if self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker_pid == pid and self._worker.is_alive():
+                return
+            worker = threading.Thread(target=self._run, name='track-buffered-backend')
+            worker.daemon = True
+            worker.start()
+            self._worker = worker
+            self._worker_pid = pid
+
+    def _run(self):
+        """Send the queued events as they come, until the process exits."""
+        while True:
+            try:
+                self._flush_batch(self._take_batch(block=True))
+            except Exception:  # pylint: disable=broad-except
+                # keep the thread alive whatever the wrapped backend raises
+                log.exception('Error flushing events to the buffered event tracker backend')
+
+    def _take_batch(self, block):
+        """
+        Take at most `flush_size` events off the queue. If block, wait for a
+        first event, then for up to `flush_interval` seconds for the batch to
+        fill.
+        """
+        batch = []
+        try:
+            batch.append(self.queue.get(block))
+        except Empty:
+            return batch
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.flush_size:
+            timeout = deadline - time.time()
+            try:
+                if block and timeout > 0:
+                    batch.append(self.queue.get(True, timeout))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _flush_batch(self, batch):
+        """Send the batch to the wrapped backend. Return whether it had events."""
+        if not batch:
+            return False
+        with self._flush_lock:
+            with dog_stats_api.timer('track.buffered.flush'):
+                try:
+                    self.backend.send_many(batch)
+                except Exception:  # pylint: disable=broad-except
+                    self._count('dropped', len(batch))
+                    dog_stats_api.increment('track.buffered.dropped', len(batch))
+                    log.exception('Error sending events to the buffered event tracker backend')
+                    return True
+        self._count('flushed', len(batch))
+        dog_stats_api.increment('track.buffered.flushed', len(batch))
+        return True
+
+    def _count(self, counter, value=1):
+        """Add value to the given counter."""
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + value)
@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+
+from mock import Mock
+
+from django.test import TestCase
+
+from track.backends import BaseBackend
+from track.backends.buffered import BufferedBackend
+
+
+class TestBufferedBackend(TestCase):
+    def setUp(self):
+        self.wrapped = Mock(spec=BaseBackend)
+
+    def buffered(self, *args, **kwargs):
+        """A BufferedBackend without background thread racing the assertions"""
+        backend = BufferedBackend(*args, **kwargs)
+        backend._ensure_worker = Mock()  # pylint: disable=protected-access
+        return backend
+
+    def test_flush_in_batches(self):
+        backend = self.buffered(self.wrapped, flush_size=2)
+        events = [{'test': i} for i in range(5)]
+        for event in events:
+            backend.send(event)
+        self.assertFalse(self.wrapped.send_many.called)
+
+        backend.flush()
+
+        batches = [args[0] for __, args, __ in self.wrapped.send_many.mock_calls]
+        self.assertEqual(batches, [events[0:2], events[2:4], events[4:5]])
+        self.assertEqual(backend.stats(), {'queued': 5, 'flushed': 5, 'dropped': 0, 'pending': 0})
+
+    def test_drop_when_full(self):
+        backend = self.buffered(self.wrapped, capacity=2)
+        for i in range(3):
+            backend.send({'test': i})
+        backend.flush()
+
+        self.wrapped.send_many.assert_called_once_with([{'test': 0}, {'test': 1}])
+        self.assertEqual(backend.stats(), {'queued': 2, 'flushed': 2, 'dropped': 1, 'pending': 0})
+
+    def test_block_timeout_when_full(self):
+        backend = self.buffered(self.wrapped, capacity=1, overflow_policy='block', block_timeout=0.01)
+        backend.send({'test': 0})
+        backend.send({'test': 1})
+        self.assertEqual(backend.dropped, 1)
+
+    def test_failed_flush_counts_dropped(self):
+        self.wrapped.send_many.side_effect = Exception
+        backend = self.buffered(self.wrapped)
+        backend.send({'test': 0})
+        backend.flush()
+        self.assertEqual(backend.stats(), {'queued': 1, 'flushed': 0, 'dropped': 1, 'pending': 0})
+
+    def test_invalid_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            BufferedBackend(self.wrapped, overflow_policy='spill')
+
+    def test_instantiate_wrapped_backend(self):
+        backend = self.buffered({
+            'ENGINE': 'track.backends.logger.LoggerBackend',
+            'OPTIONS': {'name': 'tracking'},
+        })
+        self.assertEqual(backend.backend.event_logger.name, 'tracking')
+
+    def test_background_flush(self):
+        backend = BufferedBackend(self.wrapped, flush_interval=0.01)
+        backend.send({'test': 0})
+        # wait for the background thread to send it
+        for __ in range(100):
+            if backend.flushed:
+                break
+            backend._worker.join(0.01)  # pylint: disable=protected-access
+        self.wrapped.send_many.assert_called_once_with([{'test': 0}])
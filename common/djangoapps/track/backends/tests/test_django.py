@@ -23,3 +23,13 @@ class TestDjangoBackend(TestCase):
 
         # Check if time is stored in UTC
         self.assertEqual(str(results[0].time), '2013-01-01 17:01:00+00:00')
+
+    def test_django_backend_send_many(self):
+        events = [
+            {'username': 'test{0}'.format(i), 'time': '2013-01-01T12:01:00-05:00'}
+            for i in range(3)
+        ]
+        self.backend.send_many(events)
+
+        usernames = sorted(log.username for log in TrackingLog.objects.all())
+        self.assertEqual(usernames, ['test0', 'test1', 'test2'])
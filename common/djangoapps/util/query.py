@@ -1,4 +1,6 @@
 """ Utility functions related to database queries """
+from itertools import islice
+
 from django.conf import settings
 
 
@@ -6,4 +8,18 @@ def use_read_replica_if_available(queryset):
     """
     If there is a database called 'read_replica', use that database for the queryset.
     """
-    return queryset.using("read_replica") if "read_replica" in settings.DATABASES else queryset
\ No newline at end of file
+    return queryset.using("read_replica") if "read_replica" in settings.DATABASES else queryset
+
+
+def chunked(items, chunk_size):
+    """
+    Yield the values of the iterable `items` in lists of at most `chunk_size`,
+    without loading more than one chunk at a time. Used to bound the size of
+    `__in` lookups.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
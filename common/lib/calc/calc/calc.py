@@ -7,6 +7,9 @@ Uses pyparsing to parse. Main function as of now is evaluator().
 import math
 import operator
 import numbers
+import threading
+from collections import OrderedDict
+
 import numpy
 import scipy.constants
 import functions
@@ -73,6 +76,10 @@ SUFFIXES = {
 }
 
 
+# How many parsed expressions to keep, most recently used first
+PARSE_CACHE_SIZE = 1000
+
+
 class UndefinedVariable(Exception):
     """
     Indicate when a student inputs a variable which was not expected.
@@ -95,6 +102,22 @@ def lower_dict(input_dict):
 # of results from each parse component. They convert the strings and (previously
 # calculated) numbers into the number that component represents.
 
+def is_value(token):
+    """
+    Whether the token is a (previously calculated) number or array of numbers
+    rather than an operator.
+    """
+    return isinstance(token, (numbers.Number, numpy.ndarray))
+
+
+def is_operator(token, operator_str):
+    """
+    Whether the token is the given operator. Safe to call on arrays, which
+    compare elementwise.
+    """
+    return isinstance(token, basestring) and token == operator_str
+
+
 def super_float(text):
     """
     Like float, but with SI extensions. 1k goes to 1000.
@@ -122,7 +145,7 @@ def eval_atom(parse_result):
     In the case of parenthesis, ignore them.
     """
     # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    result = next(k for k in parse_result if is_value(k))
     return result
 
 
@@ -136,7 +159,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if is_value(k)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -158,7 +181,7 @@ def eval_parallel(parse_result):
     if 0 in parse_result:
         return float('nan')
     reciprocals = [1. / e for e in parse_result
-                   if isinstance(e, numbers.Number)]
+                   if is_value(e)]
     return 1. / sum(reciprocals)
 
 
@@ -173,9 +196,9 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if is_operator(token, '+'):
             current_op = operator.add
-        elif token == '-':
+        elif is_operator(token, '-'):
             current_op = operator.sub
         else:
             total = current_op(total, token)
@@ -191,9 +214,9 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if is_operator(token, '*'):
             current_op = operator.mul
-        elif token == '/':
+        elif is_operator(token, '/'):
             current_op = operator.truediv
         else:
             prod = current_op(prod, token)
@@ -229,8 +252,7 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
         return float('nan')
 
     # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    math_interpreter = parse_cached(math_expr, case_sensitive)
 
     # Get our variables together.
     all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
@@ -238,11 +260,69 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     # ...and check them
     math_interpreter.check_variables(all_variables, all_functions)
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
+    return evaluate_tree(math_interpreter, all_variables, all_functions)
+
+
+def evaluate_samples(variables, functions, math_expr, samples, case_sensitive=False):
+    """
+    Evaluate an expression for each of a list of samples; that is, dictionaries
+    of variables to add to `variables`. Return the list of results, the same as
+    calling `evaluator` once per sample, but parsing the expression only once.
+
+    If all the samples define the same variables, and the expression only uses
+    functions which work on arrays, evaluate it for all the samples in a single
+    pass over arrays of the sampled values. Fall back on evaluating the samples
+    one by one whenever that fails, to get the exact same results and errors as
+    `evaluator`.
+    """
+    if math_expr.strip() == "":
+        return [float('nan')] * len(samples)
+
+    math_interpreter = parse_cached(math_expr, case_sensitive)
+    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
+
+    if samples and all(sample.viewkeys() == samples[0].viewkeys() for sample in samples):
+        sample_variables = samples[0].keys()
+        math_interpreter.check_variables(
+            dict.fromkeys(all_variables.keys() + [math_interpreter.casify(var) for var in sample_variables]),
+            all_functions
+        )
+        if math_interpreter.is_vectorizable(all_functions):
+            arrays = {}
+            for var in sample_variables:
+                arrays[math_interpreter.casify(var)] = numpy.array([sample[var] for sample in samples])
+            array_variables = dict(all_variables)
+            array_variables.update(arrays)
+            try:
+                # Let errors which `evaluator` would raise, or hide in a nan, through to the
+                # fallback, but not underflows, which python floats ignore too.
+                with numpy.errstate(divide='raise', over='raise', invalid='raise', under='ignore'):
+                    results = evaluate_tree(math_interpreter, array_variables, all_functions)
+            except Exception:  # pylint: disable=W0703
+                pass
+            else:
+                if numpy.ndim(results) == 0:
+                    # the expression doesn't depend on the sampled variables
+                    return [results] * len(samples)
+                if numpy.shape(results) == (len(samples),):
+                    return results.tolist()
+
+    results = []
+    for sample in samples:
+        sample_variables = dict(variables)
+        sample_variables.update(sample)
+        sample_variables, __ = add_defaults(sample_variables, {}, case_sensitive)
+        math_interpreter.check_variables(sample_variables, all_functions)
+        results.append(evaluate_tree(math_interpreter, sample_variables, all_functions))
+    return results
+
+
+def evaluate_tree(math_interpreter, all_variables, all_functions):
+    """
+    Evaluate the parse tree of `math_interpreter` with the given variables and
+    functions, which must have been checked first.
+    """
+    casify = math_interpreter.casify
 
     evaluate_actions = {
         'number': eval_number,
@@ -258,6 +338,41 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     return math_interpreter.reduce_tree(evaluate_actions)
 
 
+_PARSE_CACHE = OrderedDict()
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def parse_cached(math_expr, case_sensitive=False):
+    """
+    Return a parsed `ParseAugmenter` for `math_expr`, reusing the one parsed
+    last time if it is still among the PARSE_CACHE_SIZE most recently used.
+
+    The result is shared, so it must not be modified.
+    """
+    key = (math_expr, case_sensitive)
+    with _PARSE_CACHE_LOCK:
+        math_interpreter = _PARSE_CACHE.pop(key, None)
+        if math_interpreter is not None:
+            _PARSE_CACHE[key] = math_interpreter
+            return math_interpreter
+
+    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+    math_interpreter.parse_algebra()
+
+    with _PARSE_CACHE_LOCK:
+        _PARSE_CACHE[key] = math_interpreter
+        while len(_PARSE_CACHE) > PARSE_CACHE_SIZE:
+            _PARSE_CACHE.popitem(last=False)
+    return math_interpreter
+
+
+# Functions which return arrays when given arrays, so that an expression using
+# only them can be evaluated for many samples at once
+VECTORIZABLE_FUNCTIONS = frozenset(
+    func for func in DEFAULT_FUNCTIONS.itervalues() if func is not math.factorial
+)
+
+
 class ParseAugmenter(object):
     """
     Holds the data for a particular parse.
@@ -397,16 +512,31 @@ class ParseAugmenter(object):
         # Find the value of the entire tree.
         return handle_node(self.tree)
 
+    def casify(self, name):
+        """
+        Return the name of a variable or function as used to look it up.
+        """
+        if self.case_sensitive:
+            return name
+        else:
+            return name.lower()  # Lowercase for case insens.
+
+    def is_vectorizable(self, valid_functions):
+        """
+        Whether all the functions used in the tree work on arrays.
+        """
+        return all(
+            valid_functions[self.casify(func)] in VECTORIZABLE_FUNCTIONS
+            for func in self.functions_used
+        )
+
     def check_variables(self, valid_variables, valid_functions):
         """
         Confirm that all the variables used in the tree are valid/defined.
 
         Otherwise, raise an UndefinedVariable containing all bad variables.
         """
-        if self.case_sensitive:
-            casify = lambda x: x
-        else:
-            casify = lambda x: x.lower()  # Lowercase for case insens.
+        casify = self.casify
 
         # Test if casify(X) is valid, but return the actual bad input (i.e. X)
         bad_vars = set(var for var in self.variables_used
@@ -558,3 +558,75 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+    def test_parse_cache(self):
+        """
+        Check that expressions are parsed once, per case sensitivity
+        """
+        parsed = calc.parse_cached("x^2+1")
+        self.assertIs(parsed, calc.parse_cached("x^2+1"))
+        self.assertIsNot(parsed, calc.parse_cached("x^2+1", case_sensitive=True))
+        self.assertEqual(5.0, calc.evaluator({'x': 2.0}, {}, "x^2+1"))
+        self.assertEqual(10.0, calc.evaluator({'x': 3.0}, {}, "x^2+1"))
+
+
+class EvaluateSamplesTest(unittest.TestCase):
+    """
+    Run tests for calc.evaluate_samples, which must give the same results as
+    calling calc.evaluator once per sample.
+    """
+    samples = [{'x': 0.5, 'Y': 2.0}, {'x': 1.5, 'Y': -3.0}, {'x': 3.0, 'Y': 0.25}]
+
+    def assert_same_as_evaluator(self, math_expr, samples=None, case_sensitive=False):
+        """
+        Check that the sampled results match those of the evaluator
+        """
+        if samples is None:
+            samples = self.samples
+        results = calc.evaluate_samples({}, {}, math_expr, samples, case_sensitive=case_sensitive)
+        self.assertEqual(len(samples), len(results))
+        for sample, result in zip(samples, results):
+            expected = calc.evaluator(sample, {}, math_expr, case_sensitive=case_sensitive)
+            if numpy.isnan(expected):
+                self.assertTrue(numpy.isnan(result))
+            else:
+                self.assertAlmostEqual(expected, result, delta=1e-9)
+
+    def test_vectorized(self):
+        """
+        Check expressions which can be evaluated over arrays
+        """
+        self.assert_same_as_evaluator("x^2 + 3*y - 1")
+        self.assert_same_as_evaluator("sin(x)/cos(x) - tan(x) + sec(y)")
+        self.assert_same_as_evaluator("-x^2^0.5 + 2k*x/y")
+        self.assert_same_as_evaluator("x*j + y")
+        self.assert_same_as_evaluator("x*Y", case_sensitive=True)
+
+    def test_constant(self):
+        """
+        Check expressions which don't depend on the sampled variables
+        """
+        self.assertEqual([3.0, 3.0, 3.0], calc.evaluate_samples({}, {}, "1+2", self.samples))
+        self.assertEqual([], calc.evaluate_samples({}, {}, "1+2", []))
+
+    def test_fallback(self):
+        """
+        Check expressions which need to be evaluated sample by sample
+        """
+        self.assert_same_as_evaluator("x || y")
+        self.assert_same_as_evaluator("sqrt(y)")
+        self.assert_same_as_evaluator("fact(3)*x")
+        self.assert_same_as_evaluator("x", samples=[{'x': 1.0}, {'x': 2.0, 'y': 3.0}])
+        with self.assertRaises(ZeroDivisionError):
+            calc.evaluate_samples({}, {}, "1/(x-1.5)", self.samples)
+        with self.assertRaises(ValueError):
+            calc.evaluate_samples({}, {}, "fact(x)", self.samples)
+
+    def test_undefined_vars(self):
+        """
+        Check that undefined variables are caught
+        """
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.evaluate_samples({}, {}, "x+z", self.samples)
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            calc.evaluate_samples({}, {}, "x+y", self.samples, case_sensitive=True)
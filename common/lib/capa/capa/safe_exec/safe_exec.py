@@ -6,7 +6,10 @@ from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
 from dogapi import dog_stats_api
 
+from collections import OrderedDict
 import hashlib
+import threading
+import time
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -47,6 +50,54 @@ for name, modname in ASSUMED_IMPORTS:
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
 
+# Cache hits, misses and execution time per slug, for the slugs which executed
+# most recently in this process.
+MAX_STATS_SLUGS = 1000
+_STATS = OrderedDict()
+_STATS_LOCK = threading.Lock()
+
+
+def _record_stats(slug, hit, exec_time=0.0):
+    """
+    Count a cache hit or miss for `slug`, and the time spent executing the code
+    if it missed, in this process and in datadog.
+    """
+    tags = [u'slug:{}'.format(slug)]
+    dog_stats_api.increment('capa.safe_exec.cache', tags=tags + ['result:hit' if hit else 'result:miss'])
+    if not hit:
+        dog_stats_api.histogram('capa.safe_exec.exec_time', exec_time, tags=tags)
+    with _STATS_LOCK:
+        stats = _STATS.pop(slug, None)
+        if stats is None:
+            stats = {'hits': 0, 'misses': 0, 'exec_time': 0.0, 'max_exec_time': 0.0}
+        _STATS[slug] = stats
+        if hit:
+            stats['hits'] += 1
+        else:
+            stats['misses'] += 1
+            stats['exec_time'] += exec_time
+            stats['max_exec_time'] = max(stats['max_exec_time'], exec_time)
+        while len(_STATS) > MAX_STATS_SLUGS:
+            _STATS.popitem(last=False)
+
+
+def safe_exec_stats():
+    """
+    Return a dict mapping slugs to the cache hits and misses of their code in
+    this process, and the wall time spent executing it on misses, in seconds.
+    """
+    with _STATS_LOCK:
+        return dict((slug, dict(stats)) for slug, stats in _STATS.iteritems())
+
+
+def reset_safe_exec_stats():
+    """
+    Forget the statistics gathered so far.
+    """
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
 def update_hash(hasher, obj):
     """
     Update a `hashlib` hasher with a nested object.
@@ -105,6 +156,7 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
             emsg, cleaned_results = cached
+            _record_stats(slug, hit=True)
             globals_dict.update(cleaned_results)
             if emsg:
                 raise SafeExecException(emsg)
@@ -120,6 +172,7 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
         exec_fn = codejail_safe_exec
 
     # Run the code!  Results are side effects in globals_dict.
+    start = time.time()
     try:
         exec_fn(
             code_prolog + LAZY_IMPORTS + code, globals_dict,
@@ -129,6 +182,7 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
         emsg = e.message
     else:
         emsg = None
+    _record_stats(slug, hit=False, exec_time=time.time() - start)
 
     # Put the result back in the cache.  This is complicated by the fact that
     # the globals dict might not be entirely serializable.
@@ -7,9 +7,10 @@ import random
 import textwrap
 import unittest
 
+from mock import patch
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import safe_exec, update_hash, safe_exec_stats, reset_safe_exec_stats
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -127,6 +128,36 @@ class TestSafeExecCaching(unittest.TestCase):
         safe_exec("a = int(math.pi)", g, cache=DictCache(cache))
         self.assertEqual(g['a'], 17)
 
+    def test_cache_stats(self):
+        reset_safe_exec_stats()
+        cache = DictCache({})
+        safe_exec("a = int(math.pi)", {}, cache=cache, slug="pi")
+        safe_exec("a = int(math.pi)", {}, cache=cache, slug="pi")
+        safe_exec("a = int(math.e)", {}, cache=cache, slug="e")
+
+        stats = safe_exec_stats()
+        self.assertEqual(sorted(stats), ["e", "pi"])
+        self.assertEqual(stats["pi"]["hits"], 1)
+        self.assertEqual(stats["pi"]["misses"], 1)
+        self.assertEqual(stats["e"]["hits"], 0)
+        self.assertEqual(stats["e"]["misses"], 1)
+        self.assertGreater(stats["e"]["exec_time"], 0)
+
+    def test_cache_stats_sent_to_datadog(self):
+        cache = DictCache({})
+        with patch('capa.safe_exec.safe_exec.dog_stats_api') as mock_dog_stats_api:
+            safe_exec("a = int(math.pi)", {}, cache=cache, slug="pi")
+            safe_exec("a = int(math.pi)", {}, cache=cache, slug="pi")
+
+        mock_dog_stats_api.increment.assert_any_call('capa.safe_exec.cache', tags=['slug:pi', 'result:miss'])
+        mock_dog_stats_api.increment.assert_any_call('capa.safe_exec.cache', tags=['slug:pi', 'result:hit'])
+        # the execution time is only sent for the miss
+        self.assertEqual(mock_dog_stats_api.histogram.call_count, 1)
+        name, exec_time = mock_dog_stats_api.histogram.call_args[0]
+        self.assertEqual(name, 'capa.safe_exec.exec_time')
+        self.assertGreater(exec_time, 0)
+        self.assertEqual(mock_dog_stats_api.histogram.call_args[1], {'tags': ['slug:pi']})
+
     def test_cache_large_code_chunk(self):
         # Caching used to die on memcache with more than 250 bytes of code.
         # Check that it doesn't any more.
@@ -2,6 +2,11 @@ XASSET_LOCATION_TAG = 'c4x'
 XASSET_SRCREF_PREFIX = 'xasset:'
 
 XASSET_THUMBNAIL_TAIL_NAME = '.jpg'
+XASSET_WEB_RENDITION_TAIL_NAME = '.web.jpg'
+
+THUMBNAIL_SIZE = (128, 128)
+
+STREAM_DATA_CHUNK_SIZE = 1024
 
 import os
 import logging
@@ -15,7 +20,7 @@ from PIL import Image
 
 class StaticContent(object):
     def __init__(self, loc, name, content_type, data, last_modified_at=None, thumbnail_location=None, import_path=None,
-                 length=None, locked=False):
+                 length=None, locked=False, content_digest=None):
         self.location = loc
         self.name = name  # a display string which can be edited, and thus not part of the location which needs to be fixed
         self.content_type = content_type
@@ -27,6 +32,8 @@ class StaticContent(object):
         # cycles
         self.import_path = import_path
         self.locked = locked
+        # the md5 of the data, as computed by the contentstore
+        self.content_digest = content_digest
 
     @property
     def is_thumbnail(self):
@@ -38,6 +45,12 @@ class StaticContent(object):
             name_root=os.path.splitext(original_name)[0],
             extension=XASSET_THUMBNAIL_TAIL_NAME,)
 
+    @staticmethod
+    def generate_web_rendition_name(original_name):
+        return u"{name_root}{extension}".format(
+            name_root=os.path.splitext(original_name)[0],
+            extension=XASSET_WEB_RENDITION_TAIL_NAME,)
+
     @staticmethod
     def compute_location(org, course, name, revision=None, is_thumbnail=False):
         name = name.replace('/', '_')
@@ -130,22 +143,42 @@ class StaticContent(object):
     def stream_data(self):
         yield self._data
 
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Stream the bytes from first_byte to last_byte, both inclusive
+        """
+        yield self._data[first_byte:last_byte + 1]
+
 
 class StaticContentStream(StaticContent):
     def __init__(self, loc, name, content_type, stream, last_modified_at=None, thumbnail_location=None, import_path=None,
-                 length=None, locked=False):
+                 length=None, locked=False, content_digest=None):
         super(StaticContentStream, self).__init__(loc, name, content_type, None, last_modified_at=last_modified_at,
                                                   thumbnail_location=thumbnail_location, import_path=import_path,
-                                                  length=length, locked=locked)
+                                                  length=length, locked=locked, content_digest=content_digest)
         self._stream = stream
 
     def stream_data(self):
         while True:
-            chunk = self._stream.read(1024)
+            chunk = self._stream.read(STREAM_DATA_CHUNK_SIZE)
             if len(chunk) == 0:
                 break
             yield chunk
 
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Stream the bytes from first_byte to last_byte, both inclusive, seeking
+        directly to first_byte rather than reading the bytes before it
+        """
+        self._stream.seek(first_byte)
+        remaining = last_byte - first_byte + 1
+        while remaining > 0:
+            chunk = self._stream.read(min(STREAM_DATA_CHUNK_SIZE, remaining))
+            if len(chunk) == 0:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
     def close(self):
         self._stream.close()
 
@@ -153,7 +186,8 @@ class StaticContentStream(StaticContent):
         self._stream.seek(0)
         content = StaticContent(self.location, self.name, self.content_type, self._stream.read(),
                                 last_modified_at=self.last_modified_at, thumbnail_location=self.thumbnail_location,
-                                import_path=self.import_path, length=self.length, locked=self.locked)
+                                import_path=self.import_path, length=self.length, locked=self.locked,
+                                content_digest=self.content_digest)
         return content
 
 
@@ -192,35 +226,27 @@ class ContentStore(object):
         '''
         raise NotImplementedError
 
+    def get_all_content_digests_for_course(self, location):
+        '''
+        Returns a dict of the url path of each static asset (but not thumbnail) of a course to its stored
+        attributes, which include its md5, contentType, displayname, locked and import_path. Used to find
+        the assets whose stored copy is already up to date.
+        '''
+        raise NotImplementedError
+
     def generate_thumbnail(self, content, tempfile_path=None):
         thumbnail_content = None
         # use a naming convention to associate originals with the thumbnail
-        thumbnail_name = StaticContent.generate_thumbnail_name(content.location.name)
-
-        thumbnail_file_location = StaticContent.compute_location(content.location.org, content.location.course,
-                                                                 thumbnail_name, is_thumbnail=True)
+        thumbnail_name, thumbnail_file_location = thumbnail_name_and_location(content.location)
 
         # if we're uploading an image, then let's generate a thumbnail so that we can
         # serve it up when needed without having to rescale on the fly
         if content.content_type is not None and content.content_type.split('/')[0] == 'image':
             try:
-                # use PIL to do the thumbnail generation (http://www.pythonware.com/products/pil/)
-                # My understanding is that PIL will maintain aspect ratios while restricting
-                # the max-height/width to be whatever you pass in as 'size'
-                # @todo: move the thumbnail size to a configuration setting?!?
                 if tempfile_path is None:
-                    im = Image.open(StringIO.StringIO(content.data))
+                    thumbnail_file = make_thumbnail(StringIO.StringIO(content.data))
                 else:
-                    im = Image.open(tempfile_path)
-
-                # I've seen some exceptions from the PIL library when trying to save palletted
-                # PNG files to JPEG. Per the google-universe, they suggest converting to RGB first.
-                im = im.convert('RGB')
-                size = 128, 128
-                im.thumbnail(size, Image.ANTIALIAS)
-                thumbnail_file = StringIO.StringIO()
-                im.save(thumbnail_file, 'JPEG')
-                thumbnail_file.seek(0)
+                    thumbnail_file = make_thumbnail(tempfile_path)
 
                 # store this thumbnail as any other piece of content
                 thumbnail_content = StaticContent(thumbnail_file_location, thumbnail_name,
@@ -233,3 +259,48 @@ class ContentStore(object):
                 logging.exception(u"Failed to generate thumbnail for {0}. Exception: {1}".format(content.location, str(e)))
 
         return thumbnail_content, thumbnail_file_location
+
+
+def thumbnail_name_and_location(location):
+    """
+    Return the name and the location of the thumbnail of the asset at location
+    """
+    thumbnail_name = StaticContent.generate_thumbnail_name(location.name)
+    thumbnail_location = StaticContent.compute_location(location.org, location.course, thumbnail_name, is_thumbnail=True)
+    return thumbnail_name, thumbnail_location
+
+
+def web_rendition_name_and_location(location):
+    """
+    Return the name and the location of the web-optimized rendition of the image asset at location.
+    Renditions are stored along with the thumbnails.
+    """
+    rendition_name = StaticContent.generate_web_rendition_name(location.name)
+    rendition_location = StaticContent.compute_location(location.org, location.course, rendition_name, is_thumbnail=True)
+    return rendition_name, rendition_location
+
+
+def make_thumbnail(image_file, size=THUMBNAIL_SIZE, **save_options):
+    """
+    Return a file-like object holding the JPEG thumbnail of the image in
+    image_file, a path or a file-like object, no bigger than size. The
+    save_options are passed to the JPEG encoder, eg quality or progressive.
+    Raises whatever PIL raises if the image can't be read.
+    """
+    # use PIL to do the thumbnail generation (http://www.pythonware.com/products/pil/)
+    # My understanding is that PIL will maintain aspect ratios while restricting
+    # the max-height/width to be whatever you pass in as 'size'
+    im = Image.open(image_file)
+
+    # Have the decoder downscale while decoding when it can (JPEG decodes at
+    # 1/2 to 1/8 scale), so big photos aren't decoded at full size in memory.
+    im.draft('RGB', size)
+
+    # I've seen some exceptions from the PIL library when trying to save palletted
+    # PNG files to JPEG. Per the google-universe, they suggest converting to RGB first.
+    im = im.convert('RGB')
+    im.thumbnail(size, Image.ANTIALIAS)
+    thumbnail_file = StringIO.StringIO()
+    im.save(thumbnail_file, 'JPEG', **save_options)
+    thumbnail_file.seek(0)
+    return thumbnail_file
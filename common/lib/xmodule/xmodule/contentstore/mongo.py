@@ -11,8 +11,12 @@ import logging
 from .content import StaticContent, ContentStore, StaticContentStream
 from xmodule.exceptions import NotFoundError
 from fs.osfs import OSFS
+from StringIO import StringIO
+import calendar
 import os
 import json
+import tarfile
+import time
 
 
 class MongoContentStore(ContentStore):
@@ -72,7 +76,8 @@ class MongoContentStore(ContentStore):
                     location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
                     thumbnail_location=getattr(fp, 'thumbnail_location', None),
                     import_path=getattr(fp, 'import_path', None),
-                    length=fp.length, locked=getattr(fp, 'locked', False)
+                    length=fp.length, locked=getattr(fp, 'locked', False),
+                    content_digest=getattr(fp, 'md5', None)
                 )
             else:
                 with self.fs.get(content_id) as fp:
@@ -80,7 +85,8 @@ class MongoContentStore(ContentStore):
                         location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
                         thumbnail_location=getattr(fp, 'thumbnail_location', None),
                         import_path=getattr(fp, 'import_path', None),
-                        length=fp.length, locked=getattr(fp, 'locked', False)
+                        length=fp.length, locked=getattr(fp, 'locked', False),
+                        content_digest=getattr(fp, 'md5', None)
                     )
         except NoFile:
             if throw_on_not_found:
@@ -133,13 +139,60 @@ class MongoContentStore(ContentStore):
         for asset in assets:
             asset_location = Location(asset['_id'])
             self.export(asset_location, output_directory)
-            for attr, value in asset.iteritems():
-                if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize']:
-                    policy.setdefault(asset_location.name, {})[attr] = value
+            policy[asset_location.name] = self._asset_policy(asset)
 
         with open(assets_policy_file, 'w') as f:
             json.dump(policy, f)
 
+    def export_all_for_course_to_tar(self, course_location, tar_file, course_dir):
+        """
+        Add all of this course's assets, and the policy file of their attributes, to the
+        tarfile.TarFile tar_file, as export_all_for_course would write them under the
+        course_dir directory. The assets are streamed from GridFS into the archive, so
+        they are never written to disk.
+
+        :param course_location: the Location of type 'course'
+        :param tar_file: a TarFile open for writing
+        :param course_dir: the name of the directory of the course in the archive
+        """
+        policy = {}
+        assets, __ = self.get_all_content_for_course(course_location)
+
+        for asset in assets:
+            asset_location = Location(asset['_id'])
+            try:
+                grid_file = self.fs.get(asset['_id'])
+            except NoFile:
+                # deleted since it was listed
+                continue
+            with grid_file:
+                asset_dir = course_dir + '/static'
+                import_path = getattr(grid_file, 'import_path', None)
+                if import_path is not None:
+                    asset_dir = asset_dir + '/' + os.path.dirname(import_path)
+                asset_path = os.path.normpath(asset_dir + '/' + grid_file.displayname)
+                tar_info = tarfile.TarInfo(asset_path.encode('utf-8'))
+                tar_info.size = grid_file.length
+                tar_info.mtime = calendar.timegm(grid_file.upload_date.utctimetuple())
+                tar_file.addfile(tar_info, grid_file)
+            policy[asset_location.name] = self._asset_policy(asset)
+
+        policy_data = json.dumps(policy)
+        tar_info = tarfile.TarInfo((course_dir + '/policies/assets.json').encode('utf-8'))
+        tar_info.size = len(policy_data)
+        tar_info.mtime = time.time()
+        tar_file.addfile(tar_info, StringIO(policy_data))
+
+    @staticmethod
+    def _asset_policy(asset):
+        """
+        Return the attributes of the asset document which are exported in the policy file
+        """
+        return {
+            attr: value for attr, value in asset.iteritems()
+            if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize']
+        }
+
     def get_all_content_thumbnails_for_course(self, location):
         return self._get_all_content_for_course(location, get_thumbnails=True)[0]
 
@@ -181,6 +234,14 @@ class MongoContentStore(ContentStore):
         count = items.count()
         return list(items), count
 
+    def get_all_content_digests_for_course(self, location):
+        course_filter = Location(XASSET_LOCATION_TAG, category="asset", course=location.course, org=location.org)
+        items = self.fs_files.find(
+            location_to_query(course_filter),
+            fields=['filename', 'md5', 'contentType', 'displayname', 'locked', 'import_path', 'thumbnail_location'],
+        )
+        return {item['filename']: item for item in items}
+
     def set_attr(self, location, attr, value=True):
         """
         Add/set the given attr on the asset at the given location. Does not allow overwriting gridFS built in
@@ -535,6 +535,24 @@ class ModuleStoreReadBase(ModuleStoreRead):
                 return c
         return None
 
+    def get_course_version(self, course_id):
+        """
+        Return an id of the current version of the course with the given
+        course_id, which changes whenever its structure or the settings of any
+        of its blocks are written, so that values computed from them can be
+        cached under it. Return None if this store can't tell.
+        """
+        return None
+
+    def get_course_content_version(self, course_id):
+        """
+        Return an id of the current version of everything stored for the
+        course with the given course_id, including the content fields of its
+        blocks, which is the same for the same content in every process.
+        Return None if this store can't tell.
+        """
+        return None
+
     def update_item(self, xblock, user_id=None, allow_not_found=False, force=False):
         """
         Update the given xblock's persisted repr. Pass the user's unique id which the persistent store
@@ -167,6 +167,20 @@ class MixedModuleStore(ModuleStoreWriteBase):
         except ItemNotFoundError:
             return None
 
+    def get_course_version(self, course_id):
+        """
+        returns the version of the content of the course with the given course_id, if its store can tell
+        """
+        store = self._get_modulestore_for_courseid(course_id)
+        return store.get_course_version(course_id)
+
+    def get_course_content_version(self, course_id):
+        """
+        returns the version of everything stored for the course with the given course_id, if its store can tell
+        """
+        store = self._get_modulestore_for_courseid(course_id)
+        return store.get_course_content_version(course_id)
+
     def get_parent_locations(self, location, course_id):
         """
         returns the parent locations for a given location and course_id
@@ -12,10 +12,11 @@ structure:
 }
 """
 
+import hashlib
+import json
 import pymongo
 import sys
 import logging
-import copy
 
 from bson.son import SON
 from fs.osfs import OSFS
@@ -35,6 +36,7 @@ from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.inheritance import own_metadata, InheritanceMixin, inherit_metadata, InheritanceKeyValueStore
 from xmodule.modulestore.xml import LocationReader
 from xmodule.tabs import StaticTab, CourseTabList
+from xmodule.util.lru_cache import LRUCache
 from xblock.core import XBlock
 
 log = logging.getLogger(__name__)
@@ -244,6 +246,16 @@ def metadata_cache_key(location):
     return u"{0.org}/{0.course}".format(location)
 
 
+def course_structure_version_key(location):
+    """The cache key of the current course structure version of the course containing `location`"""
+    return u"{0}/structure_version".format(metadata_cache_key(location))
+
+
+def course_structure_cache_key(location, version):
+    """The cache key of the given version of the course structure of the course containing `location`"""
+    return u"{0}/structure/{1}".format(metadata_cache_key(location), version)
+
+
 class MongoModuleStore(ModuleStoreWriteBase):
     """
     A Mongodb backed ModuleStore
@@ -257,9 +269,11 @@ class MongoModuleStore(ModuleStoreWriteBase):
                  default_class=None,
                  error_tracker=null_error_tracker,
                  i18n_service=None,
+                 course_structure_cache_size=100,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param course_structure_cache_size: the number of course structures to keep in the process-local cache
         """
 
         super(MongoModuleStore, self).__init__(**kwargs)
@@ -309,118 +323,174 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.i18n_service = i18n_service
 
         self.ignore_write_events_on_courses = []
+        self.course_structure_cache = LRUCache(course_structure_cache_size)
+        self.parent_index_cache = LRUCache(course_structure_cache_size)
 
-    def compute_metadata_inheritance_tree(self, location):
-        '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
-        '''
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-
-        block_types_with_children = set(name for name, class_ in XBlock.load_classes() if getattr(class_, 'has_children', False))
-        query = {'_id.org': location.org,
-                 '_id.course': location.course,
-                 '_id.category': {'$in': list(block_types_with_children)}
-                 }
-        # we just want the Location, children, and inheritable metadata
-        record_filter = {'_id': 1, 'definition.children': 1}
-
-        # just get the inheritable metadata since that is all we need for the computation
-        # this minimizes both data pushed over the wire
-        for field_name in InheritanceMixin.fields:
-            record_filter['metadata.{0}'.format(field_name)] = 1
-
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
-
-        results_by_url = {}
-        root = None
+    def compute_course_structure(self, location):
+        """
+        Compute the structure of the course containing `location` with a
+        single query. The structure is a dict with the following keys:
+
+            version: a digest of the children and metadata of every block of
+                the course, so that the same content has the same version in
+                every process and after the caches expire
+            root: the url of the course block (None if there isn't one)
+            blocks: dict mapping the url of every block in the course to a dict
+                with its 'category', 'children' urls, 'display_name', 'graded'
+                and 'format' (own, not inherited, values)
+            inherited_metadata: dict mapping block urls to the metadata they
+                inherit from their ancestors (the metadata inheritance tree)
+
+        Draft and published versions of a block are collated into one entry,
+        as parent pointers don't distinguish between them.
+        """
+        query = {'_id.org': location.org, '_id.course': location.course}
+
+        # we just want the Location, children and metadata, which minimizes
+        # the data pushed over the wire. All the metadata is fetched, rather
+        # than just the outline and inheritable fields, so that the version
+        # changes with any setting caches keyed on it may depend on.
+        record_filter = {
+            '_id': 1,
+            'definition.children': 1,
+            'metadata': 1,
+        }
 
-        # now go through the results and order them by the location url
-        for result in resultset:
-            location = Location(result['_id'])
+        digest = hashlib.sha1()
+        blocks = {}
+        own_metadata_by_url = {}
+        root = None
+        for result in self.collection.find(query, record_filter).sort('_id', pymongo.ASCENDING):
+            block_location = Location(result['_id'])
+            is_draft = block_location.revision is not None
             # We need to collate between draft and non-draft
             # i.e. draft verticals will have draft children but will have non-draft parents currently
-            location = location.replace(revision=None)
-            location_url = location.url()
-            if location_url in results_by_url:
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                results_by_url[location_url].setdefault('definition', {})['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
+            location_url = block_location.replace(revision=None).url()
+            metadata = result.get('metadata', {})
+            children = result.get('definition', {}).get('children', [])
+            digest.update(json.dumps([block_location.url(), children, metadata], sort_keys=True, default=unicode))
+
+            block = blocks.get(location_url)
+            if block is None:
+                block = blocks[location_url] = {'category': block_location.category, 'children': []}
+            # keep the union of the draft and published children, in order
+            block['children'].extend(child for child in children if child not in block['children'])
+            # the draft's own metadata takes precedence over the published one's
+            if is_draft or location_url not in own_metadata_by_url:
+                own_metadata_by_url[location_url] = metadata
+                block['display_name'] = metadata.get('display_name')
+                block['graded'] = metadata.get('graded', False)
+                block['format'] = metadata.get('format')
+
+            if block_location.category == 'course':
+                root = location_url
 
         # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+        inherited_metadata = {}
 
-        def _compute_inherited_metadata(url):
+        def _compute_inherited_metadata(url, parent_metadata):
             """
-            Helper method for computing inherited metadata for a specific location url
+            Record the metadata `url` inherits and recurse into its children.
+            Only inheritable fields are pushed down; dicts are shared between
+            siblings, so must not be mutated by their users.
             """
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+            my_metadata = dict(parent_metadata)
+            my_metadata.update(
+                (field_name, value)
+                for field_name, value in own_metadata_by_url.get(url, {}).iteritems()
+                if field_name in InheritanceMixin.fields
+            )
+            for child in blocks.get(url, {}).get('children', []):
+                if child not in inherited_metadata:
+                    inherited_metadata[child] = my_metadata
+                    _compute_inherited_metadata(child, my_metadata)
 
         if root is not None:
-            _compute_inherited_metadata(root)
+            _compute_inherited_metadata(root, {})
 
-        return metadata_to_inherit
+        return {
+            'version': digest.hexdigest(),
+            'root': root,
+            'blocks': blocks,
+            'inherited_metadata': inherited_metadata,
+        }
 
-    def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
+    def compute_metadata_inheritance_tree(self, location):
         '''
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
+        return self.compute_course_structure(location)['inherited_metadata']
+
+    def get_course_structure(self, location, force_refresh=False, cached_only=False):
+        """
+        Return the structure (see `compute_course_structure`) of the course
+        containing `location`. If `cached_only`, return None rather than
+        computing it when it isn't cached.
+
+        The structure is looked up, in order, in the request cache, in this
+        process's LRU cache, and in the shared cache (e.g. memcached). The
+        shared cache holds a pointer to the current version of the structure,
+        so a lookup in the process cache still costs one shared cache hit to
+        make sure it isn't stale. If none of them has it, or on force refresh,
+        the structure is recomputed and written to all of them.
+        """
         key = metadata_cache_key(location)
-        tree = {}
+        structure = None
 
         if not force_refresh:
             # see if we are first in the request cache (if present)
-            if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
-                return self.request_cache.data['metadata_inheritance'][key]
+            if self.request_cache is not None and key in self.request_cache.data.get('course_structure', {}):
+                return self.request_cache.data['course_structure'][key]
 
-            # then look in any caching subsystem (e.g. memcached)
+            # then look for the current version in the process and shared caches
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
+                version = self.metadata_inheritance_cache_subsystem.get(course_structure_version_key(location))
+                if version is not None:
+                    structure = self.course_structure_cache.get(version)
+                    if structure is None:
+                        structure = self.metadata_inheritance_cache_subsystem.get(
+                            course_structure_cache_key(location, version)
+                        )
+                        if structure is not None:
+                            self.course_structure_cache.set(version, structure)
             else:
                 logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
 
-        if not tree:
-            # if not in subsystem, or we are on force refresh, then we have to compute
-            tree = self.compute_metadata_inheritance_tree(location)
+        if structure is None:
+            if cached_only:
+                return None
+            # if not cached, or we are on force refresh, then we have to compute
+            structure = self.compute_course_structure(location)
 
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
+            # write out the structure before pointing to its version, so that
+            # other processes never see a version they can't load
             if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+                self.metadata_inheritance_cache_subsystem.set(
+                    course_structure_cache_key(location, structure['version']), structure
+                )
+                self.metadata_inheritance_cache_subsystem.set(
+                    course_structure_version_key(location), structure['version']
+                )
+                self.course_structure_cache.set(structure['version'], structure)
 
         # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
+        # scope of the above if: statement so that after a cache hit, it'll get
         # put into the request_cache
         if self.request_cache is not None:
-            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
-            # defined
-            if 'metadata_inheritance' not in self.request_cache.data:
-                self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][key] = tree
+            self.request_cache.data.setdefault('course_structure', {})[key] = structure
 
-        return tree
+        return structure
+
+    def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
+        '''
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        '''
+        return self.get_course_structure(location, force_refresh)['inherited_metadata']
 
     def refresh_cached_metadata_inheritance_tree(self, location):
         """
-        Refresh the cached metadata inheritance tree for the org/course combination
-        for location
+        Refresh the cached course structure (which includes the metadata
+        inheritance tree) for the org/course combination for location
         """
         pseudo_course_id = '/'.join([location.org, location.course])
         if pseudo_course_id not in self.ignore_write_events_on_courses:
@@ -449,27 +519,44 @@ class MongoModuleStore(ModuleStoreWriteBase):
         for all descendents of items up to the specified depth.
         (0 = no descendents, 1 = children, 2 = grandchildren, etc)
         If depth is None, will load all the children.
-        This will make a number of queries that is linear in the depth.
-        """
 
+        If all items are in the same course, the descendents are found in the
+        cached course structure and loaded in a single round-trip. Otherwise,
+        this will make a number of queries that is linear in the depth.
+        """
         data = {}
-        to_process = list(items)
-        while to_process and depth is None or depth >= 0:
+        for item in items:
+            self._clean_item_data(item)
+            data[Location(item['location'])] = item
+
+        if depth == 0 or not items:
+            return data
+
+        courses = set((item['location']['org'], item['location']['course']) for item in items)
+        if len(courses) == 1:
+            structure = self.get_course_structure(Location(items[0]['location']))
+            descendants = self._structure_descendants(
+                structure,
+                [Location(item['location']).replace(revision=None).url() for item in items],
+                depth
+            )
+            if descendants:
+                for child in self._query_children_for_cache_children(descendants):
+                    self._clean_item_data(child)
+                    data[Location(child['location'])] = child
+            return data
+
+        to_process = [child for item in items for child in item.get('definition', {}).get('children', [])]
+        while to_process and (depth is None or depth > 0):
+            # Load all children by id. See
+            # http://www.mongodb.org/display/DOCS/Advanced+Queries#AdvancedQueries-%24or
+            # for or-query syntax
             children = []
-            for item in to_process:
+            for item in self._query_children_for_cache_children(to_process):
                 self._clean_item_data(item)
                 children.extend(item.get('definition', {}).get('children', []))
                 data[Location(item['location'])] = item
-
-            if depth == 0:
-                break
-
-            # Load all children by id. See
-            # http://www.mongodb.org/display/DOCS/Advanced+Queries#AdvancedQueries-%24or
-            # for or-query syntax
-            to_process = []
-            if children:
-                to_process = self._query_children_for_cache_children(children)
+            to_process = children
 
             # If depth is None, then we just recurse until we hit all the descendents
             if depth is not None:
@@ -477,6 +564,28 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
         return data
 
+    @staticmethod
+    def _structure_descendants(structure, urls, depth):
+        """
+        Return the urls of the descendants of the blocks at `urls` in the
+        course `structure`, down to `depth` levels (all of them if None).
+        """
+        descendants = []
+        seen = set(urls)
+        level = urls
+        while level and (depth is None or depth > 0):
+            next_level = []
+            for url in level:
+                for child in structure['blocks'].get(url, {}).get('children', []):
+                    if child not in seen:
+                        seen.add(child)
+                        next_level.append(child)
+            descendants.extend(next_level)
+            level = next_level
+            if depth is not None:
+                depth -= 1
+        return descendants
+
     def _load_item(self, item, data_cache, apply_cached_metadata=True):
         """
         Load an XModuleDescriptor from item, using the children stored in data_cache
@@ -565,6 +674,30 @@ class MongoModuleStore(ModuleStoreWriteBase):
         except ItemNotFoundError:
             return None
 
+    def get_course_version(self, course_id):
+        """
+        Return the version of the structure of the course with the given
+        course_id, which changes with the children or metadata of any of its
+        blocks (but not with their content fields).
+        """
+        id_components = Location.parse_course_id(course_id)
+        id_components['tag'] = 'i4x'
+        id_components['category'] = 'course'
+        return self.get_course_structure(Location(id_components))['version']
+
+    def get_course_content_version(self, course_id):
+        """
+        Return a digest of every module, draft or published, of the course
+        with the given course_id, which changes with any field of any of them.
+        Unlike the structure version, this reads the whole course.
+        """
+        id_components = Location.parse_course_id(course_id)
+        query = {'_id.org': id_components['org'], '_id.course': id_components['course']}
+        digest = hashlib.sha1()
+        for result in self.collection.find(query).sort('_id', pymongo.ASCENDING):
+            digest.update(json.dumps(result, sort_keys=True, default=unicode))
+        return digest.hexdigest()
+
     def has_item(self, course_id, location):
         """
         Returns True if location exists in this ModuleStore.
@@ -837,14 +970,39 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.refresh_cached_metadata_inheritance_tree(Location(location))
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
+    def get_parent_index(self, location, cached_only=False):
+        """
+        Return a dict mapping the url of every block with a parent in the
+        course containing `location` to the urls of its parents. Like the
+        course structure it is derived from, it collates the draft and
+        published versions of the blocks, and is kept per structure version,
+        so it's rebuilt whenever the course is written. If `cached_only`,
+        return None when the structure isn't cached.
+        """
+        structure = self.get_course_structure(location, cached_only=cached_only)
+        if structure is None:
+            return None
+        parent_index = self.parent_index_cache.get(structure['version'])
+        if parent_index is None:
+            parent_index = {}
+            for url, block in structure['blocks'].iteritems():
+                for child in block['children']:
+                    parent_index.setdefault(child, []).append(url)
+            self.parent_index_cache.set(structure['version'], parent_index)
+        return parent_index
+
     def get_parent_locations(self, location, course_id):
         '''Find all locations that are the parents of this location in this
         course.  Needed for path_to_location().
         '''
         location = Location.ensure_fully_specified(location)
-        items = self.collection.find({'definition.children': location.url()},
-                                     {'_id': True})
-        return [Location(i['_id']) for i in items]
+        # computing the whole structure of the course isn't worth it for a lookup
+        parent_index = self.get_parent_index(location, cached_only=True)
+        if parent_index is None:
+            items = self.collection.find({'definition.children': location.url()},
+                                         {'_id': True})
+            return [Location(i['_id']) for i in items]
+        return [Location(url) for url in parent_index.get(location.replace(revision=None).url(), [])]
 
     def get_modulestore_type(self, course_id):
         """
@@ -63,7 +63,9 @@ def path_to_location(modulestore, course_id, location):
             # get_parent_locations should raise ItemNotFoundError if location
             # isn't found so we don't have to do it explicitly.  Call this
             # first to make sure the location is there (even if it's a course, and
-            # we would otherwise immediately exit).
+            # we would otherwise immediately exit). The stores answer it from
+            # an in memory index of the course, so walking up the course
+            # doesn't cost a query per ancestor.
             parents = modulestore.get_parent_locations(loc, course_id)
 
             # print 'Processing loc={0}, path={1}'.format(loc, path)
@@ -108,10 +110,11 @@ def path_to_location(modulestore, course_id, location):
             category = path[path_index].category
             if category == 'sequential' or category == 'videosequence':
                 section_desc = modulestore.get_instance(course_id, path[path_index])
-                child_locs = [c.location for c in section_desc.get_children()]
+                # compare the children's urls rather than loading the children
+                child_urls = [Location(child).replace(revision=None).url() for child in section_desc.children]
                 # positions are 1-indexed, and should be strings to be consistent with
                 # url parsing.
-                position_list.append(str(child_locs.index(path[path_index + 1]) + 1))
+                position_list.append(str(child_urls.index(path[path_index + 1].replace(revision=None).url()) + 1))
         position = "_".join(position_list)
 
     return (course_id, chapter, section, position)
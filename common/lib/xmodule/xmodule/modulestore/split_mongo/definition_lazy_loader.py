@@ -8,18 +8,58 @@ class DefinitionLazyLoader(object):
     object doesn't force access during init but waits until client wants the
     definition. Only works if the modulestore is a split mongo store.
     """
-    def __init__(self, modulestore, definition_id):
+    def __init__(self, modulestore, definition_id, batch=None):
         """
         Simple placeholder for yet-to-be-fetched data
         :param modulestore: the pymongo db connection with the definitions
         :param definition_locator: the id of the record in the above to fetch
+        :param batch: an optional DefinitionBatch with which to fetch the definition
+            together with those of the other loaders registered in it
         """
         self.modulestore = modulestore
         self.definition_locator = DefinitionLocator(definition_id)
+        self.batch = batch
+        if batch is not None:
+            batch.add(self.definition_locator.definition_id)
 
     def fetch(self):
         """
         Fetch the definition. Note, the caller should replace this lazy
         loader pointer with the result so as not to fetch more than once
         """
+        if self.batch is not None:
+            return self.batch.get(self.definition_locator.definition_id)
         return self.modulestore.db_connection.get_definition(self.definition_locator.definition_id)
+
+
+class DefinitionBatch(object):
+    """
+    Collects the ids of the definitions lazily loaded by a descriptor system,
+    so that the first fetch of any of them fetches all the pending ones in a
+    single round trip.
+    """
+    def __init__(self, modulestore):
+        self.modulestore = modulestore
+        self.pending = set()
+        self.fetched = {}
+
+    def add(self, definition_id):
+        """
+        Register the id of a definition to fetch with the next batch
+        """
+        if definition_id not in self.fetched:
+            self.pending.add(definition_id)
+
+    def get(self, definition_id):
+        """
+        Return the definition with the given id, fetching it along with all
+        the pending ones if it hasn't been fetched yet
+        """
+        if definition_id not in self.fetched:
+            self.pending.add(definition_id)
+            definition_ids = list(self.pending)
+            self.pending.clear()
+            self.fetched.update(self.modulestore.db_connection.get_definitions(definition_ids))
+            # one round trip instead of one per definition
+            self.modulestore.record_saved_definition_round_trips(len(definition_ids) - 1)
+        return self.fetched.get(definition_id)
@@ -1,6 +1,7 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
+import bson
 import pymongo
 
 class MongoConnection(object):
@@ -8,10 +9,18 @@ class MongoConnection(object):
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
     def __init__(
-        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
+        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
+        structure_cache=None, definition_cache=None, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        structure_cache, definition_cache: optional LRUCaches in which to keep structures and
+        definitions fetched by id. Definitions never change once saved. Structures are only
+        updated in place while a course is being migrated, which reads them bypassing the cache
+        and evicts this process's copy; other processes may keep a stale copy of such a
+        structure until it's evicted from their cache. Entries are stored BSON encoded, so that
+        every caller gets its own decoded copy to mutate, and sized by their encoding.
         """
         self.database = pymongo.database.Database(
             pymongo.MongoClient(
@@ -26,6 +35,10 @@ class MongoConnection(object):
         if user is not None and password is not None:
             self.database.authenticate(user, password)
 
+        self.tz_aware = tz_aware
+        self.structure_cache = structure_cache
+        self.definition_cache = definition_cache
+
         self.course_index = self.database[collection + '.active_versions']
         self.structures = self.database[collection + '.structures']
         self.definitions = self.database[collection + '.definitions']
@@ -38,11 +51,30 @@ class MongoConnection(object):
         self.structures.write_concern = {'w': 1}
         self.definitions.write_concern = {'w': 1}
 
-    def get_structure(self, key):
+    def _cached_find_one(self, cache, collection, key):
+        """
+        Get the document whose id is the given key from cache if it's there, otherwise
+        from collection, caching it
+        """
+        if cache is None:
+            return collection.find_one({'_id': key})
+
+        encoded = cache.get(key)
+        if encoded is None:
+            document = collection.find_one({'_id': key})
+            if document is not None:
+                cache.set(key, bson.BSON.encode(document))
+            return document
+        return encoded.decode(tz_aware=self.tz_aware)
+
+    def get_structure(self, key, use_cache=True):
         """
-        Get the structure from the persistence mechanism whose id is the given key
+        Get the structure from the persistence mechanism whose id is the given key. If not
+        use_cache, read it from the db and don't cache it, e.g. to update it in place.
         """
-        return self.structures.find_one({'_id': key})
+        if not use_cache:
+            return self.structures.find_one({'_id': key})
+        return self._cached_find_one(self.structure_cache, self.structures, key)
 
     def find_matching_structures(self, query):
         """
@@ -59,9 +91,11 @@ class MongoConnection(object):
 
     def update_structure(self, structure):
         """
-        Update the db record for structure
+        Update the db record for structure, and evict it from this process's cache
         """
         self.structures.update({'_id': structure['_id']}, structure)
+        if self.structure_cache is not None:
+            self.structure_cache.delete(structure['_id'])
 
     def get_course_index(self, key):
         """
@@ -98,7 +132,28 @@ class MongoConnection(object):
         """
         Get the definition from the persistence mechanism whose id is the given key
         """
-        return self.definitions.find_one({'_id': key})
+        return self._cached_find_one(self.definition_cache, self.definitions, key)
+
+    def get_definitions(self, keys):
+        """
+        Get the definitions whose ids are the given keys, as a dict keyed by id, in a single
+        round trip for those that aren't cached. Missing definitions are left out.
+        """
+        definitions = {}
+        missing = []
+        for key in keys:
+            encoded = self.definition_cache.get(key) if self.definition_cache is not None else None
+            if encoded is None:
+                missing.append(key)
+            else:
+                definitions[key] = encoded.decode(tz_aware=self.tz_aware)
+
+        if missing:
+            for definition in self.definitions.find({'_id': {'$in': missing}}):
+                if self.definition_cache is not None:
+                    self.definition_cache.set(definition['_id'], bson.BSON.encode(definition))
+                definitions[definition['_id']] = definition
+        return definitions
 
     def find_matching_definitions(self, query):
         """
@@ -70,6 +70,7 @@ from bson.objectid import ObjectId
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
 from xblock.core import XBlock
 from xmodule.modulestore.loc_mapper_store import LocMapperStore
+from xmodule.util.lru_cache import LRUCache
 
 log = logging.getLogger(__name__)
 #==============================================================================
@@ -106,19 +107,40 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                  error_tracker=null_error_tracker,
                  loc_mapper=None,
                  i18n_service=None,
+                 structure_cache_size=100,
+                 structure_cache_bytes=100 * 1024 * 1024,
+                 definition_cache_size=10000,
+                 definition_cache_bytes=50 * 1024 * 1024,
+                 descriptor_cache_size=10,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param structure_cache_size: max number of structures in the process-wide structure cache
+        :param structure_cache_bytes: max total BSON size of the process-wide structure cache
+        :param definition_cache_size: max number of definitions in the process-wide definition cache
+        :param definition_cache_bytes: max total BSON size of the process-wide definition cache
+        :param descriptor_cache_size: max number of course versions whose descriptor system each thread keeps
         """
 
         super(SplitMongoModuleStore, self).__init__(**kwargs)
         self.loc_mapper = loc_mapper
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        # Structures and definitions are looked up by version id, so they're shared by every
+        # thread of the process. Only the migration of a course updates structures in place;
+        # it bypasses the cache to read them (see create_item and internal_clean_children).
+        self.structure_cache = LRUCache(structure_cache_size, max_size=structure_cache_bytes)
+        self.definition_cache = LRUCache(definition_cache_size, max_size=definition_cache_bytes)
+        # the child to parents index of each of the cached structures
+        self.parent_index_cache = LRUCache(structure_cache_size)
+        self.db_connection = MongoConnection(
+            structure_cache=self.structure_cache,
+            definition_cache=self.definition_cache,
+            **doc_store_config
+        )
         self.db = self.db_connection.database
 
-        # Code review question: How should I expire entries?
-        # _add_cache could use a lru mechanism to control the cache size?
+        # Descriptor systems hold the xblocks' mutable field data, so each thread keeps its own
+        self.descriptor_cache_size = descriptor_cache_size
         self.thread_cache = threading.local()
 
         if default_class is not None:
@@ -152,7 +174,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         if lazy:
             for block in new_module_data.itervalues():
-                block['definition'] = DefinitionLazyLoader(self, block['definition'])
+                if not isinstance(block['definition'], DefinitionLazyLoader):
+                    block['definition'] = DefinitionLazyLoader(self, block['definition'], system.definition_batch)
         else:
             # Load all descendants by id
             descendent_definitions = self.db_connection.find_matching_definitions({
@@ -198,15 +221,20 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             self.cache_items(system, block_ids, depth, lazy)
         return [system.load_item(block_id, course_entry) for block_id in block_ids]
 
+    def _thread_course_cache(self):
+        """
+        Return this thread's LRU cache of descriptor systems, keyed by course version guid
+        """
+        if not hasattr(self.thread_cache, 'course_cache'):
+            self.thread_cache.course_cache = LRUCache(self.descriptor_cache_size)
+        return self.thread_cache.course_cache
+
     def _get_cache(self, course_version_guid):
         """
         Find the descriptor cache for this course if it exists
         :param course_version_guid:
         """
-        if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        system = self.thread_cache.course_cache
-        return system.get(course_version_guid)
+        return self._thread_course_cache().get(course_version_guid)
 
     def _add_cache(self, course_version_guid, system):
         """
@@ -214,9 +242,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid:
         :param system:
         """
-        if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        self.thread_cache.course_cache[course_version_guid] = system
+        self._thread_course_cache().set(course_version_guid, system)
         return system
 
     def _clear_cache(self, course_version_guid=None):
@@ -225,15 +251,45 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid: if provided, clear only this entry
         """
         if course_version_guid:
-            del self.thread_cache.course_cache[course_version_guid]
+            self._thread_course_cache().delete(course_version_guid)
+            self.structure_cache.delete(course_version_guid)
         else:
-            self.thread_cache.course_cache = {}
+            self._thread_course_cache().clear()
+            self.structure_cache.clear()
+            self.definition_cache.clear()
+
+    def record_saved_definition_round_trips(self, count):
+        """
+        Add count to the number of definition round trips saved by batching during the current request
+        """
+        if self.request_cache is not None:
+            data = self.request_cache.data
+            data['split_definition_round_trips_saved'] = data.get('split_definition_round_trips_saved', 0) + count
+
+    def saved_definition_round_trips(self):
+        """
+        Return the number of definition round trips saved by batching during the current request
+        """
+        if self.request_cache is None:
+            return 0
+        return self.request_cache.data.get('split_definition_round_trips_saved', 0)
+
+    def cache_stats(self):
+        """
+        Return the hit, miss and eviction counters and the sizes of the process-wide
+        structure and definition caches, for monitoring.
+        """
+        return {
+            'structures': self.structure_cache.stats(),
+            'definitions': self.definition_cache.stats(),
+        }
 
-    def _lookup_course(self, course_locator):
+    def _lookup_course(self, course_locator, use_cache=True):
         '''
         Decode the locator into the right series of db access. Does not
         return the CourseDescriptor! It returns the actual db json from
-        structures.
+        structures. If not use_cache, the structure is read from the db
+        rather than the process-wide cache, and isn't cached.
 
         Semantics: if package_id and branch given, then it will get that branch. If
         also give a version_guid, it will see if the current head of that branch == that guid. If not
@@ -264,7 +320,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         # cast string to ObjectId if necessary
         version_guid = course_locator.as_object_id(version_guid)
-        entry = self.db_connection.get_structure(version_guid)
+        entry = self.db_connection.get_structure(version_guid, use_cache=use_cache)
 
         # b/c more than one course can use same structure, the 'package_id' and 'branch' are not intrinsic to structure
         # and the one assoc'd w/ it by another fetch may not be the one relevant to this fetch; so,
@@ -437,7 +493,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_id: ignored. Only included for API compatibility. Specify the course_id within the locator.
         '''
         course = self._lookup_course(locator)
-        items = self._get_parents_from_structure(locator.block_id, course['structure'])
+        parent_index = self._get_parent_index(course['structure'])
+        items = parent_index.get(locator.block_id, [])
         return [BlockUsageLocator(
                     url=locator.as_course_locator(),
                     block_id=LocMapperStore.decode_key_from_mongo(parent_id),
@@ -734,7 +791,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         """
         # find course_index entry if applicable and structures entry
         index_entry = self._get_index_if_valid(course_or_parent_locator, force, continue_version)
-        structure = self._lookup_course(course_or_parent_locator)['structure']
+        # a structure changed in place mustn't be read from a cache other processes may have filled
+        structure = self._lookup_course(course_or_parent_locator, use_cache=not continue_version)['structure']
 
         partitioned_fields = self.partition_fields_by_scope(category, fields)
         new_def_data = partitioned_fields.get(Scope.content, {})
@@ -789,7 +847,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 parent['edit_info']['update_version'] = new_id
         if continue_version:
             # db update
-            self.db_connection.update_structure(new_structure)
+            self._update_structure(new_structure)
             # clear cache so things get refetched and inheritance recomputed
             self._clear_cache(new_id)
         else:
@@ -1402,14 +1460,14 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
 
         :param course_locator: the course to clean
         """
-        original_structure = self._lookup_course(course_locator)['structure']
+        original_structure = self._lookup_course(course_locator, use_cache=False)['structure']
         for block in original_structure['blocks'].itervalues():
             if 'fields' in block and 'children' in block['fields']:
                 block['fields']["children"] = [
                     block_id for block_id in block['fields']["children"]
                     if LocMapperStore.encode_key_for_mongo(block_id) in original_structure['blocks']
                 ]
-        self.db_connection.update_structure(original_structure)
+        self._update_structure(original_structure)
         # clear cache again b/c inheritance may be wrong over orphans
         self._clear_cache(original_structure['_id'])
 
@@ -1555,6 +1613,30 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             'schema_version': self.SCHEMA_VERSION,
         }
 
+    def _update_structure(self, structure):
+        """
+        Update the persisted structure in place, dropping its cached parent index
+        """
+        self.db_connection.update_structure(structure)
+        self.parent_index_cache.delete(structure['_id'])
+
+    def _get_parent_index(self, structure):
+        """
+        Return a dict mapping the block_id of every block with a parent in
+        the persisted structure to the encoded block_ids of its parents.
+        The index is cached by structure version, and dropped when the
+        structure is updated in place. Use _get_parents_from_structure for
+        the structures being built.
+        """
+        parent_index = self.parent_index_cache.get(structure['_id'])
+        if parent_index is None:
+            parent_index = {}
+            for parent_id, value in structure['blocks'].iteritems():
+                for child_id in value['fields'].get('children', []):
+                    parent_index.setdefault(child_id, []).append(parent_id)
+            self.parent_index_cache.set(structure['_id'], parent_index)
+        return parent_index
+
     def _get_parents_from_structure(self, block_id, structure):
         """
         Given a structure, find all of block_id's parents in that structure. Note returns
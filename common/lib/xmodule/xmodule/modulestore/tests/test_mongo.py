@@ -4,6 +4,7 @@ from nose.tools import assert_equals, assert_raises, \
     assert_not_equals, assert_false, assert_true
 from itertools import ifilter
 # pylint: enable=E0611
+from mock import patch
 from path import path
 import pymongo
 import logging
@@ -24,12 +25,27 @@ from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
 from xmodule.contentstore.mongo import MongoContentStore
 
 from xmodule.modulestore.tests.test_modulestore import check_path_to_location
+from xmodule.modulestore.search import path_to_location
 from nose.tools import assert_in
 from xmodule.exceptions import NotFoundError
 from xmodule.modulestore.exceptions import InsufficientSpecificationError
 
 log = logging.getLogger(__name__)
 
+
+class DictCache(object):
+    """
+    A minimal stand-in for a Django cache, backed by a dict
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+
 HOST = 'localhost'
 PORT = 27017
 DB = 'test_mongo_%s' % uuid4().hex[:5]
@@ -186,10 +202,107 @@ class TestMongoModuleStore(object):
             self.store._find_one(Location("i4x://edX/toy/video/Welcome")),
             None)
 
+    def test_course_structure(self):
+        structure = self.store.compute_course_structure(Location("i4x://edX/toy/course/2012_Fall"))
+        assert_equals(structure['root'], "i4x://edX/toy/course/2012_Fall")
+        chapter = structure['blocks']["i4x://edX/toy/chapter/Overview"]
+        assert_equals(chapter['category'], 'chapter')
+        assert_in("i4x://edX/toy/videosequence/Toy_Videos", chapter['children'])
+        assert_equals(structure['blocks']["i4x://edX/toy/video/Welcome"]['display_name'], 'Welcome')
+        # leaves inherit from their ancestors, e.g. the course's start date
+        assert_in('start', structure['inherited_metadata']["i4x://edX/toy/html/toyhtml"])
+
+    def test_course_structure_process_cache(self):
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        location = Location("i4x://edX/toy/course/2012_Fall")
+        structure = store.get_course_structure(location)
+        assert_true(structure is store.get_course_structure(location))
+        assert_equals(store.course_structure_cache.hits, 1)
+
+        # the version is derived from the content, so recomputing the
+        # structure of the same content gives the same version...
+        store.refresh_cached_metadata_inheritance_tree(location)
+        assert_equals(store.get_course_structure(location)['version'], structure['version'])
+        assert_equals(store.compute_course_structure(location)['version'], structure['version'])
+
+        # ...while changing it creates a new version, which replaces the one
+        # other processes may have in their local cache
+        chapter = store.get_item(Location("i4x://edX/toy/chapter/Overview"))
+        chapter.display_name = 'Changed'
+        store.update_item(chapter)
+        assert_not_equals(store.get_course_structure(location)['version'], structure['version'])
+        del chapter.display_name
+        store.update_item(chapter)
+        assert_equals(store.get_course_structure(location)['version'], structure['version'])
+
+    def test_cache_children_single_round_trip(self):
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        location = Location("i4x://edX/toy/course/2012_Fall")
+        store.get_course_structure(location)
+        with patch.object(
+            store, '_query_children_for_cache_children', wraps=store._query_children_for_cache_children
+        ) as mock_query:
+            course = store.get_item(location, depth=None)
+        assert_equals(mock_query.call_count, 1)
+        videos = course.get_children()[0].get_children()[0].get_children()
+        assert_in(Location("i4x://edX/toy/html/toyhtml"), [video.location for video in videos])
+
     def test_path_to_location(self):
         '''Make sure that path_to_location works'''
         check_path_to_location(self.store)
 
+    def test_get_parent_locations_from_index(self):
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=DictCache(),
+        )
+        location = Location("i4x://edX/toy/html/toyhtml")
+        sequence_location = Location("i4x://edX/toy/videosequence/Toy_Videos")
+        store.get_course_structure(location)
+        with patch.object(store.collection, 'find', wraps=store.collection.find) as mock_find:
+            assert_equals(store.get_parent_locations(location, 'edX/toy/2012_Fall'), [sequence_location])
+            check_path_to_location(store)
+        assert_equals(mock_find.call_count, 0)
+        assert_equals(
+            path_to_location(store, 'edX/toy/2012_Fall', location),
+            ('edX/toy/2012_Fall', 'Overview', 'Toy_Videos', '3')
+        )
+
+        # the index follows the updates of the course
+        chapter = store.get_item(Location("i4x://edX/toy/chapter/poll_test"))
+        chapter.children.append(location.url())
+        store.update_item(chapter)
+        assert_equals(
+            set(store.get_parent_locations(location, 'edX/toy/2012_Fall')),
+            set([sequence_location, chapter.location])
+        )
+        chapter.children.remove(location.url())
+        store.update_item(chapter)
+        assert_equals(store.get_parent_locations(location, 'edX/toy/2012_Fall'), [sequence_location])
+
+    def test_get_parent_locations_uncached(self):
+        # without a cached structure, the parents are queried rather than the whole course
+        store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': COLLECTION},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+        )
+        location = Location("i4x://edX/toy/html/toyhtml")
+        with patch.object(store, 'compute_course_structure') as mock_compute:
+            assert_equals(
+                store.get_parent_locations(location, 'edX/toy/2012_Fall'),
+                [Location("i4x://edX/toy/videosequence/Toy_Videos")]
+            )
+        assert_false(mock_compute.called)
+
     def test_xlinter(self):
         '''
         Run through the xlinter, we know the 'toy' course has violations, but the
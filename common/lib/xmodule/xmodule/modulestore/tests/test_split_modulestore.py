@@ -8,6 +8,8 @@ from importlib import import_module
 from path import path
 import re
 import random
+import threading
+from mock import Mock, patch
 
 from xblock.fields import Scope
 from xmodule.course_module import CourseDescriptor
@@ -17,6 +19,7 @@ from xmodule.modulestore.locator import CourseLocator, BlockUsageLocator, Versio
 from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
+import bson
 from bson.objectid import ObjectId
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
 
@@ -612,6 +615,53 @@ class SplitModuleCourseTests(SplitModuleTest):
         self.assertIn('chapter1', block_map)
         self.assertIn('problem3_2', block_map)
 
+    def test_structure_cache(self):
+        """
+        Test that structures are shared across threads and that every caller gets its own copy.
+        """
+        locator = CourseLocator(package_id='testx.GreekHero', branch='draft')
+        version_guid = modulestore().get_course(locator).location.version_guid
+        # pylint: disable=W0212
+        modulestore()._clear_cache()
+
+        structure = modulestore().db_connection.get_structure(version_guid)
+        misses = modulestore().cache_stats()['structures']['misses']
+        structure['blocks'].clear()
+        # another thread's descriptor cache doesn't help, but the process-wide structure cache does
+        thread = threading.Thread(target=modulestore().get_course, args=(locator,))
+        thread.start()
+        thread.join()
+        stats = modulestore().cache_stats()['structures']
+        self.assertEqual(stats['misses'], misses)
+        self.assertGreater(stats['hits'], 0)
+        self.assertNotEqual(modulestore().db_connection.get_structure(version_guid)['blocks'], {})
+
+    def test_definition_batch(self):
+        """
+        Test that the lazily loaded definitions of a course are fetched together
+        """
+        locator = BlockUsageLocator(package_id='testx.GreekHero', block_id='head12345', branch='draft')
+        # pylint: disable=W0212
+        modulestore()._clear_cache()
+        db_connection = modulestore().db_connection
+        with patch.object(modulestore(), 'request_cache', Mock(data={})), \
+                patch.object(db_connection, 'get_definitions', wraps=db_connection.get_definitions) as mock_get:
+            course = modulestore().get_item(locator, depth=None)
+            batch = course.system.definition_batch
+            # reading one definition fetches all the pending ones
+            course.get_children()[0].data  # pylint: disable=W0104
+            saved_round_trips = modulestore().saved_definition_round_trips()
+        self.assertEqual(len(batch.pending), 0)
+        self.assertEqual(len(batch.fetched), len(course.system.module_data))
+        # whether or not the descriptors read their definitions on init, several
+        # definitions came with each round trip
+        self.assertGreater(max(len(args[0]) for args, __ in mock_get.call_args_list), 1)
+        self.assertLess(mock_get.call_count, len(batch.fetched))
+        # every definition but one of each round trip is counted as saved in the request
+        fetched_ids = sum(len(args[0]) for args, __ in mock_get.call_args_list)
+        self.assertEqual(saved_round_trips, fetched_ids - mock_get.call_count)
+        self.assertEqual(modulestore().saved_definition_round_trips(), 0)
+
     def test_course_successors(self):
         """
         get_course_successors(course_locator, version_history_depth=1)
@@ -1111,6 +1161,31 @@ class TestItemCrud(SplitModuleTest):
         self.assertEqual(refetch_course.previous_version, course_block_update_version)
         self.assertEqual(refetch_course.update_version, transaction_guid)
 
+    def test_continue_version_ignores_stale_cache(self):
+        """
+        Test that continuing a version reads the structure being changed in place from the db, not
+        from a copy cached before the previous change, e.g. by another process
+        """
+        user = random.getrandbits(32)
+        new_course = modulestore().create_course('test_org.test_stale_cache', 'test_org', user)
+        version_guid = new_course.location.version_guid
+        db_connection = modulestore().db_connection
+        stale_structure = db_connection.structures.find_one({'_id': version_guid})
+
+        chapter1 = modulestore().create_item(
+            new_course.location, 'chapter', user, fields={'display_name': 'chapter 1'}, continue_version=True
+        )
+        modulestore().structure_cache.set(version_guid, bson.BSON.encode(stale_structure))
+        chapter2 = modulestore().create_item(
+            new_course.location, 'chapter', user, fields={'display_name': 'chapter 2'}, continue_version=True
+        )
+
+        blocks = db_connection.structures.find_one({'_id': version_guid})['blocks']
+        self.assertIn(chapter1.location.block_id, blocks)
+        self.assertIn(chapter2.location.block_id, blocks)
+        # and the stale copy was evicted
+        self.assertIn(chapter1.location.block_id, db_connection.get_structure(version_guid)['blocks'])
+
     def test_update_metadata(self):
         """
         test updating an items metadata ensuring the definition doesn't version but the course does if it should
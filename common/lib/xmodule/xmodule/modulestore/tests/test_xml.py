@@ -3,6 +3,8 @@ Tests around our XML modulestore, including importing
 well-formed and not-well-formed XML.
 """
 import os.path
+import shutil
+import tempfile
 import unittest
 from glob import glob
 from mock import patch
@@ -101,3 +103,62 @@ class TestXMLModuleStore(unittest.TestCase):
         self.assertEqual(len(course_locations), 2)
         for course_number in ['toy', 'simple']:
             self.assertIn(Location('i4x', 'edX', course_number, 'course', '2012_Fall'), course_locations)
+
+
+class TestXMLModuleStoreSnapshots(unittest.TestCase):
+    """
+    Test loading the courses of the XML modulestore from snapshots, and in parallel
+    """
+    course_dirs = ['toy', 'simple']
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+
+    def assert_same_courses(self, store, expected_store):
+        """Assert that both stores loaded the same blocks, with the same fields and parents."""
+        self.assertEqual(sorted(store.courses), sorted(expected_store.courses))
+        for course_id, expected_modules in expected_store.modules.iteritems():
+            modules = store.modules[course_id]
+            self.assertEqual(sorted(modules), sorted(expected_modules))
+            for location, expected_module in expected_modules.iteritems():
+                self.assertEqual(modules[location].display_name, expected_module.display_name)
+                self.assertEqual(modules[location].children, expected_module.children)
+                if expected_store.parent_trackers[course_id].is_known(location):
+                    self.assertEqual(
+                        store.get_parent_locations(location, course_id),
+                        expected_store.get_parent_locations(location, course_id),
+                    )
+        for course in expected_store.get_courses():
+            self.assertEqual(store.get_item_errors(course.location), expected_store.get_item_errors(course.location))
+
+    def test_load_from_snapshot(self):
+        expected_store = XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, snapshot_dir=self.snapshot_dir)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), len(self.course_dirs))
+
+        with patch.object(XMLModuleStore, 'load_course') as mock_load_course:
+            store = XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, snapshot_dir=self.snapshot_dir)
+        self.assertFalse(mock_load_course.called)
+        self.assert_same_courses(store, expected_store)
+        check_path_to_location(store)
+
+    def test_course_changed(self):
+        XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, snapshot_dir=self.snapshot_dir)
+
+        with patch.object(XMLModuleStore, '_fingerprint', return_value='changed'):
+            with patch.object(XMLModuleStore, 'load_course', return_value=None) as mock_load_course:
+                XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, snapshot_dir=self.snapshot_dir)
+        self.assertEqual(mock_load_course.call_count, len(self.course_dirs))
+
+    def test_course_ids(self):
+        XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, snapshot_dir=self.snapshot_dir)
+        store = XMLModuleStore(
+            DATA_DIR, course_dirs=self.course_dirs, course_ids=['edX/toy/2012_Fall'], snapshot_dir=self.snapshot_dir
+        )
+        self.assertEqual([course.id for course in store.get_courses()], ['edX/toy/2012_Fall'])
+
+    def test_load_in_parallel(self):
+        expected_store = XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs)
+        store = XMLModuleStore(DATA_DIR, course_dirs=self.course_dirs, load_processes=2)
+        self.assert_same_courses(store, expected_store)
+
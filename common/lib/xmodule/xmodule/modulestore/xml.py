@@ -1,11 +1,14 @@
+import cPickle
 import hashlib
 import itertools
 import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
 import glob
+import tempfile
 
 from collections import defaultdict
 from cStringIO import StringIO
@@ -24,12 +27,12 @@ from xmodule.tabs import CourseTabList
 
 from xblock.fields import ScopeIds
 from xblock.field_data import DictFieldData
-from xblock.runtime import DictKeyValueStore, IdReader, IdGenerator
+from xblock.runtime import DictKeyValueStore, IdReader, IdGenerator, KvsFieldData
 
 from . import ModuleStoreReadBase, Location, XML_MODULESTORE_TYPE
 
 from .exceptions import ItemNotFoundError
-from .inheritance import compute_inherited_metadata, inheriting_field_data
+from .inheritance import compute_inherited_metadata, inheriting_field_data, InheritanceKeyValueStore
 
 edx_xml_parser = etree.XMLParser(dtd_validation=False, load_dtd=False,
                                  remove_comments=True, remove_blank_text=True)
@@ -38,6 +41,9 @@ etree.set_default_parser(edx_xml_parser)
 
 log = logging.getLogger(__name__)
 
+# Bump to invalidate the existing course snapshots when their format changes
+SNAPSHOT_VERSION = 1
+
 
 # VS[compat]
 # TODO (cpennington): Remove this once all fall 2012 courses have been imported
@@ -354,7 +360,7 @@ class XMLModuleStore(ModuleStoreReadBase):
     """
     def __init__(
         self, data_dir, default_class=None, course_dirs=None, course_ids=None,
-        load_error_modules=True, i18n_service=None, **kwargs
+        load_error_modules=True, i18n_service=None, snapshot_dir=None, load_processes=1, **kwargs
     ):
         """
         Initialize an XMLModuleStore from data_dir
@@ -366,10 +372,19 @@ class XMLModuleStore(ModuleStoreReadBase):
 
         course_dirs or course_ids: If specified, the list of course_dirs or course_ids to load. Otherwise,
             load all courses. Note, providing both
+
+        snapshot_dir: If specified, the directory where to keep a snapshot of each loaded
+            course, which is loaded instead of parsing the course xml as long as the course
+            directory doesn't change. Snapshots refer to the descriptor classes, so use a
+            new directory when deploying new code.
+
+        load_processes: the number of processes parsing the courses without snapshot in parallel
         """
         super(XMLModuleStore, self).__init__(**kwargs)
 
         self.data_dir = path(data_dir)
+        self.snapshot_dir = path(snapshot_dir) if snapshot_dir else None
+        self._fingerprints = {}  # course_dir -> hash of the course directory files
         self.modules = defaultdict(dict)  # course_id -> dict(location -> XBlock)
         self.courses = {}  # course_dir -> XBlock for the course
         self.errored_courses = {}  # course_dir -> errorlog, for dirs that failed to load
@@ -399,8 +414,24 @@ class XMLModuleStore(ModuleStoreReadBase):
         if course_dirs is None:
             course_dirs = sorted([d for d in os.listdir(self.data_dir) if
                                   os.path.exists(self.data_dir / d / "course.xml")])
+        self.load_courses(course_dirs, course_ids, load_processes)
+
+    def load_courses(self, course_dirs, course_ids=None, load_processes=1):
+        """
+        Load the courses in course_dirs, in order, from their snapshot when
+        there's an up to date one, or else from their xml, using up to
+        load_processes processes.
+        """
+        snapshots = dict((course_dir, self.read_snapshot(course_dir)) for course_dir in course_dirs)
+        missing = [course_dir for course_dir in course_dirs if snapshots[course_dir] is None]
+        if load_processes > 1 and len(missing) > 1:
+            snapshots.update(self._snapshot_courses_in_parallel(missing, course_ids, load_processes))
+
         for course_dir in course_dirs:
-            self.try_load_course(course_dir, course_ids)
+            if snapshots[course_dir] is None:
+                self.try_load_course(course_dir, course_ids)
+            else:
+                self.restore_snapshot(snapshots[course_dir], course_ids)
 
     def try_load_course(self, course_dir, course_ids=None):
         '''
@@ -432,6 +463,199 @@ class XMLModuleStore(ModuleStoreReadBase):
             self.courses[course_dir] = course_descriptor
             self._location_errors[course_descriptor.scope_ids.usage_id] = errorlog
             self.parent_trackers[course_descriptor.id].make_known(course_descriptor.scope_ids.usage_id)
+            if self.snapshot_dir is not None:
+                self.write_snapshot(course_dir, self.dump_snapshot(course_dir, course_descriptor, errorlog))
+
+    def _fingerprint(self, course_dir):
+        """
+        Return a hash of the names, sizes and modification times of the files of course_dir,
+        which changes whenever the course content does.
+        """
+        if course_dir not in self._fingerprints:
+            fingerprint = hashlib.sha1('{0} {1}'.format(SNAPSHOT_VERSION, self.load_error_modules))
+            root = self.data_dir / course_dir
+            for dirpath, dirnames, filenames in os.walk(root):
+                # walk in the same order everywhere
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    file_path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        # eg a broken symlink
+                        continue
+                    fingerprint.update('{0}\0{1}\0{2!r}\0'.format(
+                        os.path.relpath(file_path, root), stat.st_size, stat.st_mtime
+                    ))
+            self._fingerprints[course_dir] = fingerprint.hexdigest()
+        return self._fingerprints[course_dir]
+
+    def _snapshot_path(self, course_dir):
+        """Return the path of the snapshot of the current content of course_dir."""
+        return self.snapshot_dir / '{0}.{1}.snapshot'.format(course_dir, self._fingerprint(course_dir))
+
+    def read_snapshot(self, course_dir):
+        """
+        Return the snapshot of the current content of course_dir, or None if
+        there's none.
+        """
+        if self.snapshot_dir is None:
+            return None
+        snapshot_path = self._snapshot_path(course_dir)
+        if not os.path.exists(snapshot_path):
+            return None
+        try:
+            with open(snapshot_path, 'rb') as snapshot_file:
+                return cPickle.load(snapshot_file)
+        except Exception:  # pylint: disable=broad-except
+            # unpickling can raise about anything, eg when a descriptor class was removed
+            log.warning(
+                "Unable to read the snapshot %s, loading course '%s' from xml", snapshot_path, course_dir,
+                exc_info=True
+            )
+            return None
+
+    def dump_snapshot(self, course_dir, course_descriptor, errorlog):
+        """
+        Return the serialized data of the loaded course_descriptor, as read by
+        restore_snapshot, or None if it can't be serialized.
+        """
+        course_id = course_descriptor.id
+        course_location = course_descriptor.scope_ids.usage_id
+        blocks = []
+        # restore the course last, as it's the only block expecting its descendants to be loaded
+        for location, block in sorted(self.modules[course_id].iteritems(), key=lambda item: item[0] == course_location):
+            field_data = block._field_data  # pylint: disable=protected-access
+            if isinstance(field_data, DictFieldData):
+                fields = ('dict', field_data._data)  # pylint: disable=protected-access
+            elif isinstance(field_data, KvsFieldData) and isinstance(block.xblock_kvs, InheritanceKeyValueStore):
+                kvs = block.xblock_kvs
+                fields = ('kvs', kvs._fields, kvs.inherited_settings)  # pylint: disable=protected-access
+            else:
+                # blocks storing their fields in the shared self.field_data can't be dumped on their own
+                log.info("Not making a snapshot of course '%s': %s has no field data of its own", course_dir, location)
+                return None
+            blocks.append((
+                getattr(block, 'unmixed_class', block.__class__),
+                block.scope_ids,
+                getattr(block, 'data_dir', None),
+                fields,
+            ))
+
+        try:
+            return cPickle.dumps({
+                'course_dir': course_dir,
+                'course_id': course_id,
+                'blocks': blocks,
+                'parent_tracker': self.parent_trackers[course_id],
+                'errors': errorlog.errors,
+            }, cPickle.HIGHEST_PROTOCOL)
+        except (cPickle.PicklingError, TypeError):
+            log.info("Not making a snapshot of course '%s': its fields can't be pickled", course_dir, exc_info=True)
+            return None
+
+    def write_snapshot(self, course_dir, snapshot):
+        """
+        Save the serialized snapshot of course_dir, replacing the snapshots of
+        its previous versions.
+        """
+        if snapshot is None:
+            return
+        snapshot_path = self._snapshot_path(course_dir)
+        try:
+            if not os.path.isdir(self.snapshot_dir):
+                os.makedirs(self.snapshot_dir)
+            for stale_path in glob.glob(self.snapshot_dir / '{0}.*.snapshot'.format(course_dir)):
+                os.remove(stale_path)
+            # write then rename, so other processes never read a partial snapshot
+            temp_fd, temp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+            with os.fdopen(temp_fd, 'wb') as temp_file:
+                temp_file.write(snapshot)
+            os.rename(temp_path, snapshot_path)
+        except (IOError, OSError):
+            log.warning("Unable to write the snapshot %s", snapshot_path, exc_info=True)
+
+    def restore_snapshot(self, snapshot, course_ids=None):
+        """
+        Load the course serialized in snapshot, unless course_ids is not None
+        and doesn't contain its id.
+        """
+        if not isinstance(snapshot, dict):
+            snapshot = cPickle.loads(snapshot)
+        course_dir = snapshot['course_dir']
+        course_id = snapshot['course_id']
+        if course_ids is not None and course_id not in course_ids:
+            return
+
+        errorlog = make_error_tracker()
+        errorlog.errors.extend(snapshot['errors'])
+        # the policy was applied to the fields when loading the course
+        system = self._make_import_system(course_dir, course_id, errorlog.tracker, lambda usage_id: {})
+
+        modules = self.modules[course_id]
+        for block_class, scope_ids, data_dir, fields in snapshot['blocks']:
+            if fields[0] == 'dict':
+                field_data = DictFieldData(fields[1])
+            else:
+                field_data = KvsFieldData(
+                    InheritanceKeyValueStore(initial_values=fields[1], inherited_settings=fields[2])
+                )
+            block = system.construct_xblock_from_class(block_class, scope_ids, field_data)
+            if data_dir is not None:
+                block.data_dir = data_dir
+            block.save()
+            modules[scope_ids.usage_id] = block
+
+        course_descriptor = block
+        self.parent_trackers[course_id] = snapshot['parent_tracker']
+        self.courses[course_dir] = course_descriptor
+        self._location_errors[course_descriptor.scope_ids.usage_id] = errorlog
+
+    def _snapshot_courses_in_parallel(self, course_dirs, course_ids, processes):
+        """
+        Load the courses in course_dirs in a pool of processes. Return a dict
+        of course_dir -> serialized snapshot for the courses which loaded.
+        """
+        global _store_being_loaded  # pylint: disable=global-statement
+        # the forked processes get the store from the module, as it can't be pickled
+        _store_being_loaded = self
+        try:
+            pool = multiprocessing.Pool(processes)
+            try:
+                snapshots = pool.map(_load_course_snapshot, [(course_dir, course_ids) for course_dir in course_dirs], 1)
+            finally:
+                pool.close()
+                pool.join()
+        except (OSError, multiprocessing.ProcessError):
+            log.warning("Unable to load courses in parallel, loading them one by one", exc_info=True)
+            return {}
+        finally:
+            _store_being_loaded = None
+        return dict(
+            (course_dir, snapshot)
+            for course_dir, snapshot in zip(course_dirs, snapshots)
+            if snapshot is not None
+        )
+
+    def load_course_snapshot(self, course_dir, course_ids):
+        """
+        Load the course in course_dir and return its serialized snapshot, saved
+        to the snapshot_dir if there is one. Return None if it failed to load,
+        or couldn't be serialized.
+        """
+        errorlog = make_error_tracker()
+        try:
+            course_descriptor = self.load_course(course_dir, course_ids, errorlog.tracker)
+        except Exception:  # pylint: disable=broad-except
+            # try_load_course will load it again to record the error
+            return None
+        if course_descriptor is None or isinstance(course_descriptor, ErrorDescriptor):
+            return None
+        self.parent_trackers[course_descriptor.id].make_known(course_descriptor.scope_ids.usage_id)
+        snapshot = self.dump_snapshot(course_dir, course_descriptor, errorlog)
+        if self.snapshot_dir is not None:
+            self.write_snapshot(course_dir, snapshot)
+        return snapshot
 
     def __unicode__(self):
         '''
@@ -531,24 +755,7 @@ class XMLModuleStore(ModuleStoreReadBase):
                 """
                 return policy.get(policy_key(usage_id), {})
 
-            services = {}
-            if self.i18n_service:
-                services['i18n'] = self.i18n_service
-
-            system = ImportSystem(
-                xmlstore=self,
-                course_id=course_id,
-                course_dir=course_dir,
-                error_tracker=tracker,
-                parent_tracker=self.parent_trackers[course_id],
-                load_error_modules=self.load_error_modules,
-                get_policy=get_policy,
-                mixins=self.xblock_mixins,
-                default_class=self.default_class,
-                select=self.xblock_select,
-                field_data=self.field_data,
-                services=services,
-            )
+            system = self._make_import_system(course_dir, course_id, tracker, get_policy)
 
             course_descriptor = system.process_xml(etree.tostring(course_data, encoding='unicode'))
 
@@ -577,6 +784,29 @@ class XMLModuleStore(ModuleStoreReadBase):
             log.debug('========> Done with course import from {0}'.format(course_dir))
             return course_descriptor
 
+    def _make_import_system(self, course_dir, course_id, tracker, get_policy):
+        """
+        Return the ImportSystem loading the blocks of course_id from course_dir
+        """
+        services = {}
+        if self.i18n_service:
+            services['i18n'] = self.i18n_service
+
+        return ImportSystem(
+            xmlstore=self,
+            course_id=course_id,
+            course_dir=course_dir,
+            error_tracker=tracker,
+            parent_tracker=self.parent_trackers[course_id],
+            load_error_modules=self.load_error_modules,
+            get_policy=get_policy,
+            mixins=self.xblock_mixins,
+            default_class=self.default_class,
+            select=self.xblock_select,
+            field_data=self.field_data,
+            services=services,
+        )
+
     def load_extra_content(self, system, course_descriptor, category, base_dir, course_dir, url_name):
         self._load_extra_content(system, course_descriptor, category, base_dir, course_dir)
 
@@ -800,3 +1030,21 @@ class XMLModuleStore(ModuleStoreReadBase):
         """
         courses = self.get_courses()
         return [course.location for course in courses if (course.wiki_slug == wiki_slug)]
+
+
+# The XMLModuleStore loading courses in a process pool, see _snapshot_courses_in_parallel
+_store_being_loaded = None
+
+
+def _load_course_snapshot(args):
+    """
+    Load a course in a process of the pool of XMLModuleStore._snapshot_courses_in_parallel
+    and return its serialized snapshot.
+    """
+    course_dir, course_ids = args
+    try:
+        return _store_being_loaded.load_course_snapshot(course_dir, course_ids)
+    except Exception:  # pylint: disable=broad-except
+        # the process loading the courses will try again
+        log.exception("Error loading course '%s' in parallel", course_dir)
+        return None
@@ -47,7 +47,8 @@ class EdxJSONEncoder(json.JSONEncoder):
             return super(EdxJSONEncoder, self).default(obj)
 
 
-def export_to_xml(modulestore, contentstore, course_location, root_dir, course_dir, draft_modulestore=None):
+def export_to_xml(modulestore, contentstore, course_location, root_dir, course_dir, draft_modulestore=None,
+                  export_assets=True):
     """
     Export all modules from `modulestore` and content from `contentstore` as xml to `root_dir`.
 
@@ -58,6 +59,9 @@ def export_to_xml(modulestore, contentstore, course_location, root_dir, course_d
     `course_dir`: The name of the directory inside `root_dir` to write the course content to
     `draft_modulestore`: An optional `DraftModuleStore` that contains draft content, which will be exported
         alongside the public content in the course.
+    `export_assets`: Whether to export the assets of `contentstore` and their policy file, which callers
+        archiving the course may rather stream with `contentstore.export_all_for_course_to_tar`. The legacy
+        copy of the default course image is exported either way.
     """
 
     course_id = course_location.course_id
@@ -75,11 +79,12 @@ def export_to_xml(modulestore, contentstore, course_location, root_dir, course_d
     # export the static assets
     policies_dir = export_fs.makeopendir('policies')
     if contentstore:
-        contentstore.export_all_for_course(
-            course_location,
-            root_dir + '/' + course_dir + '/static/',
-            root_dir + '/' + course_dir + '/policies/assets.json',
-        )
+        if export_assets:
+            contentstore.export_all_for_course(
+                course_location,
+                root_dir + '/' + course_dir + '/static/',
+                root_dir + '/' + course_dir + '/policies/assets.json',
+            )
 
         # If we are using the default course image, export it to the
         # legacy location to support backwards compatibility.
@@ -1,15 +1,19 @@
+from contextlib import contextmanager
+import hashlib
 import logging
+import multiprocessing
 import os
 import mimetypes
 from path import path
 import json
+import time
 
 from .xml import XMLModuleStore, ImportSystem, ParentTracker
 from xmodule.modulestore import Location
 from xblock.runtime import KvsFieldData, DictKeyValueStore
 from xmodule.x_module import XModuleDescriptor
 from xblock.fields import Scope, Reference, ReferenceList, ReferenceValueDict
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, make_thumbnail, thumbnail_name_and_location
 from .inheritance import own_metadata
 from xmodule.errortracker import make_error_tracker
 from .store_utilities import rewrite_nonportable_content_links
@@ -18,11 +22,117 @@ import xblock
 log = logging.getLogger(__name__)
 
 
+# files up to this size are read into memory at once, bigger ones are streamed
+# to the content store
+STATIC_CONTENT_STREAM_THRESHOLD = 1024 * 1024
+STATIC_CONTENT_CHUNK_SIZE = 256 * 1024
+
+
+def _read_chunks(content_path):
+    """
+    Yield the data of the file at content_path, chunk by chunk
+    """
+    with open(content_path, 'rb') as content_file:
+        while True:
+            chunk = content_file.read(STATIC_CONTENT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _file_md5(content_path):
+    """
+    Return the hex md5 of the file at content_path, the way GridFS computes it,
+    without holding the file in memory
+    """
+    md5 = hashlib.md5()
+    for chunk in _read_chunks(content_path):
+        md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _thumbnail_data(content_path):
+    """
+    Return the JPEG data of the thumbnail of the image at content_path, or None
+    if it can't be made. Run in the thumbnail worker processes.
+    """
+    try:
+        return make_thumbnail(content_path).getvalue()
+    except Exception:  # pylint: disable=broad-except
+        # thumbnails are generally considered as optional
+        log.exception(u"Failed to generate thumbnail for %s", content_path)
+        return None
+
+
+def _map_thumbnails(content_paths, processes):
+    """
+    Return the list of the thumbnail data (see _thumbnail_data) of each image
+    in content_paths, computed by a pool of `processes` processes.
+    """
+    pool = None
+    if processes > 1 and len(content_paths) > 1:
+        try:
+            pool = multiprocessing.Pool(processes)
+        except (AssertionError, OSError):
+            # eg daemonic processes, such as celery workers, can't have children
+            log.warning("Unable to start thumbnail processes, generating thumbnails inline", exc_info=True)
+
+    if pool is None:
+        return [_thumbnail_data(content_path) for content_path in content_paths]
+
+    try:
+        return pool.map(_thumbnail_data, content_paths, chunksize=4)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+@contextmanager
+def _timed(timings, phase):
+    """
+    Add the time spent in the block to timings[phase]
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0) + time.time() - start
+
+
+def _is_up_to_date(stored_attrs, content, md5):
+    """
+    Whether the stored copy of content, with the stored attributes stored_attrs
+    (see get_all_content_digests_for_course), already has the given md5 and
+    the same attributes as content
+    """
+    if not stored_attrs:
+        return False
+    return (
+        stored_attrs.get('md5') == md5 and
+        stored_attrs.get('contentType') == content.content_type and
+        stored_attrs.get('displayname') == content.name and
+        stored_attrs.get('locked', False) == content.locked and
+        stored_attrs.get('import_path') == content.import_path
+    )
+
+
 def import_static_content(
         modules, course_loc, course_data_path, static_content_store,
-        target_location_namespace, subpath='static', verbose=False):
-
+        target_location_namespace, subpath='static', verbose=False,
+        thumbnail_processes=None):
+    """
+    Import the files under course_data_path / subpath into the
+    static_content_store, as assets of the course target_location_namespace.
+    Return the dict mapping the paths of the files relative to the subpath to
+    the names of their assets.
+
+    Files whose stored copy is already identical, per its md5 and attributes,
+    are skipped. Big files are streamed to the store rather than read into
+    memory, and the thumbnails of images are generated by a pool of
+    thumbnail_processes processes (one per CPU by default).
+    """
     remap_dict = {}
+    timings = {}
 
     # now import all static assets
     static_dir = course_data_path / subpath
@@ -37,69 +147,126 @@ def import_static_content(
     verbose = True
     mimetypes_list = mimetypes.types_map.values()
 
-    for dirname, _, filenames in os.walk(static_dir):
-        for filename in filenames:
+    try:
+        stored_assets = static_content_store.get_all_content_digests_for_course(target_location_namespace)
+    except NotImplementedError:
+        stored_assets = {}
+
+    # first find the files whose stored copy is out of date
+    to_save = []
+    skipped = 0
+    with _timed(timings, 'scan'):
+        for dirname, _, filenames in os.walk(static_dir):
+            for filename in filenames:
+
+                content_path = os.path.join(dirname, filename)
+
+                if filename.endswith('~'):
+                    if verbose:
+                        log.debug('skipping static content %s...', content_path)
+                    continue
+
+                try:
+                    md5 = _file_md5(content_path)
+                    size = os.path.getsize(content_path)
+                except (IOError, OSError):
+                    if filename.startswith('._'):
+                        # OS X "companion files". See
+                        # http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
+                        continue
+                    # Not a 'hidden file', then re-raise exception
+                    raise
+
+                # strip away leading path from the name
+                fullname_with_subpath = content_path.replace(static_dir, '')
+                if fullname_with_subpath.startswith('/'):
+                    fullname_with_subpath = fullname_with_subpath[1:]
+                content_loc = StaticContent.compute_location(
+                    target_location_namespace.org, target_location_namespace.course,
+                    fullname_with_subpath
+                )
+
+                policy_ele = policy.get(content_loc.name, {})
+                displayname = policy_ele.get('displayname', filename)
+                locked = policy_ele.get('locked', False)
+                mime_type = policy_ele.get('contentType')
+
+                # Check extracted contentType in list of all valid mimetypes
+                if not mime_type or mime_type not in mimetypes_list:
+                    mime_type = mimetypes.guess_type(filename)[0]   # Assign guessed mimetype
+                content = StaticContent(
+                    content_loc, displayname, mime_type, None,
+                    import_path=fullname_with_subpath, locked=locked
+                )
 
-            content_path = os.path.join(dirname, filename)
+                # store the remapping information which will be needed
+                # to subsitute in the module data
+                remap_dict[fullname_with_subpath] = content_loc.name
 
-            if filename.endswith('~'):
-                if verbose:
-                    log.debug('skipping static content %s...', content_path)
+                if _is_up_to_date(stored_assets.get(content.get_url_path()), content, md5):
+                    if verbose:
+                        log.debug('static content %s is up to date', content_path)
+                    skipped += 1
+                    continue
+
+                to_save.append((content_path, size, content))
+
+    # then generate the thumbnails of the images, so we can get back their locations
+    images = [
+        (content_path, content) for content_path, __, content in to_save
+        if content.content_type is not None and content.content_type.split('/')[0] == 'image'
+    ]
+    if thumbnail_processes is None:
+        thumbnail_processes = multiprocessing.cpu_count()
+    thumbnails = 0
+    with _timed(timings, 'thumbnails'):
+        thumbnail_data = _map_thumbnails([content_path for content_path, __ in images], thumbnail_processes)
+        for (content_path, content), data in zip(images, thumbnail_data):
+            if data is None:
                 continue
+            thumbnail_name, thumbnail_location = thumbnail_name_and_location(content.location)
+            try:
+                static_content_store.save(StaticContent(thumbnail_location, thumbnail_name, 'image/jpeg', data))
+            except Exception:  # pylint: disable=broad-except
+                log.exception(u"Failed to save thumbnail for %s", content_path)
+                continue
+            content.thumbnail_location = thumbnail_location
+            thumbnails += 1
 
+    # then commit the content
+    saved_bytes = 0
+    with _timed(timings, 'save'):
+        for content_path, size, content in to_save:
             if verbose:
                 log.debug('importing static content %s...', content_path)
 
-            try:
+            if size <= STATIC_CONTENT_STREAM_THRESHOLD:
                 with open(content_path, 'rb') as f:
                     data = f.read()
-            except IOError:
-                if filename.startswith('._'):
-                    # OS X "companion files". See
-                    # http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
-                    continue
-                # Not a 'hidden file', then re-raise exception
-                raise
-
-            # strip away leading path from the name
-            fullname_with_subpath = content_path.replace(static_dir, '')
-            if fullname_with_subpath.startswith('/'):
-                fullname_with_subpath = fullname_with_subpath[1:]
-            content_loc = StaticContent.compute_location(
-                target_location_namespace.org, target_location_namespace.course,
-                fullname_with_subpath
-            )
-
-            policy_ele = policy.get(content_loc.name, {})
-            displayname = policy_ele.get('displayname', filename)
-            locked = policy_ele.get('locked', False)
-            mime_type = policy_ele.get('contentType')
-
-            # Check extracted contentType in list of all valid mimetypes
-            if not mime_type or mime_type not in mimetypes_list:
-                mime_type = mimetypes.guess_type(filename)[0]   # Assign guessed mimetype
+            else:
+                data = _read_chunks(content_path)
             content = StaticContent(
-                content_loc, displayname, mime_type, data,
-                import_path=fullname_with_subpath, locked=locked
+                content.location, content.name, content.content_type, data,
+                thumbnail_location=content.thumbnail_location,
+                import_path=content.import_path, locked=content.locked
             )
 
-            # first let's save a thumbnail so we can get back a thumbnail location
-            thumbnail_content, thumbnail_location = static_content_store.generate_thumbnail(content)
-
-            if thumbnail_content is not None:
-                content.thumbnail_location = thumbnail_location
-
-            # then commit the content
             try:
                 static_content_store.save(content)
             except Exception as err:
                 log.exception('Error importing {0}, error={1}'.format(
-                    fullname_with_subpath, err
+                    content.import_path, err
                 ))
-
-            # store the remapping information which will be needed
-            # to subsitute in the module data
-            remap_dict[fullname_with_subpath] = content_loc.name
+            else:
+                saved_bytes += size
+
+    total_time = sum(timings.values())
+    log.info(
+        "Imported static content from %s: %d files saved (%d bytes, %.2f MB/s), %d up to date, "
+        "%d thumbnails; %.2fs scanning, %.2fs making thumbnails, %.2fs saving",
+        static_dir, len(to_save), saved_bytes, saved_bytes / 1048576.0 / total_time if total_time else 0,
+        skipped, thumbnails, timings['scan'], timings['thumbnails'], timings['save']
+    )
 
     return remap_dict
 
@@ -109,7 +276,7 @@ def import_from_xml(
         default_class='xmodule.raw_module.RawDescriptor',
         load_error_modules=True, static_content_store=None,
         target_location_namespace=None, verbose=False, draft_store=None,
-        do_import_static=True):
+        do_import_static=True, progress_callback=None):
     """
     Import the specified xml data_dir into the "store" modulestore,
     using org and course as the location org and course.
@@ -132,7 +299,14 @@ def import_from_xml(
         time the course is loaded. Static content for some courses may also be
         served directly by nginx, instead of going through django.
 
+    :param progress_callback:
+        if not None, called with the name of each phase of the import of a
+        course as it starts: 'static' (the static content), 'modules' and
+        'drafts'.
+
     """
+    if progress_callback is None:
+        progress_callback = lambda phase: None
 
     xml_module_store = XMLModuleStore(
         data_dir,
@@ -249,6 +423,7 @@ def import_from_xml(
                     course_items.append(module)
 
             # then import all the static content
+            progress_callback('static')
             if static_content_store is not None and do_import_static:
                 if target_location_namespace is not None:
                     _namespace_rename = target_location_namespace
@@ -292,6 +467,7 @@ def import_from_xml(
                 )
 
             # finally loop through all the modules
+            progress_callback('modules')
             for module in xml_module_store.modules[course_id].itervalues():
                 if module.scope_ids.block_type == 'course':
                     # we've already saved the course module up at the top
@@ -316,6 +492,7 @@ def import_from_xml(
 
             # now import any 'draft' items
             if draft_store is not None:
+                progress_callback('drafts')
                 import_course_draft(
                     xml_module_store,
                     store,
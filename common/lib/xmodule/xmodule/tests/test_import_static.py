@@ -1,6 +1,8 @@
 """
-Tests that check that we ignore the appropriate files when importing courses.
+Tests that check that we ignore the appropriate files, and the up to date ones,
+when importing courses.
 """
+import hashlib
 import unittest
 from mock import Mock
 from xmodule.modulestore import Location
@@ -21,3 +23,42 @@ class IgnoredFilesTestCase(unittest.TestCase):
         self.assertIn("example.txt", name_val)
         self.assertNotIn("example.txt~", name_val)
         self.assertIn("GREEN", name_val["example.txt"])
+
+
+class UpToDateFilesTestCase(unittest.TestCase):
+    "Tests for files whose stored copy is up to date"
+    def setUp(self):
+        self.course_dir = DATA_DIR / "tilde"
+        self.loc = Location("edX", "tilde", "Fall_2012")
+        with open(self.course_dir / "static" / "example.txt", 'rb') as example_file:
+            self.stored_attrs = {
+                'md5': hashlib.md5(example_file.read()).hexdigest(),
+                'contentType': 'text/plain',
+                'displayname': 'example.txt',
+                'locked': False,
+                'import_path': 'example.txt',
+            }
+
+    def import_with_stored_attrs(self, stored_attrs):
+        "Import the static files, with example.txt stored with the given attributes"
+        content_store = Mock()
+        content_store.get_all_content_digests_for_course.return_value = {
+            '/c4x/tilde/Fall_2012/asset/example.txt': stored_attrs
+        }
+        remap_dict = import_static_content(Mock(), Mock(), self.course_dir, content_store, self.loc)
+        self.assertEqual(remap_dict, {'example.txt': 'example.txt'})
+        return content_store
+
+    def test_skip_up_to_date_files(self):
+        content_store = self.import_with_stored_attrs(self.stored_attrs)
+        self.assertFalse(content_store.save.called)
+
+    def test_save_changed_files(self):
+        self.stored_attrs['md5'] = 'changed'
+        content_store = self.import_with_stored_attrs(self.stored_attrs)
+        self.assertEqual(content_store.save.call_count, 1)
+
+    def test_save_files_with_changed_attributes(self):
+        self.stored_attrs['locked'] = True
+        content_store = self.import_with_stored_attrs(self.stored_attrs)
+        self.assertEqual(content_store.save.call_count, 1)
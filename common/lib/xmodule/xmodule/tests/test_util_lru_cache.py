@@ -0,0 +1,52 @@
+"""
+Tests for xmodule.util.lru_cache
+"""
+import unittest
+
+from xmodule.util.lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    Tests for LRUCache
+    """
+    def test_get_set(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # touch 'a' so that 'b' is the least recently used
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_delete_and_clear(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete('a')
+        self.assertNotIn('a', cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_size_bound(self):
+        cache = LRUCache(10, max_size=5)
+        cache.set('a', 'xx')
+        cache.set('b', 'xxx')
+        self.assertEqual(cache.size, 5)
+        cache.set('c', 'x')
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.size, 4)
+        # values bigger than the whole cache are never cached
+        cache.set('d', 'xxxxxx')
+        self.assertNotIn('d', cache)
+        self.assertEqual(cache.stats()['items'], 2)
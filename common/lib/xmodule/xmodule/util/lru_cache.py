@@ -0,0 +1,99 @@
+"""
+A thread-safe, size-bounded, least-recently-used cache.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    A dict-like cache holding at most `max_items` entries and, if `max_size`
+    is given, entries whose sizes (as computed by `size_of`, `len` by
+    default) add up to at most `max_size`. When full, adding an entry evicts
+    the least recently used ones. Safe to share across threads.
+
+    Values are returned as stored, so callers must not mutate them.
+    """
+    def __init__(self, max_items, max_size=None, size_of=len):
+        self.max_items = max_items
+        self.max_size = max_size
+        self.size_of = size_of
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Return the value cached for `key` and mark it as most recently used,
+        or `default` if `key` isn't cached.
+        """
+        with self._lock:
+            try:
+                value, size = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Cache `value` for `key`, evicting the least recently used entries
+        if the cache is full. A value bigger than `max_size` isn't cached.
+        """
+        size = self.size_of(value) if self.max_size is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.max_size is not None and size > self.max_size:
+                return
+            self._data[key] = (value, size)
+            self.size += size
+            while len(self._data) > self.max_items or (self.max_size is not None and self.size > self.max_size):
+                __, (__, evicted_size) = self._data.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        Remove `key` from the cache, if present.
+        """
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Return a dict of counters describing the use of this cache, for monitoring.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'items': len(self._data),
+            'size': self.size,
+        }
+
+    def _pop(self, key):
+        """
+        Remove `key` from the cache, if present. The caller must hold the lock.
+        """
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -25,26 +25,42 @@ def enrolled_students_features(course_id, features):
         {'username': 'username3', 'first_name': 'firstname3'}
     ]
     """
-    students = User.objects.filter(
+    return list(iter_enrolled_students_features(course_id, features))
+
+
+def iter_enrolled_students_features(course_id, features):
+    """
+    Yield the features of the enrolled students as dictionaries, as
+    `enrolled_students_features` returns them, fetching them as they are
+    consumed instead of all at once.
+    """
+    student_features = [x for x in STUDENT_FEATURES if x in features]
+    profile_features = [x for x in PROFILE_FEATURES if x in features]
+    if not student_features and not profile_features:
+        # values() of no fields would return every field of the users
+        for __ in _enrolled_students(course_id).values_list('id', flat=True).iterator():
+            yield {}
+        return
+
+    # Only fetch the requested columns, without building model instances
+    # for each of the students of large courses
+    students = _enrolled_students(course_id).values(
+        *(student_features + ['profile__' + feature for feature in profile_features])
+    )
+    for student in students.iterator():
+        student_dict = dict((feature, student[feature]) for feature in student_features)
+        student_dict.update(
+            (feature, student['profile__' + feature]) for feature in profile_features
+        )
+        yield student_dict
+
+
+def _enrolled_students(course_id):
+    """ Return the queryset of the students actively enrolled in the course """
+    return User.objects.filter(
         courseenrollment__course_id=course_id,
         courseenrollment__is_active=1,
-    ).order_by('username').select_related('profile')
-
-    def extract_student(student, features):
-        """ convert student to dictionary """
-        student_features = [x for x in STUDENT_FEATURES if x in features]
-        profile_features = [x for x in PROFILE_FEATURES if x in features]
-
-        student_dict = dict((feature, getattr(student, feature))
-                            for feature in student_features)
-        profile = student.profile
-        if profile is not None:
-            profile_dict = dict((feature, getattr(profile, feature))
-                                for feature in profile_features)
-            student_dict.update(profile_dict)
-        return student_dict
-
-    return [extract_student(student, features) for student in students]
+    ).order_by('username')
 
 
 def dump_grading_context(course):
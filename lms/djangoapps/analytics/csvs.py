@@ -5,6 +5,8 @@ Format and create csv responses
 """
 
 import csv
+from cStringIO import StringIO
+
 from django.http import HttpResponse
 
 
@@ -14,21 +16,38 @@ def create_csv_response(filename, header, datarows):
 
     header   e.g. ['Name', 'Email']
     datarows e.g. [['Jim', 'jim@edy.org'], ['Jake', 'jake@edy.org'], ...]
+
+    datarows can be any iterable, eg a generator over a queryset iterator:
+    the rows are formatted as the response is sent, so neither the rows nor
+    the file are ever held in memory as a whole, and the download starts
+    right away whatever the number of rows.
     """
-    response = HttpResponse(mimetype='text/csv')
+    response = HttpResponse(_csv_lines(header, datarows), mimetype='text/csv')
     response['Content-Disposition'] = 'attachment; filename={0}'\
         .format(filename)
+    return response
+
+
+def _csv_lines(header, datarows):
+    """
+    Yield the lines of the csv file of the header and datarows, as encoded
+    by create_csv_response.
+    """
+    line = StringIO()
     csvwriter = csv.writer(
-        response,
+        line,
         dialect='excel',
         quotechar='"',
         quoting=csv.QUOTE_ALL)
 
     csvwriter.writerow(header)
+    yield line.getvalue()
     for datarow in datarows:
+        line.seek(0)
+        line.truncate()
         encoded_row = [unicode(s).encode('utf-8') for s in datarow]
         csvwriter.writerow(encoded_row)
-    return response
+        yield line.getvalue()
 
 
 def format_dictlist(dictlist, features):
@@ -64,17 +83,23 @@ def format_dictlist(dictlist, features):
     }
     """
 
-    def dict_to_entry(dct):
-        """ Convert dictionary to a list for a csv row """
-        relevant_items = [(k, v) for (k, v) in dct.items() if k in features]
-        ordered = sorted(relevant_items, key=lambda (k, v): header.index(k))
-        vals = [v for (_, v) in ordered]
-        return vals
+    header, datarows = format_dicts(dictlist, features)
+    return header, list(datarows)
+
 
+def format_dicts(dicts, features):
+    """
+    Convert an iterable of dictionaries to be compatible with
+    create_csv_response, as format_dictlist does, but with datarows as a
+    generator, so that the rows are only converted as they are written.
+    """
     header = features
-    datarows = map(dict_to_entry, dictlist)
 
-    return header, datarows
+    def dict_to_entry(dct):
+        """ Convert dictionary to a list for a csv row """
+        return [dct[feature] for feature in features if feature in dct]
+
+    return header, (dict_to_entry(dct) for dct in dicts)
 
 
 def format_instances(instances, features):
@@ -3,7 +3,7 @@
 from django.test import TestCase
 from nose.tools import raises
 
-from analytics.csvs import create_csv_response, format_dictlist, format_instances
+from analytics.csvs import create_csv_response, format_dictlist, format_dicts, format_instances
 
 
 class TestAnalyticsCSVS(TestCase):
@@ -36,6 +36,21 @@ class TestAnalyticsCSVS(TestCase):
         self.assertEqual(res['Content-Disposition'], 'attachment; filename={0}'.format('robot.csv'))
         self.assertEqual(res.content.strip(), '')
 
+    def test_create_csv_response_streams_rows(self):
+        consumed = []
+
+        def datarows():
+            """ Rows recording when they are consumed """
+            for name in ['Jim', 'Jake']:
+                consumed.append(name)
+                yield [name, u'caf\xe9']
+
+        res = create_csv_response('robot.csv', ['Name', 'Drink'], datarows())
+        self.assertEqual(consumed, [])
+        self.assertEqual(res.content.strip(), '"Name","Drink"\r\n"Jim","caf\xc3\xa9"\r\n"Jake","caf\xc3\xa9"')
+        self.assertEqual(consumed, ['Jim', 'Jake'])
+
+
 
 class TestAnalyticsFormatDictlist(TestCase):
     """ Test format_dictlist method """
@@ -66,6 +81,12 @@ class TestAnalyticsFormatDictlist(TestCase):
         self.assertEqual(header, ideal_header)
         self.assertEqual(datarows, ideal_datarows)
 
+    def test_format_dicts(self):
+        dicts = iter([{'label1': 'value-1,1', 'label2': 'value-1,2'}, {'label1': 'value-2,1', 'label2': 'value-2,2'}])
+        header, datarows = format_dicts(dicts, ['label2', 'label1'])
+        self.assertEqual(header, ['label2', 'label1'])
+        self.assertEqual(list(datarows), [['value-1,2', 'value-1,1'], ['value-2,2', 'value-2,1']])
+
     def test_format_dictlist_empty(self):
         header, datarows = format_dictlist([], [])
         self.assertEqual(header, [])
@@ -4,6 +4,8 @@ Computes the data to display on the Instructor Dashboard
 from util.json_request import JsonResponse
 
 from courseware import models
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Count
 from django.utils.translation import ugettext as _
 
@@ -11,10 +13,133 @@ from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.inheritance import own_metadata
 from analytics.csvs import create_csv_response
+from class_dashboard.models import ProblemGradeCount, SequentialOpenCount
 
 # Used to limit the length of list displayed to the screen.
 MAX_SCREEN_LIST_LENGTH = 250
 
+COURSE_OUTLINE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def rebuild_aggregates(course_id):
+    """
+    Recompute the aggregates of the course from the StudentModule table, replacing
+    the incrementally maintained ones.
+    """
+    problem_rows = models.StudentModule.objects.filter(
+        course_id__exact=course_id,
+        grade__isnull=False,
+        module_type__exact="problem",
+    ).values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
+
+    sequential_rows = models.StudentModule.objects.filter(
+        course_id__exact=course_id,
+        module_type__exact="sequential",
+    ).values('module_state_key').annotate(count_sequential=Count('module_state_key'))
+
+    with transaction.commit_on_success():
+        ProblemGradeCount.objects.filter(course_id=course_id).delete()
+        ProblemGradeCount.objects.bulk_create([
+            ProblemGradeCount(
+                course_id=course_id,
+                module_state_key=row['module_state_key'],
+                grade=row['grade'],
+                max_grade=row['max_grade'],
+                count=row['count_grade'],
+            )
+            for row in problem_rows
+        ])
+
+        SequentialOpenCount.objects.filter(course_id=course_id).delete()
+        SequentialOpenCount.objects.bulk_create([
+            SequentialOpenCount(
+                course_id=course_id,
+                module_state_key=row['module_state_key'],
+                count=row['count_sequential'],
+            )
+            for row in sequential_rows
+        ])
+
+
+def _problem_grade_rows(course_id, problem_set=None):
+    """
+    Return the number of students with each grade on each problem of the course, or
+    of the problems in `problem_set` if given, as dicts with the 'module_state_key',
+    'grade', 'max_grade' and 'count_grade' keys, ordered by problem and grade.
+    """
+    query = ProblemGradeCount.objects.filter(course_id=course_id, count__gt=0)
+    if problem_set is not None:
+        query = query.filter(module_state_key__in=problem_set)
+    for row in query.order_by('module_state_key', 'grade').values('module_state_key', 'grade', 'max_grade', 'count'):
+        row['count_grade'] = row.pop('count')
+        yield row
+
+
+def get_course_outline(course_id):
+    """
+    Returns the outline of the course, down to its problems, as displayed by the dashboard.
+
+    `course_id` the course ID for the course interested in
+
+    Returns an array of dicts in the order of the sections. Each dict has:
+      'display_name' - display name for the section
+      'subsections' - array of dicts in the order of the subsections, with their 'module_url', 'display_name'
+        and 'problems', an array of dicts in the order of the problems (in all units) with their 'module_url',
+        'display_name' and 'label', eg P1.2.3 for the 3rd problem of the 2nd unit of the 1st subsection.
+
+    Walking the course takes loading it all, so the outline is cached under the version of the course content.
+    """
+    version = modulestore().get_course_version(course_id)
+    if version is None:
+        return _compute_course_outline(course_id)
+
+    key = u"class_dashboard.course_outline/{0}/{1}".format(course_id, version)
+    outline = cache.get(key)
+    if outline is None:
+        outline = _compute_course_outline(course_id)
+        cache.set(key, outline, COURSE_OUTLINE_CACHE_TIMEOUT)
+    return outline
+
+
+def _compute_course_outline(course_id):
+    """
+    Compute the outline returned by get_course_outline
+    """
+    # Retrieve course object down to problems
+    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=4)
+
+    outline = []
+    # Iterate through sections, subsections, units, problems
+    for section in course.get_children():
+        subsections = []
+        c_subsection = 0
+        for subsection in section.get_children():
+            c_subsection += 1
+            c_unit = 0
+            problems = []
+            for unit in subsection.get_children():
+                c_unit += 1
+                c_problem = 0
+                for child in unit.get_children():
+                    # Student data is at the problem level
+                    if child.location.category == 'problem':
+                        c_problem += 1
+                        problems.append({
+                            'module_url': child.location.url(),
+                            'display_name': own_metadata(child).get('display_name', ''),
+                            'label': "P{0}.{1}.{2}".format(c_subsection, c_unit, c_problem),
+                        })
+            subsections.append({
+                'module_url': subsection.location.url(),
+                'display_name': own_metadata(subsection).get('display_name', ''),
+                'problems': problems,
+            })
+        outline.append({
+            'display_name': own_metadata(section).get('display_name', ''),
+            'subsections': subsections,
+        })
+    return outline
+
 def get_problem_grade_distribution(course_id):
     """
     Returns the grade distribution per problem for the course
@@ -26,12 +151,8 @@ def get_problem_grade_distribution(course_id):
         'grade_distrib' - array of tuples (`grade`,`count`).
     """
 
-    # Aggregate query on studentmodule table for grade data for all problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-    ).values('module_state_key', 'grade', 'max_grade').annotate(count_grade=Count('grade'))
+    # Grade data for all problems in course, as aggregated from the studentmodule table
+    db_query = _problem_grade_rows(course_id)
 
     prob_grade_distrib = {}
 
@@ -65,16 +186,16 @@ def get_sequential_open_distrib(course_id):
     Outputs a dict mapping the 'module_id' to the number of students that have opened that subsection/sequential.
     """
 
-    # Aggregate query on studentmodule table for "opening a subsection" data
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        module_type__exact="sequential",
-    ).values('module_state_key').annotate(count_sequential=Count('module_state_key'))
+    # "opening a subsection" data, as aggregated from the studentmodule table
+    db_query = SequentialOpenCount.objects.filter(
+        course_id=course_id,
+        count__gt=0,
+    ).values('module_state_key', 'count')
 
     # Build set of "opened" data for each subsection that has "opened" data
     sequential_open_distrib = {}
     for row in db_query:
-        sequential_open_distrib[row['module_state_key']] = row['count_sequential']
+        sequential_open_distrib[row['module_state_key']] = row['count']
 
     return sequential_open_distrib
 
@@ -94,17 +215,8 @@ def get_problem_set_grade_distrib(course_id, problem_set):
       'grade_distrib' - array of tuples (`grade`,`count`) ordered by `grade`
     """
 
-    # Aggregate query on studentmodule table for grade data for set of problems in course
-    db_query = models.StudentModule.objects.filter(
-        course_id__exact=course_id,
-        grade__isnull=False,
-        module_type__exact="problem",
-        module_state_key__in=problem_set,
-    ).values(
-        'module_state_key',
-        'grade',
-        'max_grade',
-    ).annotate(count_grade=Count('grade')).order_by('module_state_key', 'grade')
+    # Grade data for set of problems in course, as aggregated from the studentmodule table
+    db_query = _problem_grade_rows(course_id, problem_set)
 
     prob_grade_distrib = {}
 
@@ -139,72 +251,59 @@ def get_d3_problem_grade_distrib(course_id):
     prob_grade_distrib = get_problem_grade_distribution(course_id)
     d3_data = []
 
-    # Retrieve course object down to problems
-    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=4)
-
-    # Iterate through sections, subsections, units, problems
-    for section in course.get_children():
+    # Iterate through sections, subsections, problems
+    for section in get_course_outline(course_id):
         curr_section = {}
-        curr_section['display_name'] = own_metadata(section).get('display_name', '')
+        curr_section['display_name'] = section['display_name']
         data = []
-        c_subsection = 0
-        for subsection in section.get_children():
-            c_subsection += 1
-            c_unit = 0
-            for unit in subsection.get_children():
-                c_unit += 1
-                c_problem = 0
-                for child in unit.get_children():
-
-                    # Student data is at the problem level
-                    if child.location.category == 'problem':
-                        c_problem += 1
-                        stack_data = []
-
-                        # Construct label to display for this problem
-                        label = "P{0}.{1}.{2}".format(c_subsection, c_unit, c_problem)
-
-                        # Only problems in prob_grade_distrib have had a student submission.
-                        if child.location.url() in prob_grade_distrib:
-
-                            # Get max_grade, grade_distribution for this problem
-                            problem_info = prob_grade_distrib[child.location.url()]
-
-                            # Get problem_name for tooltip
-                            problem_name = own_metadata(child).get('display_name', '')
-
-                            # Compute percent of this grade over max_grade
-                            max_grade = float(problem_info['max_grade'])
-                            for (grade, count_grade) in problem_info['grade_distrib']:
-                                percent = 0.0
-                                if max_grade > 0:
-                                    percent = (grade * 100.0) / max_grade
-
-                                # Construct tooltip for problem in grade distibution view
-                                tooltip = _("{label} {problem_name} - {count_grade} {students} ({percent:.0f}%: {grade:.0f}/{max_grade:.0f} {questions})").format(
-                                    label=label,
-                                    problem_name=problem_name,
-                                    count_grade=count_grade,
-                                    students=_("students"),
-                                    percent=percent,
-                                    grade=grade,
-                                    max_grade=max_grade,
-                                    questions=_("questions"),
-                                )
-
-                                # Construct data to be sent to d3
-                                stack_data.append({
-                                    'color': percent,
-                                    'value': count_grade,
-                                    'tooltip': tooltip,
-                                    'module_url': child.location.url(),
-                                })
-
-                        problem = {
-                            'xValue': label,
-                            'stackData': stack_data,
-                        }
-                        data.append(problem)
+        for subsection in section['subsections']:
+            for child in subsection['problems']:
+                stack_data = []
+
+                # Label to display for this problem
+                label = child['label']
+
+                # Only problems in prob_grade_distrib have had a student submission.
+                if child['module_url'] in prob_grade_distrib:
+
+                    # Get max_grade, grade_distribution for this problem
+                    problem_info = prob_grade_distrib[child['module_url']]
+
+                    # Get problem_name for tooltip
+                    problem_name = child['display_name']
+
+                    # Compute percent of this grade over max_grade
+                    max_grade = float(problem_info['max_grade'])
+                    for (grade, count_grade) in problem_info['grade_distrib']:
+                        percent = 0.0
+                        if max_grade > 0:
+                            percent = (grade * 100.0) / max_grade
+
+                        # Construct tooltip for problem in grade distibution view
+                        tooltip = _("{label} {problem_name} - {count_grade} {students} ({percent:.0f}%: {grade:.0f}/{max_grade:.0f} {questions})").format(
+                            label=label,
+                            problem_name=problem_name,
+                            count_grade=count_grade,
+                            students=_("students"),
+                            percent=percent,
+                            grade=grade,
+                            max_grade=max_grade,
+                            questions=_("questions"),
+                        )
+
+                        # Construct data to be sent to d3
+                        stack_data.append({
+                            'color': percent,
+                            'value': count_grade,
+                            'tooltip': tooltip,
+                            'module_url': child['module_url'],
+                        })
+
+                problem = {
+                    'xValue': label,
+                    'stackData': stack_data,
+                }
+                data.append(problem)
         curr_section['data'] = data
 
         d3_data.append(curr_section)
@@ -226,24 +325,21 @@ def get_d3_sequential_open_distrib(course_id):
 
     d3_data = []
 
-    # Retrieve course object down to subsection
-    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=2)
-
     # Iterate through sections, subsections
-    for section in course.get_children():
+    for section in get_course_outline(course_id):
         curr_section = {}
-        curr_section['display_name'] = own_metadata(section).get('display_name', '')
+        curr_section['display_name'] = section['display_name']
         data = []
         c_subsection = 0
 
         # Construct data for each subsection to be sent to d3
-        for subsection in section.get_children():
+        for subsection in section['subsections']:
             c_subsection += 1
-            subsection_name = own_metadata(subsection).get('display_name', '')
+            subsection_name = subsection['display_name']
 
             num_students = 0
-            if subsection.location.url() in sequential_open_distrib:
-                num_students = sequential_open_distrib[subsection.location.url()]
+            if subsection['module_url'] in sequential_open_distrib:
+                num_students = sequential_open_distrib[subsection['module_url']]
 
             stack_data = []
             tooltip = _("{num_students} student(s) opened Subsection {subsection_num}: {subsection_name}").format(
@@ -256,7 +352,7 @@ def get_d3_sequential_open_distrib(course_id):
                 'color': 0,
                 'value': num_students,
                 'tooltip': tooltip,
-                'module_url': subsection.location.url(),
+                'module_url': subsection['module_url'],
             })
             subsection = {
                 'xValue': "SS {0}".format(c_subsection),
@@ -293,27 +389,16 @@ def get_d3_section_grade_distrib(course_id, section):
         'tooltip' - (Optional) Text to display on mouse hover
     """
 
-    # Retrieve course object down to problems
-    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=4)
-
     problem_set = []
     problem_info = {}
-    c_subsection = 0
-    for subsection in course.get_children()[section].get_children():
-        c_subsection += 1
-        c_unit = 0
-        for unit in subsection.get_children():
-            c_unit += 1
-            c_problem = 0
-            for child in unit.get_children():
-                if (child.location.category == 'problem'):
-                    c_problem += 1
-                    problem_set.append(child.location.url())
-                    problem_info[child.location.url()] = {
-                        'id': child.location.url(),
-                        'x_value': "P{0}.{1}.{2}".format(c_subsection, c_unit, c_problem),
-                        'display_name': own_metadata(child).get('display_name', ''),
-                    }
+    for subsection in get_course_outline(course_id)[section]['subsections']:
+        for child in subsection['problems']:
+            problem_set.append(child['module_url'])
+            problem_info[child['module_url']] = {
+                'id': child['module_url'],
+                'x_value': child['label'],
+                'display_name': child['display_name'],
+            }
 
     # Retrieve grade distribution for these problems
     grade_distrib = get_problem_set_grade_distrib(course_id, problem_set)
@@ -366,15 +451,7 @@ def get_section_display_name(course_id):
     The ith string in the array is the display name of the ith section in the course.
     """
 
-    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=4)
-
-    section_display_name = [""] * len(course.get_children())
-    i = 0
-    for section in course.get_children():
-        section_display_name[i] = own_metadata(section).get('display_name', '')
-        i += 1
-
-    return section_display_name
+    return [section['display_name'] for section in get_course_outline(course_id)]
 
 
 def get_array_section_has_problem(course_id):
@@ -386,25 +463,10 @@ def get_array_section_has_problem(course_id):
     The ith value in the array is true if the ith section in the course contains problems and false otherwise.
     """
 
-    course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=4)
-
-    b_section_has_problem = [False] * len(course.get_children())
-    i = 0
-    for section in course.get_children():
-        for subsection in section.get_children():
-            for unit in subsection.get_children():
-                for child in unit.get_children():
-                    if child.location.category == 'problem':
-                        b_section_has_problem[i] = True
-                        break  # out of child loop
-                if b_section_has_problem[i]:
-                    break  # out of unit loop
-            if b_section_has_problem[i]:
-                break  # out of subsection loop
-
-        i += 1
-
-    return b_section_has_problem
+    return [
+        any(subsection['problems'] for subsection in section['subsections'])
+        for section in get_course_outline(course_id)
+    ]
 
 
 def get_students_opened_subsection(request, csv=False):
@@ -450,10 +512,12 @@ def get_students_opened_subsection(request, csv=False):
         filename = sanitize_filename(tooltip[tooltip.index('S'):])
 
         header = ['Name', 'Username']
-        for student in students:
-            results.append([student['student__profile__name'], student['student__username']])
+        # streamed, as it can be large
+        rows = (
+            [student['student__profile__name'], student['student__username']] for student in students.iterator()
+        )
 
-        response = create_csv_response(filename, header, results)
+        response = create_csv_response(filename, header, rows)
         return response
 
 
@@ -508,14 +572,17 @@ def get_students_problem_grades(request, csv=False):
         filename = sanitize_filename(tooltip[:tooltip.rfind(' - ')])
 
         header = ['Name', 'Username', 'Grade', 'Percent']
-        for student in students:
 
-            percent = 0
-            if student['max_grade'] > 0:
-                percent = round(student['grade'] * 100 / student['max_grade'])
-            results.append([student['student__profile__name'], student['student__username'], student['grade'], percent])
+        def grade_rows():
+            """ Yield the rows of the students' grades, as they are read """
+            for student in students.iterator():
+                percent = 0
+                if student['max_grade'] > 0:
+                    percent = round(student['grade'] * 100 / student['max_grade'])
+                yield [student['student__profile__name'], student['student__username'], student['grade'], percent]
 
-        response = create_csv_response(filename, header, results)
+        # streamed, as it can be large
+        response = create_csv_response(filename, header, grade_rows())
         return response
 
 
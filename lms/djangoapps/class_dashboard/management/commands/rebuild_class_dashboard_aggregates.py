@@ -0,0 +1,34 @@
+"""
+A Django command that recomputes the class dashboard aggregates of courses
+(the number of students with each grade on each problem, and the number of
+students who opened each subsection) from the StudentModule table.
+
+Useful after enabling CLASS_DASHBOARD on existing courses, or to recover
+from aggregates that went out of sync.
+"""
+
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+
+from class_dashboard.dashboard_data import rebuild_aggregates
+from courseware.models import StudentModule
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the class dashboard aggregates of courses
+    """
+    args = "[<course_id> ...]"
+    help = dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        course_ids = args
+        if not course_ids:
+            course_ids = StudentModule.objects.values_list('course_id', flat=True).distinct()
+            if not course_ids:
+                raise CommandError("No course has student data")
+
+        for course_id in course_ids:
+            rebuild_aggregates(course_id)
+            self.stdout.write("Rebuilt the class dashboard aggregates of {}\n".format(course_id))
@@ -0,0 +1,138 @@
+"""
+Per-course aggregates of the StudentModule table displayed by the class
+dashboard: how many students got each grade on each problem, and how many
+opened each subsection.
+
+They are kept up to date as StudentModules are saved and deleted while
+FEATURES['CLASS_DASHBOARD'] is on, so the dashboard never has to aggregate
+the StudentModule table itself. The `rebuild_class_dashboard_aggregates`
+command recomputes them from scratch, eg after enabling the class dashboard
+on an existing course.
+"""
+from django.conf import settings
+from django.db import models, IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from courseware.models import StudentModule
+
+
+class ProblemGradeCount(models.Model):
+    """
+    The number of students with a given grade on a problem
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key', 'grade', 'max_grade'),)
+
+    course_id = models.CharField(max_length=255, db_index=True)
+    module_state_key = models.CharField(max_length=255)
+    grade = models.FloatField()
+    max_grade = models.FloatField(null=True, blank=True)
+    count = models.IntegerField(default=0)
+
+    def __unicode__(self):
+        return u"[ProblemGradeCount] {}: {}/{} x {}".format(
+            self.module_state_key, self.grade, self.max_grade, self.count
+        )
+
+
+class SequentialOpenCount(models.Model):
+    """
+    The number of students who opened a subsection
+    """
+    class Meta:
+        unique_together = (('course_id', 'module_state_key'),)
+
+    course_id = models.CharField(max_length=255, db_index=True)
+    module_state_key = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    def __unicode__(self):
+        return u"[SequentialOpenCount] {}: {}".format(self.module_state_key, self.count)
+
+
+def add_to_count(model, delta, **key):
+    """
+    Add delta to the count of the `model` row identified by the fields in key,
+    creating it if needed.
+    """
+    if model.objects.filter(**key).update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        model.objects.create(count=delta, **key)
+    except IntegrityError:
+        # Another request created the row at the same time
+        model.objects.filter(**key).update(count=F('count') + delta)
+
+
+def _add_to_problem_grade_count(student_module, grade, max_grade, delta):
+    """
+    Add delta to the count of students with the given grade on the problem of student_module
+    """
+    add_to_count(
+        ProblemGradeCount, delta,
+        course_id=student_module.course_id,
+        module_state_key=student_module.module_state_key,
+        grade=grade,
+        max_grade=max_grade,
+    )
+
+
+@receiver(post_init, sender=StudentModule)
+def remember_saved_grade(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Remember the grade of the StudentModule as loaded, to know which count to
+    move it out of when it changes
+    """
+    instance._saved_grade = (instance.grade, instance.max_grade)  # pylint: disable=protected-access
+
+
+@receiver(post_save, sender=StudentModule)
+def update_counts_on_save(sender, instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Update the aggregates of the course of a StudentModule which was just saved
+    """
+    if not settings.FEATURES.get('CLASS_DASHBOARD'):
+        return
+
+    if instance.module_type == 'sequential':
+        if created:
+            add_to_count(
+                SequentialOpenCount, 1,
+                course_id=instance.course_id, module_state_key=instance.module_state_key
+            )
+
+    elif instance.module_type == 'problem':
+        if created:
+            old_grade, old_max_grade = None, None
+        else:
+            # instances loaded as deferred models don't get the post_init signal
+            old_grade, old_max_grade = getattr(instance, '_saved_grade', (instance.grade, instance.max_grade))
+        if (old_grade, old_max_grade) != (instance.grade, instance.max_grade):
+            if old_grade is not None:
+                _add_to_problem_grade_count(instance, old_grade, old_max_grade, -1)
+            if instance.grade is not None:
+                _add_to_problem_grade_count(instance, instance.grade, instance.max_grade, 1)
+
+    instance._saved_grade = (instance.grade, instance.max_grade)  # pylint: disable=protected-access
+
+
+@receiver(post_delete, sender=StudentModule)
+def update_counts_on_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Update the aggregates of the course of a StudentModule which was just deleted
+    """
+    if not settings.FEATURES.get('CLASS_DASHBOARD'):
+        return
+
+    if instance.module_type == 'sequential':
+        add_to_count(
+            SequentialOpenCount, -1,
+            course_id=instance.course_id, module_state_key=instance.module_state_key
+        )
+
+    elif instance.module_type == 'problem':
+        grade, max_grade = getattr(instance, '_saved_grade', (instance.grade, instance.max_grade))
+        if grade is not None:
+            _add_to_problem_grade_count(instance, grade, max_grade, -1)
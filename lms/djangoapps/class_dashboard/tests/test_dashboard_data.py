@@ -5,12 +5,14 @@ Tests for class dashboard (Metrics tab in instructor dashboard)
 import json
 from mock import patch
 
+from django.test import TestCase
 from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from courseware.tests.tests import TEST_DATA_MONGO_MODULESTORE
+from courseware.models import StudentModule
 from courseware.tests.factories import StudentModuleFactory
 from student.tests.factories import UserFactory, CourseEnrollmentFactory, AdminFactory
 from capa.tests.response_xml_factory import StringResponseXMLFactory
@@ -21,7 +23,9 @@ from class_dashboard.dashboard_data import (get_problem_grade_distribution, get_
                                             get_d3_sequential_open_distrib, get_d3_section_grade_distrib,
                                             get_section_display_name, get_array_section_has_problem,
                                             get_students_opened_subsection, get_students_problem_grades,
+                                            rebuild_aggregates,
                                             )
+from class_dashboard.models import ProblemGradeCount, SequentialOpenCount
 from class_dashboard.views import has_instructor_access_for_class
 
 USER_COUNT = 11
@@ -259,3 +263,56 @@ class TestGetProblemGradeDistribution(ModuleStoreTestCase):
         """
         ret_val = has_instructor_access_for_class(self.instructor, self.course.id)
         self.assertEquals(ret_val, True)
+
+
+class TestAggregates(TestCase):
+    """
+    Tests of the incremental maintenance of the aggregates read by the dashboard
+    """
+    course_id = 'edX/aggregates/2014'
+    problem = 'i4x://edX/aggregates/problem/p1'
+
+    def grade_distrib(self):
+        """The grade distribution of the problem"""
+        return get_problem_grade_distribution(self.course_id)[self.problem]['grade_distrib']
+
+    def test_grade_changes(self):
+        modules = [
+            StudentModuleFactory.create(course_id=self.course_id, module_state_key=self.problem, grade=grade, max_grade=1)
+            for grade in (0, 1, 1)
+        ]
+        self.assertEqual(self.grade_distrib(), [(0, 1), (1, 2)])
+
+        # moves the student from the 1 bucket to the 0 one
+        module = StudentModule.objects.get(id=modules[1].id)
+        module.grade = 0
+        module.save()
+        self.assertEqual(self.grade_distrib(), [(0, 2), (1, 1)])
+
+        # saving without changing the grade doesn't count it twice
+        module.state = '{}'
+        module.save()
+        self.assertEqual(self.grade_distrib(), [(0, 2), (1, 1)])
+
+        modules[2].delete()
+        self.assertEqual(self.grade_distrib(), [(0, 2)])
+
+    def test_sequential_opens(self):
+        for __ in xrange(3):
+            StudentModuleFactory.create(course_id=self.course_id, module_state_key=self.problem, module_type='sequential')
+        self.assertEqual(get_sequential_open_distrib(self.course_id), {self.problem: 3})
+
+    def test_rebuild(self):
+        StudentModuleFactory.create(course_id=self.course_id, module_state_key=self.problem, grade=1, max_grade=1)
+        StudentModuleFactory.create(course_id=self.course_id, module_state_key=self.problem, module_type='sequential')
+        ProblemGradeCount.objects.all().update(count=5)
+        SequentialOpenCount.objects.all().delete()
+
+        rebuild_aggregates(self.course_id)
+        self.assertEqual(self.grade_distrib(), [(1, 1)])
+        self.assertEqual(get_sequential_open_distrib(self.course_id), {self.problem: 1})
+
+    @patch.dict('django.conf.settings.FEATURES', {'CLASS_DASHBOARD': False})
+    def test_feature_off(self):
+        StudentModuleFactory.create(course_id=self.course_id, module_state_key=self.problem, grade=1, max_grade=1)
+        self.assertFalse(ProblemGradeCount.objects.exists())
@@ -1,13 +1,15 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 from collections import defaultdict
+import hashlib
 import json
 import random
 import logging
 
 from contextlib import contextmanager
 from django.conf import settings
-from django.db import transaction
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
 from django.test.client import RequestFactory
 
 from dogapi import dog_stats_api
@@ -16,16 +18,24 @@ from courseware import courses
 from courseware.model_data import FieldDataCache
 from student.models import anonymous_id_for_user
 from submissions import api as sub_api
+from util.query import chunked
 from xmodule import graders
 from xmodule.graders import Score
+from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.util.duedate import get_extended_due_date
-from .models import StudentModule
+from xmodule.util.lru_cache import LRUCache
+from xblock.fields import Scope
+from .models import StudentModule, StudentCourseGrade, StudentSubsectionScore
 from .module_render import get_module_for_descriptor
 
 log = logging.getLogger("edx.courseware")
 
+# the grading contexts of the most recently used course versions
+GRADING_CONTEXT_CACHE = LRUCache(max_items=100)
+GRADING_CONTEXT_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 def yield_dynamic_descriptor_descendents(descriptor, module_creator):
     """
@@ -146,17 +156,147 @@ def answer_distributions(course_id):
 
     return answer_counts
 
+
+def course_grading_context(course):
+    """
+    Return the grading context of `course` in a location-based form, which
+    can be graded from without walking the descriptor tree:
+
+        {
+            'graded_sections': {section format: [section, ...]},
+            'problem_sections': {scorable location url: section location url},
+        }
+
+    where each section is a dict with the 'location' url, the 'display_name'
+    and the 'scorables' of a graded section, a list of dicts with the
+    'location' url, 'weight', 'graded' and 'always_recalculate_grades' flags
+    of each module of the section which has a score.
+
+    Building it takes loading the whole course, so it's cached, in this
+    process and in the shared cache, under the version of the course content.
+    Publishing the course changes its version, so it is rebuilt once for each
+    published version.
+    """
+    return _grading_context_for(course.id, lambda: course)
+
+
+def _grading_context_for(course_id, get_course):
+    """
+    Return the grading context of the course `course_id`, as
+    course_grading_context does, only calling `get_course` for the course
+    descriptor if the context isn't cached.
+    """
+    version = modulestore().get_course_version(course_id)
+    if version is None:
+        return _compute_grading_context(get_course())
+
+    key = u"courseware.grading_context/{0}/{1}".format(course_id, version)
+    grading_context = GRADING_CONTEXT_CACHE.get(key)
+    if grading_context is None:
+        grading_context = cache.get(key)
+        if grading_context is None:
+            grading_context = _compute_grading_context(get_course())
+            cache.set(key, grading_context, GRADING_CONTEXT_CACHE_TIMEOUT)
+        GRADING_CONTEXT_CACHE.set(key, grading_context)
+    return grading_context
+
+
+def _compute_grading_context(course):
+    """
+    Compute the grading context returned by course_grading_context from the
+    descriptor tree of `course`
+    """
+    graded_sections = {}
+    for section_format, sections in course.grading_context['graded_sections'].iteritems():
+        graded_sections[section_format] = [
+            {
+                'location': section['section_descriptor'].location.url(),
+                'display_name': section['section_descriptor'].display_name_with_default,
+                'scorables': [
+                    {
+                        'location': descriptor.location.url(),
+                        'weight': getattr(descriptor, 'weight', None),
+                        'graded': descriptor.graded,
+                        'always_recalculate_grades': descriptor.always_recalculate_grades,
+                    }
+                    for descriptor in section['xmoduledescriptors']
+                ],
+            }
+            for section in sections
+        ]
+    problem_sections = dict(
+        (scorable['location'], section['location'])
+        for sections in graded_sections.itervalues()
+        for section in sections
+        for scorable in section['scorables']
+    )
+    return {'graded_sections': graded_sections, 'problem_sections': problem_sections}
+
+
+def _section_descriptor(course, location):
+    """
+    Return the descriptor of the section at the `location` url of `course`.
+
+    The descriptors are kept on the course object, so that grading many
+    students against the same course loads each graded section only once.
+    """
+    descriptors = course.__dict__.setdefault('_graded_section_descriptors', {})
+    if location not in descriptors:
+        descriptors[location] = course.system.load_item(Location(location))
+    return descriptors[location]
+
+
+def student_module_scores_for(course_id, student_ids):
+    """
+    Return a dict mapping student id -> {module_state_key: (grade, max_grade)}
+    for every StudentModule row the given students have in `course_id`.
+
+    All rows are fetched with a single query, and only the score columns are
+    loaded (never the potentially large `state` blob). The result is meant to
+    be passed to `grade` as `student_module_scores` so that grading a batch of
+    students doesn't issue per-section and per-problem queries.
+    """
+    scores = defaultdict(dict)
+    rows = StudentModule.objects.filter(
+        course_id=course_id,
+        student_id__in=student_ids,
+    ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+    for student_id, module_state_key, grade_value, max_grade in rows:
+        scores[student_id][module_state_key] = (grade_value, max_grade)
+    return scores
+
+
+def _snapshot_module_scores(course_id, student):
+    """
+    Return the module_state_key -> (grade, max_grade) dict of `student`'s
+    StudentModules in the field data snapshot of the current request (see
+    `FieldDataCache.prefetch_course`), or None if there's no snapshot.
+    """
+    snapshot = FieldDataCache.course_snapshot(course_id, student)
+    if snapshot is None:
+        return None
+    return {
+        student_module.module_state_key: (student_module.grade, student_module.max_grade)
+        for cache_key, student_module in snapshot.iteritems()
+        if cache_key[0] == Scope.user_state
+    }
+
+
 @transaction.commit_manually
-def grade(student, request, course, keep_raw_scores=False):
+def grade(student, request, course, keep_raw_scores=False, student_module_scores=None):
     """
     Wraps "_grade" with the manual_transaction context manager just in case
     there are unanticipated errors.
     """
     with manual_transaction():
-        return _grade(student, request, course, keep_raw_scores)
+        if student_module_scores is None:
+            student_module_scores = _snapshot_module_scores(course.id, student)
+        if not keep_raw_scores and use_persisted_grades(course):
+            return _persisted_grade(student, request, course, student_module_scores)
+        return _grade(student, request, course, keep_raw_scores, student_module_scores)
 
 
-def _grade(student, request, course, keep_raw_scores):
+def _grade(student, request, course, keep_raw_scores, student_module_scores=None, section_scores=None):
     """
     Unwrapped version of "grade"
 
@@ -174,10 +314,18 @@ def _grade(student, request, course, keep_raw_scores):
       make up the final grade. (For display)
     - keep_raw_scores : if True, then value for key 'raw_scores' contains scores
       for every graded module
+    - student_module_scores : optional dict of module_state_key ->
+      (grade, max_grade) holding every StudentModule the student has in the
+      course (see `student_module_scores_for`). If given, no StudentModule
+      queries are made; problems are only instantiated when their score
+      can't be determined from it.
+    - section_scores : optional dict which, if given, is filled with
+      section location -> (graded_total, {problem location: [earned, possible, graded]})
+      for every section that was actually graded.
 
     More information on the format is in the docstring for CourseGrader.
     """
-    grading_context = course.grading_context
+    grading_context = course_grading_context(course)
     raw_scores = []
 
     # Dict of item_ids -> (earned, possible) point tuples. This *only* grabs
@@ -191,14 +339,13 @@ def _grade(student, request, course, keep_raw_scores):
     for section_format, sections in grading_context['graded_sections'].iteritems():
         format_scores = []
         for section in sections:
-            section_descriptor = section['section_descriptor']
-            section_name = section_descriptor.display_name_with_default
+            section_name = section['display_name']
 
             # some problems have state that is updated independently of interaction
             # with the LMS, so they need to always be scored. (E.g. foldit.,
             # combinedopenended)
             should_grade_section = any(
-                descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
+                scorable['always_recalculate_grades'] for scorable in section['scorables']
             )
 
             # If there are no problems that always have to be regraded, check to
@@ -206,23 +353,29 @@ def _grade(student, request, course, keep_raw_scores):
             # API. If scores exist, we have to calculate grades for this section.
             if not should_grade_section:
                 should_grade_section = any(
-                    descriptor.location.url() in submissions_scores
-                    for descriptor in section['xmoduledescriptors']
+                    scorable['location'] in submissions_scores
+                    for scorable in section['scorables']
                 )
 
-            if not should_grade_section:
+            if not should_grade_section and student_module_scores is not None:
+                should_grade_section = any(
+                    scorable['location'] in student_module_scores
+                    for scorable in section['scorables']
+                )
+            elif not should_grade_section:
                 with manual_transaction():
                     should_grade_section = StudentModule.objects.filter(
                         student=student,
-                        module_state_key__in=[
-                            descriptor.location for descriptor in section['xmoduledescriptors']
-                        ]
+                        module_state_key__in=[scorable['location'] for scorable in section['scorables']]
                     ).exists()
 
             # If we haven't seen a single problem in the section, we don't have
             # to grade it at all! We can assume 0%
             if should_grade_section:
                 scores = []
+                problem_scores = {}
+                # only the sections to grade are loaded
+                section_descriptor = _section_descriptor(course, section['location'])
 
                 def create_module(descriptor):
                     '''creates an XModule instance given a descriptor'''
@@ -235,7 +388,8 @@ def _grade(student, request, course, keep_raw_scores):
                 for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
 
                     (correct, total) = get_score(
-                        course.id, student, module_descriptor, create_module, scores_cache=submissions_scores
+                        course.id, student, module_descriptor, create_module, scores_cache=submissions_scores,
+                        student_module_scores=student_module_scores
                     )
                     if correct is None and total is None:
                         continue
@@ -252,10 +406,13 @@ def _grade(student, request, course, keep_raw_scores):
                         graded = False
 
                     scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+                    problem_scores[module_descriptor.location.url()] = [correct, total, graded]
 
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
                     raw_scores += scores
+                if section_scores is not None:
+                    section_scores[section['location']] = (graded_total, problem_scores)
             else:
                 graded_total = Score(0.0, 1.0, True, section_name)
 
@@ -264,10 +421,23 @@ def _grade(student, request, course, keep_raw_scores):
                 format_scores.append(graded_total)
             else:
                 log.exception("Unable to grade a section with a total possible score of zero. " +
-                              str(section_descriptor.location))
+                              str(section['location']))
 
         totaled_scores[section_format] = format_scores
 
+    grade_summary = _summarize_grade(course, totaled_scores)
+    if keep_raw_scores:
+        grade_summary['raw_scores'] = raw_scores        # way to get all RAW scores out to instructor
+                                                        # so grader can be double-checked
+    return grade_summary
+
+
+def _summarize_grade(course, totaled_scores):
+    """
+    Run the course grader over `totaled_scores` (section format -> list of
+    section Scores) and return the resulting grade summary, augmented with
+    the rounded percent, the letter grade and the totaled scores themselves.
+    """
     grade_summary = course.grader.grade(totaled_scores, generate_random_scores=settings.GENERATE_PROFILE_SCORES)
 
     # We round the grade here, to make sure that the grade is an whole percentage and
@@ -277,12 +447,201 @@ def _grade(student, request, course, keep_raw_scores):
     letter_grade = grade_for_percentage(course.grade_cutoffs, grade_summary['percent'])
     grade_summary['grade'] = letter_grade
     grade_summary['totaled_scores'] = totaled_scores  	# make this available, eg for instructor download & debugging
-    if keep_raw_scores:
-        grade_summary['raw_scores'] = raw_scores        # way to get all RAW scores out to instructor
-                                                        # so grader can be double-checked
     return grade_summary
 
 
+def grading_version(course):
+    """
+    Return a hash of everything about `course` that a student's grade depends
+    on besides the student's own scores: the grading policy, the grade cutoffs
+    and the graded structure (sections, their scorable problems and weights).
+
+    Persisted grades computed under a different version are out of date, so
+    publishing a change to any of these invalidates them.
+    """
+    structure = []
+    for section_format, sections in sorted(course_grading_context(course)['graded_sections'].iteritems()):
+        for section in sections:
+            structure.append([
+                section_format,
+                section['location'],
+                [
+                    [scorable['location'], scorable['weight'], scorable['graded']]
+                    for scorable in section['scorables']
+                ],
+            ])
+    return hashlib.sha1(
+        json.dumps([course.raw_grader, course.grade_cutoffs, structure], sort_keys=True)
+    ).hexdigest()
+
+
+def use_persisted_grades(course):
+    """
+    Return True if grades for `course` should be served from and saved to the
+    persisted grade store.
+
+    Courses containing problems whose score changes without a grade event
+    being published in the LMS (problems that always recalculate their grades,
+    or that are scored through the submissions API) are always graded from
+    scratch.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        return False
+    return not any(
+        scorable['always_recalculate_grades'] or Location(scorable['location']).category == 'openassessment'
+        for sections in course_grading_context(course)['graded_sections'].itervalues()
+        for section in sections
+        for scorable in section['scorables']
+    )
+
+
+def _persisted_grade(student, request, course, student_module_scores=None):
+    """
+    Return the gradeset of `student` in `course` from the persisted grade
+    store, bringing the store up to date first if needed.
+
+    An up to date gradeset is read with a single query. A gradeset that was
+    marked stale by a new problem grade is re-aggregated from the persisted
+    subsection scores. Anything else is graded from scratch.
+    """
+    version = grading_version(course)
+    try:
+        course_grade = StudentCourseGrade.objects.get(user=student, course_id=course.id)
+    except StudentCourseGrade.DoesNotExist:
+        course_grade = StudentCourseGrade(user=student, course_id=course.id)
+
+    if course_grade.grading_version == version:
+        if not course_grade.is_stale:
+            return _load_gradeset(course_grade.gradeset)
+        gradeset = _grade_from_subsection_scores(student, course)
+    else:
+        gradeset = compute_and_persist_subsection_scores(student, request, course, student_module_scores)
+
+    course_grade.grading_version = version
+    course_grade.gradeset = json.dumps(gradeset)
+    course_grade.is_stale = False
+    try:
+        course_grade.save()
+    except IntegrityError:
+        # Another request persisted this student's grade at the same time.
+        # Theirs is just as current as ours, so there is nothing to do.
+        log.info("Grade of student %s in course %s was persisted concurrently", student.id, course.id)
+    return gradeset
+
+
+def _load_gradeset(serialized_gradeset):
+    """
+    Deserialize a persisted gradeset, turning the totaled scores back into
+    Score tuples.
+    """
+    gradeset = json.loads(serialized_gradeset)
+    gradeset['totaled_scores'] = {
+        section_format: [Score(*score) for score in scores]
+        for section_format, scores in gradeset['totaled_scores'].iteritems()
+    }
+    return gradeset
+
+
+def compute_and_persist_subsection_scores(student, request, course, student_module_scores=None):
+    """
+    Grade `student` in `course` from scratch, replace their persisted
+    subsection scores with the ones just computed and return the gradeset.
+    """
+    section_scores = {}
+    gradeset = _grade(student, request, course, False, student_module_scores, section_scores)
+
+    StudentSubsectionScore.objects.filter(user=student, course_id=course.id).delete()
+    try:
+        StudentSubsectionScore.objects.bulk_create([
+            StudentSubsectionScore(
+                user=student,
+                course_id=course.id,
+                location=location,
+                earned=graded_total.earned,
+                possible=graded_total.possible,
+                problem_scores=json.dumps(problem_scores),
+            )
+            for location, (graded_total, problem_scores) in section_scores.iteritems()
+        ])
+    except IntegrityError:
+        # Another request persisted this student's scores at the same time,
+        # from the same grading, so theirs are just as current as ours.
+        log.info("Scores of student %s in course %s were persisted concurrently", student.id, course.id)
+    return gradeset
+
+
+def _grade_from_subsection_scores(student, course):
+    """
+    Compute the gradeset of `student` in `course` from their persisted
+    subsection scores, without instantiating or querying any module.
+    Sections without a persisted score were never attempted and count as 0%.
+    """
+    subsection_scores = dict(
+        (location, (earned, possible))
+        for location, earned, possible in StudentSubsectionScore.objects.filter(
+            user=student, course_id=course.id
+        ).values_list('location', 'earned', 'possible')
+    )
+
+    totaled_scores = {}
+    for section_format, sections in course_grading_context(course)['graded_sections'].iteritems():
+        format_scores = []
+        for section in sections:
+            earned, possible = subsection_scores.get(section['location'], (0.0, 1.0))
+            if possible > 0:
+                format_scores.append(Score(earned, possible, True, section['display_name']))
+        totaled_scores[section_format] = format_scores
+
+    return _summarize_grade(course, totaled_scores)
+
+
+def update_persisted_score(user_id, course_id, descriptor, grade_value, max_grade):
+    """
+    Fold a newly published grade of user `user_id` on the problem `descriptor`
+    into the user's persisted subsection score, and mark their persisted
+    course grade as stale so that it is re-aggregated on its next read.
+
+    If no persisted subsection score covers the problem yet, the persisted
+    course grade is discarded instead, and the user is regraded from scratch
+    on the next read.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        return
+
+    location_url = descriptor.location.url()
+    grading_context = _grading_context_for(course_id, lambda: modulestore().get_course(course_id))
+    section_location = grading_context['problem_sections'].get(location_url)
+    subsection = None
+    if section_location is not None:
+        try:
+            subsection = StudentSubsectionScore.objects.get(
+                user_id=user_id, course_id=course_id, location=section_location
+            )
+        except StudentSubsectionScore.DoesNotExist:
+            pass
+        else:
+            problem_scores = json.loads(subsection.problem_scores)
+            if location_url not in problem_scores:
+                # persisted against an older version of the course
+                subsection = None
+
+    course_grades = StudentCourseGrade.objects.filter(user_id=user_id, course_id=course_id)
+    if subsection is None or max_grade is None:
+        course_grades.delete()
+        return
+
+    correct, total = _weighted_score(grade_value or 0, max_grade, descriptor.weight)
+    problem_scores[location_url] = [correct, total, descriptor.graded and total > 0]
+    _, graded_total = graders.aggregate_scores(
+        [Score(earned, possible, graded, location) for location, (earned, possible, graded) in problem_scores.items()]
+    )
+    subsection.earned = graded_total.earned
+    subsection.possible = graded_total.possible
+    subsection.problem_scores = json.dumps(problem_scores)
+    subsection.save()
+    course_grades.update(is_stale=True)
+
+
 def grade_for_percentage(grade_cutoffs, percentage):
     """
     Returns a letter grade as defined in grading_policy (e.g. 'A' 'B' 'C' for 6.002x) or None.
@@ -351,6 +710,7 @@ def _progress_summary(student, request, course):
             return None
 
     submissions_scores = sub_api.get_scores(course.id, anonymous_id_for_user(student, course.id))
+    student_module_scores = _snapshot_module_scores(course.id, student)
 
     chapters = []
     # Don't include chapters that aren't displayable (e.g. due to error)
@@ -375,7 +735,8 @@ def _progress_summary(student, request, course):
                 for module_descriptor in yield_dynamic_descriptor_descendents(section_module, module_creator):
                     course_id = course.id
                     (correct, total) = get_score(
-                        course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores
+                        course_id, student, module_descriptor, module_creator, scores_cache=submissions_scores,
+                        student_module_scores=student_module_scores
                     )
                     if correct is None and total is None:
                         continue
@@ -407,7 +768,8 @@ def _progress_summary(student, request, course):
     return chapters
 
 
-def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None):
+def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None,
+              student_module_scores=None):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -421,6 +783,9 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
            Can return None if user doesn't have access, or if something else went wrong.
     scores_cache: A dict of location names to (earned, possible) point tuples.
            If an entry is found in this cache, it takes precedence.
+    student_module_scores: An optional dict of module_state_key to (grade, max_grade)
+           tuples for all of the user's StudentModules in the course. If given, it
+           is used instead of querying StudentModule for this problem.
     """
     scores_cache = scores_cache or {}
 
@@ -447,18 +812,22 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
         # These are not problems, and do not have a score
         return (None, None)
 
-    try:
-        student_module = StudentModule.objects.get(
-            student=user,
-            course_id=course_id,
-            module_state_key=problem_descriptor.location
-        )
-    except StudentModule.DoesNotExist:
-        student_module = None
+    if student_module_scores is not None:
+        stored_grade, stored_max_grade = student_module_scores.get(location_url, (None, None))
+    else:
+        try:
+            student_module = StudentModule.objects.get(
+                student=user,
+                course_id=course_id,
+                module_state_key=problem_descriptor.location
+            )
+            stored_grade, stored_max_grade = student_module.grade, student_module.max_grade
+        except StudentModule.DoesNotExist:
+            stored_grade, stored_max_grade = None, None
 
-    if student_module is not None and student_module.max_grade is not None:
-        correct = student_module.grade if student_module.grade is not None else 0
-        total = student_module.max_grade
+    if stored_max_grade is not None:
+        correct = stored_grade if stored_grade is not None else 0
+        total = stored_max_grade
     else:
         # If the problem was not in the cache, or hasn't been graded yet,
         # we need to instantiate the problem.
@@ -476,15 +845,19 @@ def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=
             return (None, None)
 
     # Now we re-weight the problem, if specified
-    weight = problem_descriptor.weight
-    if weight is not None:
-        if total == 0:
-            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(student_module))
-            return (correct, total)
-        correct = correct * weight / total
-        total = weight
+    if problem_descriptor.weight is not None and total == 0:
+        log.exception("Cannot reweight a problem with zero total points. Problem: " + location_url)
+    return _weighted_score(correct, total, problem_descriptor.weight)
+
 
-    return (correct, total)
+def _weighted_score(correct, total, weight):
+    """
+    Re-weight the score (correct, total) so that it is out of `weight` points.
+    Scores are left alone if there is no weight or nothing to scale.
+    """
+    if weight is None or total == 0:
+        return (correct, total)
+    return (correct * weight / total, weight)
 
 
 @contextmanager
@@ -500,7 +873,23 @@ def manual_transaction():
         transaction.commit()
 
 
-def iterate_grades_for(course_id, students):
+def rebuild_persisted_grades(course, students, chunk_size=500):
+    """
+    Discard every persisted grade in `course` and regrade each of `students`
+    from scratch, persisting the results.
+    """
+    StudentCourseGrade.objects.filter(course_id=course.id).delete()
+
+    request = RequestFactory().get('/')
+    request.session = {}
+    for student_chunk in chunked(students, chunk_size):
+        chunk_scores = student_module_scores_for(course.id, [student.id for student in student_chunk])
+        for student in student_chunk:
+            request.user = student
+            grade(student, request, course, student_module_scores=chunk_scores.get(student.id, {}))
+
+
+def iterate_grades_for(course_id, students, chunk_size=500):
     """Given a course_id and an iterable of students (User), yield a tuple of:
 
     (student, gradeset, err_msg) for every student enrolled in the course.
@@ -508,6 +897,10 @@ def iterate_grades_for(course_id, students):
     If an error occurred, gradeset will be an empty dict and err_msg will be an
     exception message. If there was no error, err_msg is an empty string.
 
+    Students are graded in chunks of `chunk_size`. The StudentModule scores for
+    all students of a chunk are loaded with one query, and the course's
+    grading context is only computed once for the whole run.
+
     The gradeset is a dictionary with the following fields:
 
     - grade : A final letter grade.
@@ -525,25 +918,31 @@ def iterate_grades_for(course_id, students):
     # grading that student.
     request = RequestFactory().get('/')
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
-            try:
-                request.user = student
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course)
-                yield student, gradeset, ""
-            except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
-                log.exception(
-                    'Cannot grade student %s (%s) in course %s because of exception: %s',
-                    student.username,
-                    student.id,
-                    course_id,
-                    exc.message
-                )
-                yield student, {}, exc.message
+    for student_chunk in chunked(students, chunk_size):
+        with dog_stats_api.timer('lms.grades.iterate_grades_for.prefetch', tags=['action:{}'.format(course_id)]):
+            chunk_scores = student_module_scores_for(course_id, [student.id for student in student_chunk])
+
+        for student in student_chunk:
+            with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
+                try:
+                    request.user = student
+                    # Grading calls problem rendering, which calls masquerading,
+                    # which checks session vars -- thus the empty session dict below.
+                    # It's not pretty, but untangling that is currently beyond the
+                    # scope of this feature.
+                    request.session = {}
+                    gradeset = grade(
+                        student, request, course, student_module_scores=chunk_scores.get(student.id, {})
+                    )
+                    yield student, gradeset, ""
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Keep marching on even if this student couldn't be graded for
+                    # some reason, but log it for future reference.
+                    log.exception(
+                        'Cannot grade student %s (%s) in course %s because of exception: %s',
+                        student.username,
+                        student.id,
+                        course_id,
+                        exc.message
+                    )
+                    yield student, {}, exc.message
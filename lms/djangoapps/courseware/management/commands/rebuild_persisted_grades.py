@@ -0,0 +1,43 @@
+"""
+A Django command that discards the persisted grades of every student
+enrolled in a course and regrades them from scratch.
+
+Useful after enabling ENABLE_PERSISTENT_GRADES on an existing course, or
+to recover from persisted grades that went out of sync.
+"""
+
+from textwrap import dedent
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from courseware.grades import rebuild_persisted_grades, use_persisted_grades
+from xmodule.modulestore.django import modulestore
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the persisted grades of a course
+    """
+    args = "<course_id>"
+    help = dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("course_id not specified")
+
+        course_id = args[0]
+        course = modulestore().get_course(course_id)
+        if course is None:
+            raise CommandError("Invalid course_id")
+
+        if not use_persisted_grades(course):
+            raise CommandError("Grades are not persisted for course {}".format(course_id))
+
+        students = User.objects.filter(
+            courseenrollment__course_id=course_id,
+            courseenrollment__is_active=True,
+        ).order_by('id')
+
+        rebuild_persisted_grades(course, students.iterator())
+        self.stdout.write("Rebuilt persisted grades of {} students\n".format(students.count()))
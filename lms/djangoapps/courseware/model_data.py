@@ -13,8 +13,10 @@ from .models import (
 )
 import logging
 
-from django.db import DatabaseError
-from django.contrib.auth.models import User
+from django.db import DatabaseError, IntegrityError
+
+from request_cache.middleware import RequestCache
+from xmodule.course_module import CourseDescriptor
 
 from xblock.runtime import KeyValueStore
 from xblock.exceptions import KeyValueMultiSaveError, InvalidScopeError
@@ -63,9 +65,62 @@ class FieldDataCache(object):
         self.user = user
 
         if user.is_authenticated():
-            for scope, fields in self._fields_to_cache().items():
-                for field_object in self._retrieve_fields(scope, fields):
-                    self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
+            snapshot = None if select_for_update else self.course_snapshot(course_id, user)
+            if snapshot is not None:
+                # Share the snapshot, so that the objects created through this
+                # cache are seen by the other caches of the request too
+                self.cache = snapshot
+            else:
+                for scope, fields in self._fields_to_cache().items():
+                    for field_object in self._retrieve_fields(scope, fields):
+                        self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
+
+    @staticmethod
+    def _snapshot_key(course_id, user):
+        """
+        Return the key of the snapshot of `user`'s data for `course_id` in the request cache
+        """
+        return ('field_data_snapshot', course_id, user.id)
+
+    @classmethod
+    def prefetch_course(cls, course_id, user):
+        """
+        Load all of `user`'s field data for the course `course_id`, in a constant
+        number of queries, into a snapshot held for the rest of the request. The
+        FieldDataCaches constructed for them afterwards during the request are
+        served from the snapshot, without querying the database.
+
+        Only meant to be used while handling a request, as the request cache is
+        what keeps the snapshot from going stale.
+        """
+        if not user.is_authenticated():
+            return
+
+        course_location = CourseDescriptor.id_to_location(course_id)
+        # usage ids are the urls of the course's locations
+        usage_id_prefix = u'i4x://{}/{}/'.format(course_location.org, course_location.course)
+        snapshot = {}
+        for scope, field_objects in (
+            (Scope.user_state, StudentModule.objects.filter(course_id=course_id, student=user.pk)),
+            (
+                Scope.user_state_summary,
+                XModuleUserStateSummaryField.objects.filter(usage_id__startswith=usage_id_prefix),
+            ),
+            (Scope.preferences, XModuleStudentPrefsField.objects.filter(student=user.pk)),
+            (Scope.user_info, XModuleStudentInfoField.objects.filter(student=user.pk)),
+        ):
+            for field_object in field_objects:
+                snapshot[cls._cache_key_from_field_object(scope, field_object)] = field_object
+
+        RequestCache.get_request_cache().data[cls._snapshot_key(course_id, user)] = snapshot
+
+    @classmethod
+    def course_snapshot(cls, course_id, user):
+        """
+        Return the dict of cache keys to field objects loaded by `prefetch_course`
+        for `user` and `course_id` during this request, or None if there's none.
+        """
+        return RequestCache.get_request_cache().data.get(cls._snapshot_key(course_id, user))
 
     @classmethod
     def cache_for_descriptor_descendents(cls, course_id, user, descriptor, depth=None,
@@ -193,7 +248,8 @@ class FieldDataCache(object):
         elif key.scope == Scope.user_info:
             return (key.scope, key.field_name)
 
-    def _cache_key_from_field_object(self, scope, field_object):
+    @staticmethod
+    def _cache_key_from_field_object(scope, field_object):
         """
         Return the key used in the FieldDataCache for the specified scope and
         field
@@ -235,7 +291,7 @@ class FieldDataCache(object):
         if key.scope == Scope.user_state:
             field_object, _ = StudentModule.objects.get_or_create(
                 course_id=self.course_id,
-                student=User.objects.get(id=key.user_id),
+                student_id=key.user_id,
                 module_state_key=key.block_scope_id.url(),
                 defaults={
                     'state': json.dumps({}),
@@ -251,18 +307,73 @@ class FieldDataCache(object):
             field_object, _ = XModuleStudentPrefsField.objects.get_or_create(
                 field_name=key.field_name,
                 module_type=key.block_scope_id,
-                student=User.objects.get(id=key.user_id),
+                student_id=key.user_id,
             )
         elif key.scope == Scope.user_info:
             field_object, _ = XModuleStudentInfoField.objects.get_or_create(
                 field_name=key.field_name,
-                student=User.objects.get(id=key.user_id),
+                student_id=key.user_id,
             )
 
         cache_key = self._cache_key_from_kvs_key(key)
         self.cache[cache_key] = field_object
         return field_object
 
+    def create_many(self, kv_dict):
+        """
+        Create the field objects for the keys of `kv_dict`, which must not be in
+        this cache yet, holding the values of `kv_dict`. Rows are inserted in one
+        query per scope, and then read back in one more to learn their ids.
+
+        Scope.user_state keys aren't supported, as their fields share a row.
+        """
+        keys_by_scope = defaultdict(list)
+        for key in kv_dict:
+            keys_by_scope[key.scope].append(key)
+
+        for scope, keys in keys_by_scope.iteritems():
+            if scope == Scope.user_state_summary:
+                model_class = XModuleUserStateSummaryField
+                new_objects = [
+                    model_class(usage_id=key.block_scope_id.url(), field_name=key.field_name)
+                    for key in keys
+                ]
+                created_objects = model_class.objects.filter(
+                    usage_id__in=set(key.block_scope_id.url() for key in keys),
+                    field_name__in=set(key.field_name for key in keys),
+                )
+            elif scope == Scope.preferences:
+                model_class = XModuleStudentPrefsField
+                new_objects = [
+                    model_class(module_type=key.block_scope_id, field_name=key.field_name, student_id=key.user_id)
+                    for key in keys
+                ]
+                created_objects = model_class.objects.filter(
+                    student=self.user.pk,
+                    module_type__in=set(key.block_scope_id for key in keys),
+                    field_name__in=set(key.field_name for key in keys),
+                )
+            elif scope == Scope.user_info:
+                model_class = XModuleStudentInfoField
+                new_objects = [
+                    model_class(field_name=key.field_name, student_id=key.user_id)
+                    for key in keys
+                ]
+                created_objects = model_class.objects.filter(
+                    student=self.user.pk,
+                    field_name__in=set(key.field_name for key in keys),
+                )
+            else:
+                raise InvalidScopeError(scope)
+
+            for key, field_object in zip(keys, new_objects):
+                field_object.value = json.dumps(kv_dict[key])
+            # bulk_create doesn't set the ids of the objects it inserts, so the
+            # objects are read back before being cached, to be saveable later
+            model_class.objects.bulk_create(new_objects)
+            for field_object in created_objects:
+                self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
+
 
 class DjangoKeyValueStore(KeyValueStore):
     """
@@ -322,11 +433,17 @@ class DjangoKeyValueStore(KeyValueStore):
         saved_fields = []
         # field_objects maps a field_object to a list of associated fields
         field_objects = dict()
+        # the fields stored in rows of their own which don't exist yet, to insert in bulk
+        new_fields = {}
         for field in kv_dict:
             # Check field for validity
             if field.scope not in self._allowed_scopes:
                 raise InvalidScopeError(field)
 
+            if field.scope != Scope.user_state and self._field_data_cache.find(field) is None:
+                new_fields[field] = kv_dict[field]
+                continue
+
             # If the field is valid and isn't already in the dictionary, add it.
             field_object = self._field_data_cache.find_or_create(field)
             if field_object not in field_objects.keys():
@@ -355,6 +472,25 @@ class DjangoKeyValueStore(KeyValueStore):
                 log.exception('Error saving fields %r', field_objects[field_object])
                 raise KeyValueMultiSaveError(saved_fields)
 
+        if new_fields:
+            try:
+                self._field_data_cache.create_many(new_fields)
+            except IntegrityError:
+                # Some of the rows were created concurrently: create or update them one by one
+                log.info('Concurrent creation of fields %r, saving them one by one', new_fields.keys())
+                for field, value in new_fields.iteritems():
+                    field_object = self._field_data_cache.find_or_create(field)
+                    field_object.value = json.dumps(value)
+                    try:
+                        field_object.save()
+                    except DatabaseError:
+                        log.exception('Error saving field %r', field)
+                        raise KeyValueMultiSaveError(saved_fields)
+                    saved_fields.append(field.field_name)
+            except DatabaseError:
+                log.exception('Error saving fields %r', new_fields.keys())
+                raise KeyValueMultiSaveError(saved_fields)
+
     def delete(self, key):
         if key.scope not in self._allowed_scopes:
             raise InvalidScopeError(key)
@@ -15,7 +15,7 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 
@@ -251,3 +251,72 @@ class OfflineComputedGradeLog(models.Model):
 
     def __unicode__(self):
         return "[OCGLog] %s: %s" % (self.course_id, self.created)
+
+
+class StudentCourseGrade(models.Model):
+    """
+    Persisted gradeset for a given user and course, as computed by
+    courseware.grades.grade.
+
+    `grading_version` is a hash of the course's grading policy and graded
+    structure at the time the gradeset was computed; a row whose version no
+    longer matches the course is ignored and recomputed. `is_stale` is set
+    when one of the student's scores has changed since, in which case the
+    gradeset is re-aggregated from the StudentSubsectionScore rows.
+    """
+    class Meta:
+        unique_together = (('user', 'course_id'),)
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+
+    grading_version = models.CharField(max_length=40)
+    gradeset = models.TextField()  # grades, stored as JSON
+    is_stale = models.BooleanField(default=False)
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __unicode__(self):
+        return u"[StudentCourseGrade] {}: {} ({})".format(self.user, self.course_id, self.grading_version)
+
+
+class StudentSubsectionScore(models.Model):
+    """
+    Persisted score of a user on a graded subsection (sequential) of a course.
+
+    `problem_scores` is a JSON dict mapping the location of every scored
+    problem in the subsection to its weighted [earned, possible, graded]
+    score, so that a single new problem grade can be folded in without
+    regrading the subsection.
+    """
+    class Meta:
+        unique_together = (('user', 'course_id', 'location'),)
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+    location = models.CharField(max_length=255)
+
+    earned = models.FloatField()
+    possible = models.FloatField()
+    problem_scores = models.TextField(default='{}')
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __unicode__(self):
+        return u"[StudentSubsectionScore] {}: {} {} = {}/{}".format(
+            self.user, self.course_id, self.location, self.earned, self.possible
+        )
+
+
+@receiver(post_delete, sender=StudentModule)
+def discard_persisted_grade(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard the persisted course grade of the student whose state on a module
+    was deleted, eg by an instructor resetting it, so that they are graded from
+    scratch on their next read. Grade changes are folded in by the grade events
+    instead.
+    """
+    if settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        StudentCourseGrade.objects.filter(user_id=instance.student_id, course_id=instance.course_id).delete()
@@ -323,6 +323,10 @@ def get_module_system_for_user(user, field_data_cache,
         # Save all changes to the underlying KeyValueStore
         student_module.save()
 
+        # Imported here to avoid a circular import, as grading renders modules
+        from courseware.grades import update_persisted_score
+        update_persisted_score(user_id, course_id, descriptor, student_module.grade, student_module.max_grade)
+
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
         course_id_dict = Location.parse_course_id(course_id)
@@ -1,19 +1,28 @@
 """
 Test grade calculation.
 """
+from django.db import IntegrityError
 from django.http import Http404
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
 from mock import patch
 
+from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from student.tests.factories import UserFactory
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.django import modulestore, editable_modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
-from courseware.grades import grade, iterate_grades_for
+from courseware.grades import (
+    course_grading_context, grade, iterate_grades_for, student_module_scores_for, update_persisted_score,
+    rebuild_persisted_grades
+)
+from courseware.models import StudentCourseGrade, StudentSubsectionScore
+from instructor.enrollment import reset_student_attempts
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, student_module_scores=None):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -24,7 +33,9 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(
+        student, request, course, keep_raw_scores=keep_raw_scores, student_module_scores=student_module_scores
+    )
 
 
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
@@ -105,6 +116,12 @@ class TestGradeIteration(ModuleStoreTestCase):
         self.assertTrue(all_gradesets[student2])
         self.assertTrue(all_gradesets[student5])
 
+    def test_chunked_iteration(self):
+        """Every student is graded exactly once, in order, whatever the chunk size"""
+        results = list(iterate_grades_for(self.course.id, iter(self.students), chunk_size=2))
+        self.assertEqual([student for student, _, _ in results], self.students)
+        self.assertTrue(all(gradeset and not err_msg for _, gradeset, err_msg in results))
+
     ################################# Helpers #################################
     def _gradesets_and_errors_for(self, course_id, students):
         """Simple helper method to iterate through student grades and give us
@@ -120,3 +137,208 @@ class TestGradeIteration(ModuleStoreTestCase):
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestBatchGrading(ModuleStoreTestCase):
+    """
+    Test that grading from prefetched StudentModule scores matches grading
+    with per-problem queries.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        self.section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=self.section.location, category='problem')
+        self.students = [UserFactory.create(), UserFactory.create()]
+        StudentModuleFactory.create(
+            student=self.students[0],
+            course_id=self.course.id,
+            module_state_key=self.problem.location.url(),
+            grade=1,
+            max_grade=2,
+        )
+
+    def test_student_module_scores_for(self):
+        scores = student_module_scores_for(self.course.id, [student.id for student in self.students])
+        self.assertEqual(scores[self.students[0].id], {self.problem.location.url(): (1, 2)})
+        self.assertNotIn(self.students[1].id, scores)
+
+    def test_batch_matches_single_grading(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        for student, gradeset, err_msg in iterate_grades_for(self.course.id, self.students):
+            self.assertEqual(err_msg, "")
+            request.user = student
+            # Reload the course so that nothing is shared between the two runs
+            course = modulestore().get_course(self.course.id)
+            expected = grade(student, request, course)
+            self.assertEqual(gradeset['percent'], expected['percent'])
+            self.assertEqual(gradeset['totaled_scores'], expected['totaled_scores'])
+
+    def test_sections_loaded_once_per_course(self):
+        StudentModuleFactory.create(
+            student=self.students[1],
+            course_id=self.course.id,
+            module_state_key=self.problem.location.url(),
+            grade=2,
+            max_grade=2,
+        )
+        request = RequestFactory().get('/')
+        request.session = {}
+        course = modulestore().get_course(self.course.id)
+        with patch.object(course.system, 'load_item', wraps=course.system.load_item) as mock_load_item:
+            for student in self.students:
+                request.user = student
+                grade(student, request, course)
+        section_loads = [
+            args for args, __ in mock_load_item.call_args_list if args[0].url() == self.section.location.url()
+        ]
+        self.assertEqual(len(section_loads), 1)
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestCourseGradingContext(ModuleStoreTestCase):
+    """
+    Test the location-based grading context cached per course version.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        self.section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=self.section.location, category='problem')
+
+    def _grading_context(self):
+        """The grading context of a freshly loaded course"""
+        return course_grading_context(modulestore().get_course(self.course.id))
+
+    def test_location_based_form(self):
+        sections = self._grading_context()['graded_sections']['Homework']
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(sections[0]['location'], self.section.location.url())
+        scorables = sections[0]['scorables']
+        self.assertEqual([scorable['location'] for scorable in scorables], [self.problem.location.url()])
+        self.assertTrue(scorables[0]['graded'])
+        self.assertFalse(scorables[0]['always_recalculate_grades'])
+        self.assertEqual(
+            self._grading_context()['problem_sections'],
+            {self.problem.location.url(): self.section.location.url()}
+        )
+
+    def test_cached_per_course_version(self):
+        self._grading_context()
+        with patch('courseware.grades._compute_grading_context') as mock_compute:
+            self._grading_context()
+        self.assertFalse(mock_compute.called)
+
+        # adding a problem changes the version of the course
+        new_problem = ItemFactory.create(parent_location=self.section.location, category='problem')
+        scorables = self._grading_context()['graded_sections']['Homework'][0]['scorables']
+        self.assertIn(new_problem.location.url(), [scorable['location'] for scorable in scorables])
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistedGrades(ModuleStoreTestCase):
+    """
+    Test the persisted course grade and subsection score store.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        self.section = ItemFactory.create(
+            parent_location=chapter.location,
+            category='sequential',
+            metadata={'graded': True, 'format': 'Homework'}
+        )
+        self.problem = ItemFactory.create(parent_location=self.section.location, category='problem')
+        self.student = UserFactory.create()
+        self.student_module = StudentModuleFactory.create(
+            student=self.student,
+            course_id=self.course.id,
+            module_state_key=self.problem.location.url(),
+            grade=1,
+            max_grade=2,
+        )
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _grade(self):
+        """Grade the student against a freshly loaded course"""
+        return grade(self.student, self.request, modulestore().get_course(self.course.id))
+
+    def test_grade_is_persisted(self):
+        gradeset = self._grade()
+        course_grade = StudentCourseGrade.objects.get(user=self.student, course_id=self.course.id)
+        self.assertFalse(course_grade.is_stale)
+        subsection = StudentSubsectionScore.objects.get(user=self.student, course_id=self.course.id)
+        self.assertEqual(subsection.location, self.section.location.url())
+        self.assertEqual((subsection.earned, subsection.possible), (1, 2))
+
+        with patch('courseware.grades._grade') as mock_grade:
+            self.assertEqual(self._grade(), gradeset)
+        self.assertFalse(mock_grade.called)
+
+    def test_grade_event_updates_persisted_grade(self):
+        self._grade()
+        self.student_module.grade = 2
+        self.student_module.save()
+        update_persisted_score(self.student.id, self.course.id, self.problem, 2, 2)
+        self.assertTrue(StudentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+        with patch('courseware.grades._grade') as mock_grade:
+            gradeset = self._grade()
+        self.assertFalse(mock_grade.called)
+
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': False}):
+            expected = self._grade()
+        self.assertEqual(gradeset['percent'], expected['percent'])
+        self.assertEqual(gradeset['totaled_scores'], expected['totaled_scores'])
+
+    def test_concurrently_persisted_scores(self):
+        with patch(
+            'courseware.models.StudentSubsectionScore.objects.bulk_create', side_effect=IntegrityError
+        ):
+            gradeset = self._grade()
+        with patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': False}):
+            self.assertEqual(gradeset['percent'], self._grade()['percent'])
+
+    def test_grade_event_reads_one_subsection(self):
+        self._grade()
+        with patch('courseware.grades.StudentSubsectionScore.objects.filter') as mock_filter:
+            update_persisted_score(self.student.id, self.course.id, self.problem, 2, 2)
+        self.assertFalse(mock_filter.called)
+        subsection = StudentSubsectionScore.objects.get(user=self.student, course_id=self.course.id)
+        self.assertEqual((subsection.earned, subsection.possible), (2, 2))
+
+    def test_deleted_state_invalidates(self):
+        gradeset = self._grade()
+        self.assertGreater(gradeset['percent'], 0)
+        reset_student_attempts(self.course.id, self.student, self.problem.location.url(), delete_module=True)
+        self.assertFalse(StudentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+        self.assertEqual(self._grade()['percent'], 0)
+
+    def test_grading_policy_change_invalidates(self):
+        self._grade()
+        course = modulestore().get_course(self.course.id)
+        course.grade_cutoffs = {'Pass': 0.1}
+        editable_modulestore().update_item(course, '**replace_user**')
+
+        gradeset = self._grade()
+        self.assertEqual(gradeset['grade'], 'Pass')
+
+    def test_rebuild(self):
+        self._grade()
+        StudentSubsectionScore.objects.all().delete()
+        rebuild_persisted_grades(modulestore().get_course(self.course.id), [self.student])
+        self.assertEqual(StudentSubsectionScore.objects.filter(user=self.student).count(), 1)
+        self.assertEqual(StudentCourseGrade.objects.filter(user=self.student).count(), 1)
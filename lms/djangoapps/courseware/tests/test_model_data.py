@@ -15,6 +15,7 @@ from courseware.tests.factories import StudentModuleFactory as cmfStudentModuleF
 from courseware.tests.factories import UserStateSummaryFactory
 from courseware.tests.factories import StudentPrefsFactory, StudentInfoFactory
 
+from request_cache.middleware import RequestCache
 from xblock.fields import Scope, BlockScope, ScopeIds
 from xmodule.modulestore import Location
 from django.test import TestCase
@@ -343,3 +344,67 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+class TestCourseSnapshot(TestCase):
+    """Tests for serving FieldDataCaches from a snapshot of the user's course data"""
+
+    def setUp(self):
+        self.user = UserFactory.create(username='user')
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        StudentModuleFactory.create(student=self.user, state=json.dumps({'a_field': 'a_value'}))
+        StudentPrefsFactory.create(student=self.user)
+        self.addCleanup(RequestCache().clear_request_cache)
+
+    def test_no_queries_after_prefetch(self):
+        with self.assertNumQueries(4):
+            FieldDataCache.prefetch_course(course_id, self.user)
+
+        descriptor = mock_descriptor([
+            mock_field(Scope.user_state, 'a_field'),
+            mock_field(Scope.preferences, 'existing_field'),
+        ])
+        with self.assertNumQueries(0):
+            kvs = DjangoKeyValueStore(FieldDataCache([descriptor], course_id, self.user))
+            self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+            self.assertEquals('old_value', kvs.get(prefs_key('existing_field')))
+            self.assertFalse(kvs.has(user_info_key('missing_field')))
+
+        # objects created through one cache are seen by the others
+        kvs.set(user_info_key('new_field'), 'new_value')
+        with self.assertNumQueries(0):
+            kvs = DjangoKeyValueStore(FieldDataCache([descriptor], course_id, self.user))
+            self.assertEquals('new_value', kvs.get(user_info_key('new_field')))
+
+    def test_select_for_update_ignores_snapshot(self):
+        FieldDataCache.prefetch_course(course_id, self.user)
+        field_data_cache = FieldDataCache([mock_descriptor()], course_id, self.user, select_for_update=True)
+        self.assertIsNot(field_data_cache.cache, FieldDataCache.course_snapshot(course_id, self.user))
+
+
+class TestSetManyNewFields(TestCase):
+    """Tests for creating the rows of new fields in bulk"""
+
+    def setUp(self):
+        self.user = UserFactory.create(username='user')
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        self.kvs = DjangoKeyValueStore(FieldDataCache([mock_descriptor()], course_id, self.user))
+
+    def test_set_many_new_fields(self):
+        kv_dict = dict((prefs_key('field_{}'.format(i)), i) for i in range(5))
+        # one insert, and one select to read the ids back
+        with self.assertNumQueries(2):
+            self.kvs.set_many(kv_dict)
+        self.assertEquals(5, XModuleStudentPrefsField.objects.filter(student=self.user).count())
+        for key, value in kv_dict.iteritems():
+            self.assertEquals(value, self.kvs.get(key))
+
+        # the created objects can be updated
+        self.kvs.set(prefs_key('field_0'), 'updated')
+        self.assertEquals('updated', json.loads(XModuleStudentPrefsField.objects.get(field_name='field_0').value))
+
+    def test_set_many_concurrently_created_field(self):
+        StudentPrefsFactory.create(student=self.user, field_name='field_0')
+        self.kvs.set_many({prefs_key('field_0'): 'new_value', prefs_key('field_1'): 'other_value'})
+        self.assertEquals('new_value', json.loads(XModuleStudentPrefsField.objects.get(field_name='field_0').value))
+        self.assertEquals(2, XModuleStudentPrefsField.objects.filter(student=self.user).count())
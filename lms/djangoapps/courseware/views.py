@@ -254,6 +254,8 @@ def index(request, course_id, chapter=None, section=None,
     masq = setup_masquerade(request, staff_access)
 
     try:
+        # Load all of the user's data for the course at once, for the field data caches below
+        FieldDataCache.prefetch_course(course.id, user)
         field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
             course.id, user, course, depth=2)
 
@@ -686,6 +688,8 @@ def _progress(request, course_id, student_id):
     # additional DB lookup (this kills the Progress page in particular).
     student = User.objects.prefetch_related("groups").get(id=student.id)
 
+    # Load all of the student's data for the course at once, for both the summary and the grade
+    FieldDataCache.prefetch_course(course.id, student)
     courseware_summary = grades.progress_summary(student, request, course)
     studio_url = get_studio_url(course_id, 'settings/grading')
     grade_summary = grades.grade(student, request, course)
@@ -1,14 +1,16 @@
 """Views for debugging and diagnostics"""
 
+import json
 import pprint
 import traceback
 
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
 from edxmako.shortcuts import render_to_response
 
 from codejail.safe_exec import safe_exec
+from capa.safe_exec import safe_exec_stats
 
 @login_required
 @ensure_csrf_cookie
@@ -29,3 +31,15 @@ def run_python(request):
         else:
             c['results'] = pprint.pformat(g)
     return render_to_response("debug/run_python_form.html", c)
+
+
+@login_required
+def show_safe_exec_stats(request):
+    """
+    A page showing the cache hits and misses of problem code in this process,
+    and the time spent executing it, slowest slugs first.
+    """
+    if not request.user.is_staff:
+        raise Http404
+    stats = sorted(safe_exec_stats().items(), key=lambda (slug, slug_stats): -slug_stats['exec_time'])
+    return HttpResponse(json.dumps(stats, indent=2), content_type='application/json')
@@ -0,0 +1,46 @@
+"""
+Tests of the HTTP plumbing of the comments service client.
+"""
+from django.test import TestCase
+from django.utils import translation
+from mock import patch, Mock
+
+import lms.lib.comment_client as cc
+from lms.lib.comment_client import utils as cc_utils
+
+
+class PerformRequestTestCase(TestCase):
+    def test_session_is_reused(self):
+        self.assertIs(cc_utils.get_session(), cc_utils.get_session())
+
+    @patch('lms.lib.comment_client.utils.requests.Session.request')
+    def test_requests_go_through_the_session(self, mock_request):
+        mock_request.return_value = Mock(status_code=200, text='{}', json=lambda: {})
+        cc.User(id='1').retrieve()
+        cc.User(id='2').retrieve()
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_endpoint_of(self):
+        prefix = cc_utils.cc_settings.PREFIX
+        self.assertEqual(cc_utils.endpoint_of(prefix + '/threads/5300f2a6e4b0'), 'threads/:id')
+        self.assertEqual(cc_utils.endpoint_of(prefix + '/users/12/active_threads'), 'users/:id/active_threads')
+        self.assertEqual(cc_utils.endpoint_of(prefix + '/search/threads'), 'search/threads')
+
+
+class PerformConcurrentlyTestCase(TestCase):
+    def test_results_in_order(self):
+        self.assertEqual(cc_utils.perform_concurrently(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3])
+
+    def test_exception_is_raised(self):
+        def fail():
+            raise cc_utils.CommentClientRequestError('not found', 404)
+
+        with self.assertRaises(cc_utils.CommentClientRequestError):
+            cc_utils.perform_concurrently(lambda: 1, fail)
+
+    def test_language_is_propagated(self):
+        with translation.override('fr'):
+            self.assertEqual(
+                cc_utils.perform_concurrently(translation.get_language, translation.get_language),
+                ['fr', 'fr']
+            )
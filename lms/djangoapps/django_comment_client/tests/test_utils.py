@@ -503,6 +503,21 @@ class CategoryMapTestCase(ModuleStoreTestCase):
             }
         )
 
+    def test_cached_per_course_version(self):
+        self.create_discussion("Chapter", "Discussion")
+        with mock.patch('django_comment_client.utils._get_discussion_modules', wraps=utils._get_discussion_modules) as get_modules:
+            first = utils.get_discussion_category_map(self.course)
+            self.assertEqual(utils.get_discussion_category_map(self.course), first)
+            self.assertEqual(get_modules.call_count, 1)
+
+            # writing to the course changes its version
+            self.create_discussion("Chapter", "Other Discussion")
+            self.assertEqual(
+                utils.get_discussion_category_map(self.course)["subcategories"]["Chapter"]["children"],
+                ["Discussion", "Other Discussion"]
+            )
+            self.assertEqual(get_modules.call_count, 2)
+
 
 class JsonResponseTestCase(TestCase, UnicodeTestMixin):
     def _test_unicode_data(self, text):
@@ -1,9 +1,12 @@
+import hashlib
+import json
 import pytz
 from collections import defaultdict
 import logging
 from datetime import datetime
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import connection
 from django.http import HttpResponse
@@ -16,10 +19,15 @@ import pystache_custom as pystache
 
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore import Location
+from xmodule.util.lru_cache import LRUCache
 from django.utils.timezone import UTC
 
 log = logging.getLogger(__name__)
 
+# the discussion maps of the most recently used course versions
+DISCUSSION_MAPS_CACHE = LRUCache(max_items=100)
+DISCUSSION_MAPS_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 def extract(dic, keys):
     return {k: dic.get(k) for k in keys}
@@ -71,13 +79,17 @@ def _get_discussion_modules(course):
 
 
 def _get_discussion_id_map(course):
+    return _get_discussion_maps(course)[1]
+
+
+def _compute_discussion_id_map(modules):
     def get_entry(module):
         discussion_id = module.discussion_id
         title = module.discussion_target
         last_category = module.discussion_category.split("/")[-1].strip()
         return (discussion_id, {"location": module.location, "title": last_category + " / " + title})
 
-    return dict(map(get_entry, _get_discussion_modules(course)))
+    return dict(map(get_entry, modules))
 
 
 def _filter_unstarted_categories(category_map):
@@ -130,12 +142,52 @@ def _sort_map_entries(category_map, sort_alpha):
     category_map["children"] = [x[0] for x in sorted(things, key=lambda x: x[1]["sort_key"])]
 
 
+def _get_discussion_maps(course):
+    """
+    Return the category map of the discussions of course, sorted but with all
+    the categories and entries whatever their start date, and the map of their
+    discussion ids to their location and title.
+
+    Finding the discussions takes a scan of the course, so the maps are cached,
+    in this process and in the shared cache, under the version of the course
+    content. Writing to the course, such as publishing it, changes its version.
+    """
+    version = modulestore().get_course_version(course.id)
+    if version is None:
+        return _compute_discussion_maps(course)
+
+    # the maps depend on course settings too, which may be changed on the course
+    # object without being written yet
+    settings_digest = hashlib.sha1(
+        json.dumps([course.discussion_topics, course.discussion_sort_alpha], sort_keys=True)
+    ).hexdigest()
+    key = u"discussion_maps/{0}/{1}/{2}".format(course.id, version, settings_digest)
+
+    maps = DISCUSSION_MAPS_CACHE.get(key)
+    if maps is None:
+        maps = cache.get(key)
+        if maps is None:
+            maps = _compute_discussion_maps(course)
+            cache.set(key, maps, DISCUSSION_MAPS_CACHE_TIMEOUT)
+        DISCUSSION_MAPS_CACHE.set(key, maps)
+    return maps
+
+
+def _compute_discussion_maps(course):
+    """
+    Compute the maps returned by _get_discussion_maps, from a single scan of the
+    course's discussions
+    """
+    modules = _get_discussion_modules(course)
+    return _compute_category_map(course, modules), _compute_discussion_id_map(modules)
+
+
 def get_discussion_category_map(course):
-    course_id = course.id
+    return _filter_unstarted_categories(_get_discussion_maps(course)[0])
 
-    unexpanded_category_map = defaultdict(list)
 
-    modules = _get_discussion_modules(course)
+def _compute_category_map(course, modules):
+    unexpanded_category_map = defaultdict(list)
 
     for module in modules:
         id = module.discussion_id
@@ -193,7 +245,7 @@ def get_discussion_category_map(course):
 
     _sort_map_entries(category_map, course.discussion_sort_alpha)
 
-    return _filter_unstarted_categories(category_map)
+    return category_map
 
 
 class JsonResponse(HttpResponse):
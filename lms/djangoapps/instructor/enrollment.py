@@ -5,12 +5,16 @@ Does not include any access control, be sure to check access before calling.
 """
 
 import json
+import logging
+
 from django.contrib.auth.models import User
+from django.db import IntegrityError
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.core.mail import send_mail
 
-from student.models import CourseEnrollment, CourseEnrollmentAllowed
+from student.models import BULK_ENROLLMENT_CHUNK_SIZE, CourseEnrollment, CourseEnrollmentAllowed
+from util.query import chunked
 from courseware.models import StudentModule
 from edxmako.shortcuts import render_to_string
 
@@ -21,24 +25,22 @@ from student.models import anonymous_id_for_user
 
 from microsite_configuration import microsite
 
+log = logging.getLogger(__name__)
+
 # For determining if a shibboleth course
 SHIBBOLETH_DOMAIN_PREFIX = 'shib:'
 
 
 class EmailEnrollmentState(object):
     """ Store the complete enrollment state of an email in a class """
-    def __init__(self, course_id, email):
-        exists_user = User.objects.filter(email=email).exists()
-        if exists_user:
-            user = User.objects.get(email=email)
-            exists_ce = CourseEnrollment.is_enrolled(user, course_id)
-            full_name = user.profile.name
-        else:
-            exists_ce = False
-            full_name = None
-        ceas = CourseEnrollmentAllowed.objects.filter(course_id=course_id, email=email).all()
-        exists_allowed = len(ceas) > 0
-        state_auto_enroll = exists_allowed and ceas[0].auto_enroll
+    def __init__(self, course_id, email, state=None):
+        """
+        `state` is the tuple of the state of the email, as returned by
+        `_get_enrollment_states`, which is called if it's None.
+        """
+        if state is None:
+            state = _get_enrollment_states(course_id, [email])[email]
+        exists_user, exists_ce, full_name, exists_allowed, state_auto_enroll = state
 
         self.user = exists_user
         self.enrollment = exists_ce
@@ -46,6 +48,15 @@ class EmailEnrollmentState(object):
         self.auto_enroll = bool(state_auto_enroll)
         self.full_name = full_name
 
+    @classmethod
+    def for_emails(cls, course_id, emails):
+        """
+        Return a dict of each of the emails to its EmailEnrollmentState, with
+        a few queries for all of them.
+        """
+        states = _get_enrollment_states(course_id, emails)
+        return dict((email, cls(course_id, email, states[email])) for email in emails)
+
     def __repr__(self):
         return "{}(user={}, enrollment={}, allowed={}, auto_enroll={})".format(
             self.__class__.__name__,
@@ -72,6 +83,44 @@ class EmailEnrollmentState(object):
         }
 
 
+def _get_enrollment_states(course_id, emails):
+    """
+    Return a dict of each of the emails to the tuple (user exists, enrolled,
+    full name, enrollment allowed, auto enroll), with a few queries per
+    thousand emails.
+    """
+    emails = set(emails)
+    # the email lookups of the database may be case insensitive
+    users = {}
+    allowed = {}
+    for chunk in chunked(emails, BULK_ENROLLMENT_CHUNK_SIZE):
+        users.update(
+            (email.lower(), (user_id, full_name))
+            for user_id, email, full_name in User.objects.filter(email__in=chunk).values_list(
+                'id', 'email', 'profile__name'
+            )
+        )
+        allowed.update(
+            (email.lower(), auto_enroll)
+            for email, auto_enroll in CourseEnrollmentAllowed.objects.filter(
+                course_id=course_id, email__in=chunk
+            ).values_list('email', 'auto_enroll')
+        )
+    enrolled = CourseEnrollment.is_enrolled_many([user_id for user_id, __ in users.itervalues()], course_id)
+
+    states = {}
+    for email in emails:
+        user_id, full_name = users.get(email.lower(), (None, None))
+        states[email] = (
+            user_id is not None,
+            enrolled.get(user_id, False),
+            full_name,
+            email.lower() in allowed,
+            allowed.get(email.lower(), False),
+        )
+    return states
+
+
 def enroll_email(course_id, student_email, auto_enroll=False, email_students=False, email_params=None):
     """
     Enroll a student by email.
@@ -86,28 +135,64 @@ def enroll_email(course_id, student_email, auto_enroll=False, email_students=Fal
     returns two EmailEnrollmentState's
         representing state before and after the action.
     """
+    return enroll_emails(course_id, [student_email], auto_enroll, email_students, email_params)[student_email]
 
-    previous_state = EmailEnrollmentState(course_id, student_email)
 
-    if previous_state.user:
-        CourseEnrollment.enroll_by_email(student_email, course_id)
-        if email_students:
-            email_params['message'] = 'enrolled_enroll'
-            email_params['email_address'] = student_email
-            email_params['full_name'] = previous_state.full_name
-            send_mail_to_student(student_email, email_params)
-    else:
-        cea, _ = CourseEnrollmentAllowed.objects.get_or_create(course_id=course_id, email=student_email)
-        cea.auto_enroll = auto_enroll
-        cea.save()
-        if email_students:
-            email_params['message'] = 'allowed_enroll'
-            email_params['email_address'] = student_email
-            send_mail_to_student(student_email, email_params)
+def enroll_emails(course_id, student_emails, auto_enroll=False, email_students=False, email_params=None,
+                  failed_emails=None):
+    """
+    Enroll students by email, with a few queries per thousand students.
+    The arguments are those of `enroll_email`, for a list of emails.
+    `failed_emails` is an optional set, see `_send_mails_to_students`.
 
-    after_state = EmailEnrollmentState(course_id, student_email)
+    returns a dict of each email to the two EmailEnrollmentState's
+        representing its state before and after the action.
+    """
+    previous_states = EmailEnrollmentState.for_emails(course_id, student_emails)
 
-    return previous_state, after_state
+    user_emails = [email for email in student_emails if previous_states[email].user]
+    CourseEnrollment.bulk_enroll_by_email(user_emails, course_id)
+    allowed_emails = [email for email in student_emails if not previous_states[email].user]
+    _allow_enrollments(course_id, allowed_emails, auto_enroll)
+
+    if email_students:
+        mails = []
+        for email in student_emails:
+            if previous_states[email].user:
+                mails.append((email, dict(
+                    email_params, message='enrolled_enroll', email_address=email,
+                    full_name=previous_states[email].full_name,
+                )))
+            else:
+                mails.append((email, dict(email_params, message='allowed_enroll', email_address=email)))
+        _send_mails_to_students(mails, failed_emails)
+
+    after_states = EmailEnrollmentState.for_emails(course_id, student_emails)
+
+    return dict((email, (previous_states[email], after_states[email])) for email in student_emails)
+
+
+def _allow_enrollments(course_id, emails, auto_enroll):
+    """
+    Allow the emails to enroll in the course, creating or updating their
+    CourseEnrollmentAllowed with the given auto_enroll.
+    """
+    for chunk in chunked(set(emails), BULK_ENROLLMENT_CHUNK_SIZE):
+        existing = CourseEnrollmentAllowed.objects.filter(course_id=course_id, email__in=chunk)
+        existing.update(auto_enroll=auto_enroll)
+        existing_emails = set(email.lower() for email in existing.values_list('email', flat=True))
+        new_emails = [email for email in chunk if email.lower() not in existing_emails]
+        try:
+            CourseEnrollmentAllowed.objects.bulk_create(
+                CourseEnrollmentAllowed(course_id=course_id, email=email, auto_enroll=auto_enroll)
+                for email in new_emails
+            )
+        except IntegrityError:
+            # Some of them were allowed in the meantime
+            for email in new_emails:
+                cea, _ = CourseEnrollmentAllowed.objects.get_or_create(course_id=course_id, email=email)
+                cea.auto_enroll = auto_enroll
+                cea.save()
 
 
 def unenroll_email(course_id, student_email, email_students=False, email_params=None):
@@ -121,28 +206,61 @@ def unenroll_email(course_id, student_email, email_students=False, email_params=
     returns two EmailEnrollmentState's
         representing state before and after the action.
     """
+    return unenroll_emails(course_id, [student_email], email_students, email_params)[student_email]
+
+
+def unenroll_emails(course_id, student_emails, email_students=False, email_params=None, failed_emails=None):
+    """
+    Unenroll students by email, with a few queries per thousand students.
+    The arguments are those of `unenroll_email`, for a list of emails.
+    `failed_emails` is an optional set, see `_send_mails_to_students`.
+
+    returns a dict of each email to the two EmailEnrollmentState's
+        representing its state before and after the action.
+    """
+    previous_states = EmailEnrollmentState.for_emails(course_id, student_emails)
 
-    previous_state = EmailEnrollmentState(course_id, student_email)
+    enrolled_emails = [email for email in student_emails if previous_states[email].enrollment]
+    CourseEnrollment.bulk_unenroll_by_email(enrolled_emails, course_id)
+    allowed_emails = [email for email in student_emails if previous_states[email].allowed]
+    for chunk in chunked(allowed_emails, BULK_ENROLLMENT_CHUNK_SIZE):
+        CourseEnrollmentAllowed.objects.filter(course_id=course_id, email__in=chunk).delete()
 
-    if previous_state.enrollment:
-        CourseEnrollment.unenroll_by_email(student_email, course_id)
-        if email_students:
-            email_params['message'] = 'enrolled_unenroll'
-            email_params['email_address'] = student_email
-            email_params['full_name'] = previous_state.full_name
-            send_mail_to_student(student_email, email_params)
+    if email_students:
+        mails = []
+        for email in student_emails:
+            if previous_states[email].enrollment:
+                mails.append((email, dict(
+                    email_params, message='enrolled_unenroll', email_address=email,
+                    full_name=previous_states[email].full_name,
+                )))
+            if previous_states[email].allowed:
+                # Since no User object exists for this student there is no "full_name" available.
+                mails.append((email, dict(email_params, message='allowed_unenroll', email_address=email)))
+        _send_mails_to_students(mails, failed_emails)
 
-    if previous_state.allowed:
-        CourseEnrollmentAllowed.objects.get(course_id=course_id, email=student_email).delete()
-        if email_students:
-            email_params['message'] = 'allowed_unenroll'
-            email_params['email_address'] = student_email
-            # Since no User object exists for this student there is no "full_name" available.
-            send_mail_to_student(student_email, email_params)
+    after_states = EmailEnrollmentState.for_emails(course_id, student_emails)
 
-    after_state = EmailEnrollmentState(course_id, student_email)
+    return dict((email, (previous_states[email], after_states[email])) for email in student_emails)
 
-    return previous_state, after_state
+
+def _send_mails_to_students(mails, failed_emails=None):
+    """
+    Send each of the (email, email_params) `mails` with `send_mail_to_student`.
+
+    If `failed_emails` is None, the first failure is raised. Otherwise it is a
+    set to which the emails that couldn't be sent are added, after logging the
+    error, so that one bad address doesn't keep the others from their mail.
+    """
+    for email, email_params in mails:
+        if failed_emails is None:
+            send_mail_to_student(email, email_params)
+            continue
+        try:
+            send_mail_to_student(email, email_params)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Error while sending the enrollment email to %s", email)
+            failed_emails.add(email)
 
 
 def send_beta_role_email(action, user, email_params):
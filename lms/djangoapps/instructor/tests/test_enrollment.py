@@ -17,10 +17,12 @@ from student.models import CourseEnrollment, CourseEnrollmentAllowed
 from instructor.enrollment import (
     EmailEnrollmentState,
     enroll_email,
+    enroll_emails,
     get_email_params,
     reset_student_attempts,
     send_beta_role_email,
-    unenroll_email
+    unenroll_email,
+    unenroll_emails
 )
 
 from submissions import api as sub_api
@@ -284,6 +286,58 @@ class TestInstructorUnenrollDB(TestEnrollmentChangeBase):
         return self._run_state_change_test(before_ideal, after_ideal, action)
 
 
+class TestInstructorBulkEnrollDB(TestCase):
+    """ Test instructor.enrollment.enroll_emails and unenroll_emails """
+    def setUp(self):
+        self.course_id = 'robot:/a/fake/c::rse/id'
+        self.enrolled = UserFactory()
+        CourseEnrollment.enroll(self.enrolled, self.course_id)
+        self.not_enrolled = UserFactory()
+        self.allowed_email = 'robot_allowed@edx.org'
+        CourseEnrollmentAllowed.objects.create(email=self.allowed_email, course_id=self.course_id, auto_enroll=False)
+        self.unknown_email = 'robot_unknown@edx.org'
+        self.emails = [self.enrolled.email, self.not_enrolled.email, self.allowed_email, self.unknown_email]
+
+    def test_enroll(self):
+        states = enroll_emails(self.course_id, self.emails, auto_enroll=True)
+
+        self.assertEqual(
+            dict((email, after.to_dict()) for email, (__, after) in states.iteritems()),
+            {
+                self.enrolled.email: SettableEnrollmentState(user=True, enrollment=True).to_dict(),
+                self.not_enrolled.email: SettableEnrollmentState(user=True, enrollment=True).to_dict(),
+                self.allowed_email: SettableEnrollmentState(allowed=True, auto_enroll=True).to_dict(),
+                self.unknown_email: SettableEnrollmentState(allowed=True, auto_enroll=True).to_dict(),
+            }
+        )
+        self.assertEqual(SettableEnrollmentState(allowed=True), states[self.allowed_email][0])
+
+    def test_unenroll(self):
+        states = unenroll_emails(self.course_id, self.emails)
+
+        for email in self.emails:
+            __, after = states[email]
+            self.assertFalse(after.enrollment)
+            self.assertFalse(after.allowed)
+        self.assertTrue(states[self.enrolled.email][0].enrollment)
+        self.assertTrue(states[self.allowed_email][0].allowed)
+        self.assertFalse(CourseEnrollment.is_enrolled(self.enrolled, self.course_id))
+
+    def test_failed_emails(self):
+        def send_mail(email, __):
+            """Fails for the allowed email only"""
+            if email == self.allowed_email:
+                raise Exception("Bad address")
+
+        failed_emails = set()
+        with mock.patch('instructor.enrollment.send_mail_to_student', side_effect=send_mail) as send_mail_mock:
+            states = enroll_emails(self.course_id, self.emails, email_students=True, email_params={},
+                                   failed_emails=failed_emails)
+        self.assertEqual(failed_emails, set([self.allowed_email]))
+        self.assertEqual(send_mail_mock.call_count, len(self.emails))
+        self.assertTrue(states[self.not_enrolled.email][1].enrollment)
+
+
 class TestInstructorEnrollmentStudentModule(TestCase):
     """ Test student module manipulations. """
     def setUp(self):
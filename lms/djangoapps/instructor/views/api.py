@@ -40,16 +40,15 @@ from instructor_task.views import get_task_completion_info
 from instructor_task.models import ReportStore
 import instructor.enrollment as enrollment
 from instructor.enrollment import (
-    enroll_email,
+    enroll_emails,
     get_email_params,
     send_beta_role_email,
-    unenroll_email
+    unenroll_emails
 )
 from instructor.access import list_with_level, allow_access, revoke_access, update_forum_role
 import analytics.basic
 import analytics.distributions
 import analytics.csvs
-import csv
 
 # Submissions is a Django app that is currently installed
 # from the edx-ora2 repo, although it will likely move in the future.
@@ -62,6 +61,7 @@ from .tools import (
     dump_module_extensions,
     find_unit,
     get_student_from_identifier,
+    get_student_emails_from_identifiers,
     handle_dashboard_error,
     parse_datetime,
     set_due_date_extension,
@@ -255,52 +255,61 @@ def students_update_enrollment(request, course_id):
         course = get_course_by_id(course_id)
         email_params = get_email_params(course, auto_enroll)
 
-    results = []
-    for identifier in identifiers:
-        # First try to get a user object from the identifer
-        user = None
-        email = None
-        try:
-            user = get_student_from_identifier(identifier)
-        except User.DoesNotExist:
-            email = identifier
-        else:
-            email = user.email
+    if action not in ('enroll', 'unenroll'):
+        return HttpResponseBadRequest(strip_tags(
+            "Unrecognized action '{}'".format(action)
+        ))
 
+    # The students are looked up and updated all at once, so that large
+    # rosters don't take a few queries per student
+    emails = get_student_emails_from_identifiers(identifiers)
+    valid_emails = set()
+    for email in emails.itervalues():
         try:
             # Use django.core.validators.validate_email to check email address
             # validity (obviously, cannot check if email actually /exists/,
             # simply that it is plausibly valid)
             validate_email(email)  # Raises ValidationError if invalid
+        except ValidationError:
+            pass
+        else:
+            valid_emails.add(email)
 
-            if action == 'enroll':
-                before, after = enroll_email(course_id, email, auto_enroll, email_students, email_params)
-            elif action == 'unenroll':
-                before, after = unenroll_email(course_id, email, email_students, email_params)
-            else:
-                return HttpResponseBadRequest(strip_tags(
-                    "Unrecognized action '{}'".format(action)
-                ))
+    states = {}
+    error = False
+    # the emails whose notification failed are reported on their own, the
+    # others are still enrolled and notified
+    failed_emails = set()
+    try:
+        if action == 'enroll':
+            states = enroll_emails(
+                course_id, list(valid_emails), auto_enroll, email_students, email_params, failed_emails
+            )
+        else:
+            states = unenroll_emails(course_id, list(valid_emails), email_students, email_params, failed_emails)
+    except Exception as exc:  # pylint: disable=W0703
+        # catch and log any exceptions
+        # so that one error doesn't cause a 500.
+        log.exception("Error while #{}ing students".format(action))
+        log.exception(exc)
+        error = True
 
-        except ValidationError:
-            # Flag this email as an error if invalid, but continue checking
-            # the remaining in the list
+    results = []
+    for identifier in identifiers:
+        email = emails[identifier]
+        if email not in valid_emails:
+            # Flag this email as an error if invalid
             results.append({
                 'identifier': identifier,
                 'invalidIdentifier': True,
             })
-
-        except Exception as exc:  # pylint: disable=W0703
-            # catch and log any exceptions
-            # so that one error doesn't cause a 500.
-            log.exception("Error while #{}ing student")
-            log.exception(exc)
+        elif error or email in failed_emails:
             results.append({
                 'identifier': identifier,
                 'error': True,
             })
-
         else:
+            before, after = states[email]
             results.append({
                 'identifier': identifier,
                 'before': before.to_dict(),
@@ -559,8 +568,6 @@ def get_students_features(request, course_id, csv=False):  # pylint: disable=W06
         'gender', 'level_of_education', 'mailing_address', 'goals'
     ]
 
-    student_data = analytics.basic.enrolled_students_features(course_id, query_features)
-
     # Provide human-friendly and translatable names for these features. These names
     # will be displayed in the table generated in data_download.coffee. It is not (yet)
     # used as the header row in the CSV, but could be in the future.
@@ -578,6 +585,7 @@ def get_students_features(request, course_id, csv=False):  # pylint: disable=W06
     }
 
     if not csv:
+        student_data = analytics.basic.enrolled_students_features(course_id, query_features)
         response_payload = {
             'course_id': course_id,
             'students': student_data,
@@ -588,7 +596,9 @@ def get_students_features(request, course_id, csv=False):  # pylint: disable=W06
         }
         return JsonResponse(response_payload)
     else:
-        header, datarows = analytics.csvs.format_dictlist(student_data, query_features)
+        # streamed, as it can be large
+        student_data = analytics.basic.iter_enrolled_students_features(course_id, query_features)
+        header, datarows = analytics.csvs.format_dicts(student_data, query_features)
         return analytics.csvs.create_csv_response("enrolled_profiles.csv", header, datarows)
 
 
@@ -599,29 +609,15 @@ def get_anon_ids(request, course_id):  # pylint: disable=W0613
     """
     Respond with 2-column CSV output of user-id, anonymized-user-id
     """
-    # TODO: the User.objects query and CSV generation here could be
-    # centralized into analytics. Currently analytics has similar functionality
-    # but not quite what's needed.
-    def csv_response(filename, header, rows):
-        """Returns a CSV http response for the given header and rows (excel/utf-8)."""
-        response = HttpResponse(mimetype='text/csv')
-        response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
-        writer = csv.writer(response, dialect='excel', quotechar='"', quoting=csv.QUOTE_ALL)
-        # In practice, there should not be non-ascii data in this query,
-        # but trying to do the right thing anyway.
-        encoded = [unicode(s).encode('utf-8') for s in header]
-        writer.writerow(encoded)
-        for row in rows:
-            encoded = [unicode(s).encode('utf-8') for s in row]
-            writer.writerow(encoded)
-        return response
-
     students = User.objects.filter(
         courseenrollment__course_id=course_id,
     ).order_by('id')
     header = ['User ID', 'Anonymized user ID', 'Course Specific Anonymized user ID']
-    rows = [[s.id, unique_id_for_user(s), anonymous_id_for_user(s, course_id)] for s in students]
-    return csv_response(course_id.replace('/', '-') + '-anon-ids.csv', header, rows)
+    # streamed, as it can be large
+    rows = (
+        [s.id, unique_id_for_user(s), anonymous_id_for_user(s, course_id)] for s in students.iterator()
+    )
+    return analytics.csvs.create_csv_response(course_id.replace('/', '-') + '-anon-ids.csv', header, rows)
 
 
 @ensure_csrf_cookie
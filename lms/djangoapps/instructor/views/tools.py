@@ -90,6 +90,24 @@ def get_student_from_identifier(unique_student_identifier):
     return student
 
 
+def get_student_emails_from_identifiers(unique_student_identifiers):
+    """
+    Gets the email addresses of students from their email addresses or
+    usernames, with one query for all the usernames.
+
+    Returns a dict of each identifier to the email of its student, or to the
+    stripped identifier itself if no user has this username.
+    """
+    identifiers = dict(
+        (identifier, strip_if_string(identifier)) for identifier in unique_student_identifiers
+    )
+    usernames = [stripped for stripped in identifiers.itervalues() if "@" not in stripped]
+    emails = dict(User.objects.filter(username__in=usernames).values_list('username', 'email')) if usernames else {}
+    return dict(
+        (identifier, emails.get(stripped, stripped)) for identifier, stripped in identifiers.iteritems()
+    )
+
+
 def parse_datetime(datestr):
     """
     Convert user input date string into an instance of `datetime.datetime` in
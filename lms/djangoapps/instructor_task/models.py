@@ -24,6 +24,7 @@ import urllib
 
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
+from boto.s3.multipart import MultiPartUpload
 
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -192,9 +193,9 @@ class InstructorTask(models.Model):
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download. Small reports can be stored in one go with `store_rows()`; big
+    ones should be appended to, a few rows at a time, through the writer
+    returned by `open_rows_writer()`.
     """
     @classmethod
     def from_config(cls):
@@ -310,6 +311,14 @@ class S3ReportStore(ReportStore):
 
         self.store(course_id, filename, output_buffer)
 
+    def open_rows_writer(self, course_id, filename, checkpoint=None):
+        """
+        Return an `S3ReportRowsWriter` to stream rows to the gzip'd csv file
+        `filename`, through a multipart upload. If `checkpoint` is given, resume
+        the upload from there.
+        """
+        return S3ReportRowsWriter(self.bucket, self.key_for(course_id, filename).key, checkpoint)
+
     def links_for(self, course_id):
         """
         For a given `course_id`, return a list of `(filename, url)` tuples. `url`
@@ -320,6 +329,8 @@ class S3ReportStore(ReportStore):
             [
                 (key.key.split("/")[-1], key.generate_url(expires_in=300))
                 for key in self.bucket.list(prefix=course_dir.key)
+                # skip the rows saved aside by the reports still being written
+                if not key.key.split("/")[-1].startswith('.')
             ],
             reverse=True
         )
@@ -386,6 +397,17 @@ class LocalFSReportStore(ReportStore):
         csv.writer(output_buffer).writerows(rows)
         self.store(course_id, filename, output_buffer)
 
+    def open_rows_writer(self, course_id, filename, checkpoint=None):
+        """
+        Return a `LocalFSReportRowsWriter` to append rows to the csv file
+        `filename`. If `checkpoint` is given, resume writing from there.
+        """
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+        return LocalFSReportRowsWriter(full_path, checkpoint)
+
     def links_for(self, course_id):
         """
         For a given `course_id`, return a list of `(filename, url)` tuples. `url`
@@ -401,6 +423,146 @@ class LocalFSReportStore(ReportStore):
             [
                 (filename, ("file://" + urllib.quote(os.path.join(course_dir, filename))))
                 for filename in os.listdir(course_dir)
+                # skip the reports still being written
+                if not filename.startswith('.')
             ],
             reverse=True
         )
+
+
+class S3ReportRowsWriter(object):
+    """
+    Streams the rows of a gzip'd csv report to S3 through a multipart upload,
+    so that only one part of it is ever held in memory. The upload only
+    becomes visible as a file once `close()` completes it.
+
+    Each part is made of complete gzip members; a gzip file made of several
+    members decompresses to the concatenation of their contents.
+    """
+    # S3 refuses parts smaller than this, except for the last one
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, bucket, key_name, checkpoint=None):
+        directory, filename = key_name.rsplit("/", 1)
+        # where a forced checkpoint saves the rows too few to make a part
+        self.pending_key = Key(bucket, "{}/.{}.pending".format(directory, filename))
+        if checkpoint is None:
+            self.upload = bucket.initiate_multipart_upload(
+                key_name,
+                headers={
+                    "Content-Encoding": "gzip",
+                    "Content-Type": "text/csv",
+                }
+            )
+            self.parts_uploaded = 0
+        else:
+            self.upload = MultiPartUpload(bucket)
+            self.upload.key_name = key_name
+            self.upload.id = checkpoint['upload_id']
+            self.parts_uploaded = checkpoint['parts_uploaded']
+            if checkpoint.get('pending'):
+                self._start_part(self.pending_key.get_contents_as_string())
+                return
+        self._start_part()
+
+    def _start_part(self, data=''):
+        """Start buffering a new part, beginning with the gzip members `data`."""
+        self.part_buffer = StringIO()
+        self.part_buffer.write(data)
+        self.part_is_empty = not data
+        self._start_member()
+
+    def _start_member(self):
+        """Start a new gzip member at the end of the part buffered."""
+        self.gzip_file = GzipFile(fileobj=self.part_buffer, mode="wb")
+        self.csv_writer = csv.writer(self.gzip_file)
+
+    def _upload_part(self):
+        """Upload the part buffered so far."""
+        self.gzip_file.close()
+        self.part_buffer.seek(0)
+        self.parts_uploaded += 1
+        self.upload.upload_part_from_file(self.part_buffer, self.parts_uploaded)
+
+    def write_rows(self, rows):
+        """Append the rows (each row is an iterable of strings) to the report."""
+        for row in rows:
+            self.csv_writer.writerow(row)
+            self.part_is_empty = False
+
+    def checkpoint(self, force=False):
+        """
+        Upload the rows buffered so far, if there are enough of them to make a
+        part, or if `force` save them aside until there are. Return the state
+        from which to resume writing the report with only the rows saved so far,
+        or None if nothing was saved.
+        """
+        if self.part_buffer.tell() >= self.MIN_PART_SIZE:
+            self._upload_part()
+            self._start_part()
+        elif not force:
+            return None
+        elif not self.part_is_empty:
+            self.gzip_file.close()
+            self.pending_key.set_contents_from_string(self.part_buffer.getvalue())
+            self._start_member()
+        return {
+            'upload_id': self.upload.id,
+            'parts_uploaded': self.parts_uploaded,
+            'pending': not self.part_is_empty,
+        }
+
+    def close(self):
+        """Upload the remaining rows, and make the report visible."""
+        if not self.part_is_empty or self.parts_uploaded == 0:
+            self._upload_part()
+        self.upload.complete_upload()
+        self.pending_key.delete()
+
+    def abort(self):
+        """Throw away everything written so far."""
+        self.upload.cancel_upload()
+        self.pending_key.delete()
+
+
+class LocalFSReportRowsWriter(object):
+    """
+    Appends the rows of a csv report to a hidden temporary file next to it,
+    which is renamed to the report's name once it's complete.
+    """
+    def __init__(self, full_path, checkpoint=None):
+        self.full_path = full_path
+        directory, filename = os.path.split(full_path)
+        self.partial_path = os.path.join(directory, ".{}.partial".format(filename))
+        if checkpoint is None:
+            self.partial_file = open(self.partial_path, "wb")
+        else:
+            # throw away what was written after the checkpoint
+            self.partial_file = open(self.partial_path, "r+b")
+            self.partial_file.truncate(checkpoint['offset'])
+            self.partial_file.seek(checkpoint['offset'])
+        self.csv_writer = csv.writer(self.partial_file)
+
+    def write_rows(self, rows):
+        """Append the rows (each row is an iterable of strings) to the report."""
+        self.csv_writer.writerows(rows)
+
+    def checkpoint(self, force=False):  # pylint: disable=unused-argument
+        """
+        Write the rows buffered so far to disk, and return the state from which
+        to resume writing the report with only them. This always saves them, so
+        `force` makes no difference.
+        """
+        self.partial_file.flush()
+        os.fsync(self.partial_file.fileno())
+        return {'offset': self.partial_file.tell()}
+
+    def close(self):
+        """Make the complete report visible."""
+        self.partial_file.close()
+        os.rename(self.partial_path, self.full_path)
+
+    def abort(self):
+        """Throw away everything written so far."""
+        self.partial_file.close()
+        os.remove(self.partial_path)
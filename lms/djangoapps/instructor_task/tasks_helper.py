@@ -12,6 +12,7 @@ from celery import Task, current_task
 from celery.utils.log import get_task_logger
 from celery.states import SUCCESS, FAILURE
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import transaction, reset_queries
 from dogapi import dog_stats_api
 from pytz import UTC
@@ -32,6 +33,9 @@ TASK_LOG = get_task_logger(__name__)
 # define value to use when no task_id is provided:
 UNKNOWN_TASK_ID = 'unknown-task_id'
 
+# how long to keep the progress of an interrupted grade report task, for it to be resumed
+GRADE_REPORT_CHECKPOINT_TIMEOUT = 60 * 60 * 24
+
 # define values for update functions to use to return status to perform_module_state_update
 UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
@@ -470,29 +474,73 @@ def delete_problem_module_state(xmodule_instance_args, _module_descriptor, stude
     return UPDATE_STATUS_SUCCEEDED
 
 
-def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+def _grade_report_checkpoint_key(course_id):
+    """
+    Return the cache key under which to save the progress of the grade report
+    task of a course. It doesn't depend on the task, so that a task submitted
+    again after an interrupted one resumes its report.
+    """
+    return 'instructor_task.grade_report_checkpoint.{}'.format(course_id)
+
+
+def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name, chunk_size=500):
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `ReportStore`. Once created, the files can
     be accessed by instantiating another `ReportStore` (via
-    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in ReportStore will be complete ones.
-
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    `ReportStore.from_config()`) and calling `link_for()` on it. Rows are
+    streamed to the store as students are graded, but the file only becomes
+    visible in ReportStore once it's complete.
+
+    Students are graded in chunks of `chunk_size`, by increasing id. The
+    progress made is checkpointed after each chunk, so that the task resumes
+    from the last checkpoint instead of starting over when it is run again
+    after its worker died. If the task fails, the report is thrown away.
     """
     start_time = datetime.now(UTC)
     status_interval = 100
 
-    enrolled_students = CourseEnrollment.users_enrolled_in(course_id)
+    enrolled_students = CourseEnrollment.users_enrolled_in(course_id).order_by('id')
     num_total = enrolled_students.count()
-    num_attempted = 0
-    num_succeeded = 0
-    num_failed = 0
     curr_step = "Calculating Grades"
 
+    report_store = ReportStore.from_config()
+    checkpoint_key = _grade_report_checkpoint_key(course_id)
+    checkpoint = cache.get(checkpoint_key)
+    if checkpoint is None:
+        # Generate parts of the file name
+        timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
+        course_id_prefix = urllib.quote(course_id.replace("/", "_"))
+        checkpoint = {
+            'filename': u"{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str),
+            'err_filename': u"{}_grade_report_{}_err.csv".format(course_id_prefix, timestamp_str),
+            'writer': None,
+            'err_writer': None,
+            'last_student_id': None,
+            'header': None,
+            'attempted': 0,
+            'succeeded': 0,
+            'failed': 0,
+        }
+        rows_writer = report_store.open_rows_writer(course_id, checkpoint['filename'])
+        err_rows_writer = report_store.open_rows_writer(course_id, checkpoint['err_filename'])
+        err_rows_writer.write_rows([["id", "username", "error_msg"]])
+    else:
+        TASK_LOG.info(
+            u'Resuming grade report for course "%s" after student %s',
+            course_id, checkpoint['last_student_id']
+        )
+        rows_writer = report_store.open_rows_writer(course_id, checkpoint['filename'], checkpoint['writer'])
+        err_rows_writer = report_store.open_rows_writer(
+            course_id, checkpoint['err_filename'], checkpoint['err_writer']
+        )
+        enrolled_students = enrolled_students.filter(id__gt=checkpoint['last_student_id'])
+
+    header = checkpoint['header']
+    num_attempted = checkpoint['attempted']
+    num_succeeded = checkpoint['succeeded']
+    num_failed = checkpoint['failed']
+
     def update_task_progress():
         """Return a dict containing info about current task"""
         current_time = datetime.now(UTC)
@@ -509,66 +557,84 @@ def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         return progress
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
+    # Loop over all our students and stream their rows to the reports
     rows = []
-    err_rows = [["id", "username", "error_msg"]]
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if num_attempted % status_interval == 0:
-            update_task_progress()
-        num_attempted += 1
-
-        if gradeset:
-            # We were able to successfully grade this student for this course.
-            num_succeeded += 1
-            if not header:
-                # Encode the header row in utf-8 encoding in case there are unicode characters
-                header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
-                rows.append(["id", "email", "username", "grade"] + header)
-
-            percents = {
-                section['label']: section.get('percent', 0.0)
-                for section in gradeset[u'section_breakdown']
-                if 'label' in section
-            }
-
-            # Not everybody has the same gradable items. If the item is not
-            # found in the user's gradeset, just assume it's a 0. The aggregated
-            # grades for their sections and overall course will be calculated
-            # without regard for the item they didn't have access to, so it's
-            # possible for a student to have a 0.0 show up in their row but
-            # still have 100% for the course.
-            row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
-        else:
-            # An empty gradeset means we failed to grade a student.
-            num_failed += 1
-            err_rows.append([student.id, student.username, err_msg])
-
-    # By this point, we've got the rows we're going to stuff into our CSV files.
+    err_rows = []
+    try:
+        for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, chunk_size=chunk_size):
+            # Periodically update task status (this is a cache write)
+            if num_attempted % status_interval == 0:
+                update_task_progress()
+            num_attempted += 1
+
+            if gradeset:
+                # We were able to successfully grade this student for this course.
+                num_succeeded += 1
+                if not header:
+                    # Encode the header row in utf-8 encoding in case there are unicode characters
+                    header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
+                    rows.append(["id", "email", "username", "grade"] + header)
+
+                percents = {
+                    section['label']: section.get('percent', 0.0)
+                    for section in gradeset[u'section_breakdown']
+                    if 'label' in section
+                }
+
+                # Not everybody has the same gradable items. If the item is not
+                # found in the user's gradeset, just assume it's a 0. The aggregated
+                # grades for their sections and overall course will be calculated
+                # without regard for the item they didn't have access to, so it's
+                # possible for a student to have a 0.0 show up in their row but
+                # still have 100% for the course.
+                row_percents = [percents.get(label, 0.0) for label in header]
+                rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
+            else:
+                # An empty gradeset means we failed to grade a student.
+                num_failed += 1
+                err_rows.append([student.id, student.username, err_msg])
+
+            if num_attempted % chunk_size == 0:
+                # End of a chunk of students: write out their rows, and save our progress
+                # if the writer made them durable.
+                rows_writer.write_rows(rows)
+                err_rows_writer.write_rows(err_rows)
+                rows = []
+                err_rows = []
+                writer_checkpoint = rows_writer.checkpoint()
+                if writer_checkpoint is not None:
+                    checkpoint.update({
+                        'writer': writer_checkpoint,
+                        'err_writer': err_rows_writer.checkpoint(force=True),
+                        'last_student_id': student.id,
+                        'header': header,
+                        'attempted': num_attempted,
+                        'succeeded': num_succeeded,
+                        'failed': num_failed,
+                    })
+                    cache.set(checkpoint_key, checkpoint, GRADE_REPORT_CHECKPOINT_TIMEOUT)
+
+        rows_writer.write_rows(rows)
+        err_rows_writer.write_rows(err_rows)
+    except Exception:
+        # Only the death of the worker can be resumed from
+        cache.delete(checkpoint_key)
+        rows_writer.abort()
+        err_rows_writer.abort()
+        raise
+
+    # By this point, we've got all the rows of our CSV files.
     curr_step = "Uploading CSVs"
     update_task_progress()
 
-    # Generate parts of the file name
-    timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
-    course_id_prefix = urllib.quote(course_id.replace("/", "_"))
+    rows_writer.close()
+    # The errors are only reported if there are any
+    if num_failed:
+        err_rows_writer.close()
+    else:
+        err_rows_writer.abort()
 
-    # Perform the actual upload
-    report_store = ReportStore.from_config()
-    report_store.store_rows(
-        course_id,
-        u"{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str),
-        rows
-    )
-
-    # If there are any error rows (don't count the header), write them out as well
-    if len(err_rows) > 1:
-        report_store.store_rows(
-            course_id,
-            u"{}_grade_report_{}_err.csv".format(course_id_prefix, timestamp_str),
-            err_rows
-        )
+    cache.delete(checkpoint_key)
 
     # One last update before we close out...
     return update_task_progress()
@@ -0,0 +1,204 @@
+"""
+Tests for the report stores of instructor tasks.
+"""
+import csv
+import shutil
+import tempfile
+from cStringIO import StringIO
+from gzip import GzipFile
+from uuid import uuid4
+
+from django.test import TestCase
+from mock import patch
+
+from instructor_task.models import LocalFSReportStore, S3ReportRowsWriter
+
+
+class TestLocalFSReportRowsWriter(TestCase):
+    """
+    Test streaming rows to a report stored on the local file system.
+    """
+    course_id = 'edX/test/2014'
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_path)
+        self.report_store = LocalFSReportStore(self.root_path)
+
+    def read_report(self, filename):
+        """Return the rows of the given report."""
+        with open(self.report_store.path_to(self.course_id, filename)) as report_file:
+            return list(csv.reader(report_file))
+
+    def test_write_rows(self):
+        writer = self.report_store.open_rows_writer(self.course_id, 'report.csv')
+        writer.write_rows([['id', 'grade'], ['1', '0.5']])
+        writer.checkpoint()
+        writer.write_rows([['2', '0.75']])
+        # the report isn't visible until it's complete
+        self.assertEqual(self.report_store.links_for(self.course_id), [])
+
+        writer.close()
+        self.assertEqual(self.read_report('report.csv'), [['id', 'grade'], ['1', '0.5'], ['2', '0.75']])
+        self.assertEqual([name for name, __ in self.report_store.links_for(self.course_id)], ['report.csv'])
+
+    def test_resume_from_checkpoint(self):
+        writer = self.report_store.open_rows_writer(self.course_id, 'report.csv')
+        writer.write_rows([['id', 'grade'], ['1', '0.5']])
+        checkpoint = writer.checkpoint()
+        # these rows are lost when the task is interrupted
+        writer.write_rows([['2', '0.75']])
+        writer.checkpoint()
+
+        writer = self.report_store.open_rows_writer(self.course_id, 'report.csv', checkpoint)
+        writer.write_rows([['2', '1.0']])
+        writer.close()
+        self.assertEqual(self.read_report('report.csv'), [['id', 'grade'], ['1', '0.5'], ['2', '1.0']])
+
+    def test_abort(self):
+        writer = self.report_store.open_rows_writer(self.course_id, 'report.csv')
+        writer.write_rows([['id', 'grade']])
+        writer.abort()
+        self.assertEqual(self.report_store.links_for(self.course_id), [])
+
+    def test_forced_checkpoint(self):
+        writer = self.report_store.open_rows_writer(self.course_id, 'report_err.csv')
+        writer.write_rows([['id', 'username', 'error_msg']])
+        checkpoint = writer.checkpoint(force=True)
+        self.assertIsNotNone(checkpoint)
+
+        writer = self.report_store.open_rows_writer(self.course_id, 'report_err.csv', checkpoint)
+        writer.close()
+        self.assertEqual(self.read_report('report_err.csv'), [['id', 'username', 'error_msg']])
+
+
+class FakeBucket(object):
+    """
+    An in-memory stand-in for the S3 bucket, its keys and multipart uploads.
+    """
+    def __init__(self):
+        self.contents = {}
+        self.uploads = {}
+
+    def initiate_multipart_upload(self, key_name, headers=None):  # pylint: disable=unused-argument
+        """Start a multipart upload to `key_name`."""
+        upload = FakeMultiPartUpload(self)
+        upload.key_name = key_name
+        upload.id = uuid4().hex
+        self.uploads[upload.id] = {}
+        return upload
+
+
+class FakeMultiPartUpload(object):
+    """
+    An in-memory stand-in for a multipart upload to a FakeBucket.
+    """
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.key_name = None
+        self.id = None  # pylint: disable=invalid-name
+
+    def upload_part_from_file(self, part_file, part_num):
+        """Upload the part number `part_num`."""
+        self.bucket.uploads[self.id][part_num] = part_file.read()
+
+    def complete_upload(self):
+        """Make the key of the concatenation of the parts."""
+        parts = self.bucket.uploads.pop(self.id)
+        self.bucket.contents[self.key_name] = ''.join(parts[part_num] for part_num in sorted(parts))
+
+    def cancel_upload(self):
+        """Throw away the parts."""
+        del self.bucket.uploads[self.id]
+
+
+class FakeKey(object):
+    """
+    An in-memory stand-in for a key of a FakeBucket.
+    """
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def set_contents_from_string(self, contents):
+        """Write the key."""
+        self.bucket.contents[self.name] = contents
+
+    def get_contents_as_string(self):
+        """Read the key."""
+        return self.bucket.contents[self.name]
+
+    def delete(self):
+        """Delete the key, if it exists."""
+        self.bucket.contents.pop(self.name, None)
+
+
+@patch('instructor_task.models.Key', FakeKey)
+@patch('instructor_task.models.MultiPartUpload', FakeMultiPartUpload)
+@patch.object(S3ReportRowsWriter, 'MIN_PART_SIZE', 1024)
+class TestS3ReportRowsWriter(TestCase):
+    """
+    Test streaming rows to a report stored on S3 through a multipart upload.
+    """
+    key_name = 'edX/test/2014/report.csv'
+    pending_key_name = 'edX/test/2014/.report.csv.pending'
+
+    def setUp(self):
+        self.bucket = FakeBucket()
+
+    def read_report(self):
+        """Return the rows of the complete report."""
+        return list(csv.reader(GzipFile(fileobj=StringIO(self.bucket.contents[self.key_name]))))
+
+    def random_rows(self, count):
+        """Return `count` rows which gzip poorly, to fill the parts quickly."""
+        return [[uuid4().hex, uuid4().hex] for __ in xrange(count)]
+
+    def test_parts_uploaded_at_min_part_size(self):
+        writer = S3ReportRowsWriter(self.bucket, self.key_name)
+        rows = []
+        checkpoint = None
+        while checkpoint is None:
+            new_rows = self.random_rows(10)
+            writer.write_rows(new_rows)
+            rows.extend(new_rows)
+            checkpoint = writer.checkpoint()
+        self.assertEqual(checkpoint['parts_uploaded'], 1)
+        part = self.bucket.uploads[checkpoint['upload_id']][1]
+        self.assertGreaterEqual(len(part), S3ReportRowsWriter.MIN_PART_SIZE)
+
+        # nothing is uploaded until there is enough for another part
+        new_rows = self.random_rows(2)
+        writer.write_rows(new_rows)
+        rows.extend(new_rows)
+        self.assertIsNone(writer.checkpoint())
+        self.assertEqual(len(self.bucket.uploads[checkpoint['upload_id']]), 1)
+
+        # the gzip members of the parts concatenate into a single valid file
+        writer.close()
+        self.assertEqual(self.read_report(), rows)
+        self.assertEqual(self.bucket.uploads, {})
+
+    def test_resume_from_pending_rows(self):
+        writer = S3ReportRowsWriter(self.bucket, self.key_name)
+        writer.write_rows([['id', 'grade'], ['1', '0.5']])
+        checkpoint = writer.checkpoint(force=True)
+        self.assertTrue(checkpoint['pending'])
+        self.assertEqual(checkpoint['parts_uploaded'], 0)
+        self.assertIn(self.pending_key_name, self.bucket.contents)
+        # these rows are lost when the task is interrupted
+        writer.write_rows([['2', '0.75']])
+
+        writer = S3ReportRowsWriter(self.bucket, self.key_name, checkpoint)
+        writer.write_rows([['2', '1.0']])
+        writer.close()
+        self.assertEqual(self.read_report(), [['id', 'grade'], ['1', '0.5'], ['2', '1.0']])
+        self.assertNotIn(self.pending_key_name, self.bucket.contents)
+
+    def test_abort(self):
+        writer = S3ReportRowsWriter(self.bucket, self.key_name)
+        writer.write_rows([['id', 'grade']])
+        writer.checkpoint(force=True)
+        writer.abort()
+        self.assertEqual(self.bucket.uploads, {})
+        self.assertEqual(self.bucket.contents, {})
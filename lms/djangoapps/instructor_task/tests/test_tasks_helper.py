@@ -0,0 +1,89 @@
+"""
+Tests for the grade report generated by instructor tasks.
+"""
+import csv
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+from mock import patch
+
+from courseware.grades import iterate_grades_for
+from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+
+from instructor_task.models import LocalFSReportStore
+from instructor_task.tasks_helper import push_grades_to_s3, _grade_report_checkpoint_key
+
+
+class WorkerDeath(BaseException):
+    """
+    Stands for the death of the worker, which, unlike exceptions, the task
+    doesn't get to handle.
+    """
+    pass
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestPushGradesToS3(ModuleStoreTestCase):
+    """
+    Test streaming the grade report of a course, and resuming it.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create()
+        self.students = [UserFactory.create() for __ in xrange(5)]
+        for student in self.students:
+            CourseEnrollmentFactory.create(user=student, course_id=self.course.id)
+        root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_path)
+        self.report_store = LocalFSReportStore(root_path)
+        cache.delete(_grade_report_checkpoint_key(self.course.id))
+
+    def push_grades(self):
+        """Run the grade report task of the course, by chunks of 2 students."""
+        with patch('instructor_task.tasks_helper.ReportStore.from_config', return_value=self.report_store):
+            with patch('instructor_task.tasks_helper._get_current_task'):
+                return push_grades_to_s3(None, None, self.course.id, None, 'graded', chunk_size=2)
+
+    def read_report(self):
+        """Return the rows of the only report of the course."""
+        links = self.report_store.links_for(self.course.id)
+        self.assertEqual(len(links), 1)
+        with open(self.report_store.path_to(self.course.id, links[0][0])) as report_file:
+            return list(csv.reader(report_file))
+
+    def test_push_grades(self):
+        progress = self.push_grades()
+        self.assertEqual(progress['succeeded'], 5)
+        rows = self.read_report()
+        self.assertEqual(rows[0][:4], ['id', 'email', 'username', 'grade'])
+        self.assertEqual([row[0] for row in rows[1:]], [str(student.id) for student in self.students])
+
+    def test_resume_after_worker_death(self):
+        def dying_iterate_grades_for(course_id, students, chunk_size=500):
+            """Grade the first chunk of students and one more, then die."""
+            for index, result in enumerate(iterate_grades_for(course_id, students, chunk_size=chunk_size)):
+                if index == 3:
+                    raise WorkerDeath()
+                yield result
+
+        with patch('instructor_task.tasks_helper.iterate_grades_for', side_effect=dying_iterate_grades_for):
+            with self.assertRaises(WorkerDeath):
+                self.push_grades()
+        self.assertEqual(self.report_store.links_for(self.course.id), [])
+
+        with patch('instructor_task.tasks_helper.iterate_grades_for', wraps=iterate_grades_for) as mock_iterate:
+            progress = self.push_grades()
+        # only the students after the last checkpoint are graded again
+        resumed_students = mock_iterate.call_args[0][1]
+        self.assertEqual(list(resumed_students), self.students[2:])
+        self.assertEqual(progress['attempted'], 5)
+        self.assertEqual(progress['succeeded'], 5)
+
+        # the rows written before the checkpoint are kept, and none twice
+        rows = self.read_report()
+        self.assertEqual(rows[0][:4], ['id', 'email', 'username', 'grade'])
+        self.assertEqual([row[0] for row in rows[1:]], [str(student.id) for student in self.students])
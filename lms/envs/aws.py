@@ -161,6 +161,10 @@ if 'loc_cache' not in CACHES:
         'LOCATION': 'edx_location_mem_cache',
     }
 
+# Local disk cache for the data of assets too big for the cache
+CONTENT_DISK_CACHE_DIR = ENV_TOKENS.get('CONTENT_DISK_CACHE_DIR', None)
+CONTENT_DISK_CACHE_MAX_SIZE = ENV_TOKENS.get('CONTENT_DISK_CACHE_MAX_SIZE', 1024 * 1024 * 1024)
+
 # Email overrides
 DEFAULT_FROM_EMAIL = ENV_TOKENS.get('DEFAULT_FROM_EMAIL', DEFAULT_FROM_EMAIL)
 DEFAULT_FEEDBACK_EMAIL = ENV_TOKENS.get('DEFAULT_FEEDBACK_EMAIL', DEFAULT_FEEDBACK_EMAIL)
@@ -228,6 +232,9 @@ VIRTUAL_UNIVERSITIES = ENV_TOKENS.get('VIRTUAL_UNIVERSITIES', [])
 META_UNIVERSITIES = ENV_TOKENS.get('META_UNIVERSITIES', {})
 COMMENTS_SERVICE_URL = ENV_TOKENS.get("COMMENTS_SERVICE_URL", '')
 COMMENTS_SERVICE_KEY = ENV_TOKENS.get("COMMENTS_SERVICE_KEY", '')
+COMMENTS_SERVICE_POOL_SIZE = ENV_TOKENS.get("COMMENTS_SERVICE_POOL_SIZE", 10)
+COMMENTS_SERVICE_MAX_RETRIES = ENV_TOKENS.get("COMMENTS_SERVICE_MAX_RETRIES", 0)
+COMMENTS_SERVICE_CONCURRENCY = ENV_TOKENS.get("COMMENTS_SERVICE_CONCURRENCY", 4)
 CERT_QUEUE = ENV_TOKENS.get("CERT_QUEUE", 'test-pull')
 ZENDESK_URL = ENV_TOKENS.get("ZENDESK_URL")
 FEEDBACK_SUBMISSION_EMAIL = ENV_TOKENS.get("FEEDBACK_SUBMISSION_EMAIL")
@@ -312,6 +319,17 @@ XQUEUE_INTERFACE = AUTH_TOKENS['XQUEUE_INTERFACE']
 # Get the MODULESTORE from auth.json, but if it doesn't exist,
 # use the one from common.py
 MODULESTORE = AUTH_TOKENS.get('MODULESTORE', MODULESTORE)
+# Snapshots and parallel loading of the XML courses, for all the XML stores,
+# including the ones of a mixed modulestore
+XML_MODULESTORE_SNAPSHOT_DIR = ENV_TOKENS.get('XML_MODULESTORE_SNAPSHOT_DIR', XML_MODULESTORE_SNAPSHOT_DIR)
+XML_MODULESTORE_LOAD_PROCESSES = ENV_TOKENS.get('XML_MODULESTORE_LOAD_PROCESSES', XML_MODULESTORE_LOAD_PROCESSES)
+for store_settings in MODULESTORE.values():
+    for xml_store_settings in [store_settings] + store_settings.get('OPTIONS', {}).get('stores', {}).values():
+        if xml_store_settings['ENGINE'] == 'xmodule.modulestore.xml.XMLModuleStore':
+            xml_store_settings.setdefault('OPTIONS', {}).update({
+                'snapshot_dir': XML_MODULESTORE_SNAPSHOT_DIR,
+                'load_processes': XML_MODULESTORE_LOAD_PROCESSES,
+            })
 CONTENTSTORE = AUTH_TOKENS.get('CONTENTSTORE', CONTENTSTORE)
 DOC_STORE_CONFIG = AUTH_TOKENS.get('DOC_STORE_CONFIG',DOC_STORE_CONFIG)
 MONGODB_LOG = AUTH_TOKENS.get('MONGODB_LOG', {})
@@ -154,6 +154,10 @@ FEATURES = {
     # sandbox, for testing whether it's enabled properly.
     'ENABLE_DEBUG_RUN_PYTHON': False,
 
+    # Turn on a page that shows staff the cache hits and misses of the Python
+    # code of the problems run by the process serving it.
+    'ENABLE_SAFE_EXEC_STATS': False,
+
     # Enable URL that shows information about the status of variuous services
     'ENABLE_SERVICE_STATUS': False,
 
@@ -252,6 +256,11 @@ FEATURES = {
     # Show a "Download your certificate" on the Progress page if the lowest
     # nonzero grade cutoff is met
     'SHOW_PROGRESS_SUCCESS_BUTTON': False,
+
+    # Persist each student's course grade and subsection scores, update them
+    # as grades are published and serve unchanged grades from the database
+    # instead of recomputing them
+    'ENABLE_PERSISTENT_GRADES': False,
 }
 
 # Used for A/B testing
@@ -454,12 +463,20 @@ SUBDOMAIN_BRANDING = {}
 VIRTUAL_UNIVERSITIES = []
 
 ############################### XModule Store ##################################
+# The directory where the XML modulestore keeps a snapshot of each course it
+# loaded, to skip parsing the unchanged ones (None to parse them every time),
+# and the number of processes parsing the others in parallel
+XML_MODULESTORE_SNAPSHOT_DIR = None
+XML_MODULESTORE_LOAD_PROCESSES = 1
+
 MODULESTORE = {
     'default': {
         'ENGINE': 'xmodule.modulestore.xml.XMLModuleStore',
         'OPTIONS': {
             'data_dir': DATA_DIR,
             'default_class': 'xmodule.hidden_module.HiddenDescriptor',
+            'snapshot_dir': XML_MODULESTORE_SNAPSHOT_DIR,
+            'load_processes': XML_MODULESTORE_LOAD_PROCESSES,
         }
     }
 }
@@ -1275,8 +1292,9 @@ VERIFY_STUDENT = {
 
 ### This enables the Metrics tab for the Instructor dashboard ###########
 FEATURES['CLASS_DASHBOARD'] = False
-if FEATURES.get('CLASS_DASHBOARD'):
-    INSTALLED_APPS += ('class_dashboard',)
+# Always installed, so that the tables of its aggregates exist whenever the
+# feature is turned on by an env
+INSTALLED_APPS += ('class_dashboard',)
 
 ######################## CAS authentication ###########################
 
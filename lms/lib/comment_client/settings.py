@@ -6,3 +6,10 @@ else:
     SERVICE_HOST = 'http://localhost:4567'
 
 PREFIX = SERVICE_HOST + '/api/v1'
+
+# The number of keep-alive connections to the comments service kept open by each process
+POOL_SIZE = getattr(settings, "COMMENTS_SERVICE_POOL_SIZE", 10)
+# The number of times a request failing to connect to the comments service is retried
+MAX_RETRIES = getattr(settings, "COMMENTS_SERVICE_MAX_RETRIES", 0)
+# The number of threads of each process running independent requests concurrently
+CONCURRENCY = getattr(settings, "COMMENTS_SERVICE_CONCURRENCY", 4)
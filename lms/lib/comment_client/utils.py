@@ -1,15 +1,32 @@
 from contextlib import contextmanager
+from cookielib import DefaultCookiePolicy
 from dogapi import dog_stats_api
 import json
 import logging
+from multiprocessing.pool import ThreadPool
+import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
+import threading
 from django.conf import settings
 from time import time
 from uuid import uuid4
+from django.utils import translation
 from django.utils.translation import get_language
 
+import settings as cc_settings
+
 log = logging.getLogger(__name__)
 
+# path segments naming a resource rather than identifying one
+ENDPOINT_SEGMENT_RE = re.compile(r'^[a-z_]+$')
+
+_session = None
+_pool = None
+_pid = None
+_lock = threading.Lock()
+
 
 def strip_none(dic):
     return dict([(k, v) for k, v in dic.iteritems() if v is not None])
@@ -32,6 +49,79 @@ def merge_dict(dic1, dic2):
     return dict(dic1.items() + dic2.items())
 
 
+def _ensure_process_resources():
+    """
+    Create the HTTP session and the thread pool of this process, unless they
+    were created already. Neither survives a fork, so web server workers forked
+    after their creation get their own.
+    """
+    global _session, _pool, _pid  # pylint: disable=global-statement
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        session = requests.Session()
+        # the session is shared by the requests made on behalf of all users
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=cc_settings.POOL_SIZE,
+            max_retries=cc_settings.MAX_RETRIES,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+        _pool = ThreadPool(cc_settings.CONCURRENCY)
+        _pid = os.getpid()
+
+
+def get_session():
+    """
+    Return the requests session of this process, keeping connections to the
+    comments service alive between requests.
+    """
+    _ensure_process_resources()
+    return _session
+
+
+def perform_concurrently(*calls):
+    """
+    Run the given callables, which should be independent calls to the comments
+    service, concurrently. Return the list of their results, in order, or raise
+    the exception raised by the first failing one.
+
+    The calls run in other threads, so they shouldn't use the database.
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+
+    _ensure_process_resources()
+    language = get_language()
+
+    def run(call):
+        # Accept-Language is taken from the active language, which is per thread
+        with translation.override(language):
+            return call()
+
+    results = [_pool.apply_async(run, (call,)) for call in calls]
+    return [result.get() for result in results]
+
+
+def endpoint_of(url):
+    """
+    Return the path of url relative to the comments service API, with the
+    segments identifying resources replaced by ':id', eg 'threads/:id' for
+    the url of any thread, to aggregate request metrics by endpoint.
+    """
+    path = url[len(cc_settings.PREFIX):] if url.startswith(cc_settings.PREFIX) else url
+    segments = path.split('?')[0].strip('/').split('/')
+    return '/'.join(
+        segment if ENDPOINT_SEGMENT_RE.match(segment) else ':id'
+        for segment in segments
+    )
+
+
 @contextmanager
 def request_timer(request_id, method, url, tags=None):
     start = time()
@@ -40,6 +130,12 @@ def request_timer(request_id, method, url, tags=None):
     end = time()
     duration = end - start
 
+    dog_stats_api.histogram(
+        'comment_client.request.endpoint.time',
+        value=duration,
+        tags=(tags or []) + [u'endpoint:{}'.format(endpoint_of(url))]
+    )
+
     log.info(
         "comment_client_request_log: request_id={request_id}, method={method}, "
         "url={url}, duration={duration}".format(
@@ -77,7 +173,7 @@ def perform_request(method, url, data_or_params=None, raw=False,
         data = None
         params = merge_dict(data_or_params, request_id_dict)
     with request_timer(request_id, method, url, metric_tags):
-        response = requests.request(
+        response = get_session().request(
             method,
             url,
             data=data,
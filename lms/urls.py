@@ -483,6 +483,11 @@ if settings.FEATURES.get('ENABLE_DEBUG_RUN_PYTHON'):
         url(r'^debug/run_python', 'debug.views.run_python'),
     )
 
+if settings.FEATURES.get('ENABLE_SAFE_EXEC_STATS'):
+    urlpatterns += (
+        url(r'^debug/safe_exec_stats', 'debug.views.show_safe_exec_stats'),
+    )
+
 # Crowdsourced hinting instructor manager.
 if settings.FEATURES.get('ENABLE_HINTER_INSTRUCTOR_VIEW'):
     urlpatterns += (